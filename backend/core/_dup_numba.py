@@ -0,0 +1,64 @@
+"""
+重复代码检测的 numba 内核（可选加速）
+
+numba 未安装时 NUMBA_AVAILABLE 为 False，RefactorSuggester 使用纯 Python 实现。
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# 64 位 FNV-1a 参数
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, nogil=True)
+    def window_hashes(buf, starts, lengths, window, min_line_length):
+        """
+        计算每个行窗口的哈希
+
+        Args:
+            buf: 各行（已去除首尾空白）的 UTF-8 字节数组
+            starts, lengths: 每行在 buf 中的起点和字节数
+            window: 窗口行数
+            min_line_length: 短行的最大字符数；全部由短行组成的窗口不参与检测
+
+        Returns:
+            (窗口哈希, 是否参与检测)，长度为 行数 - window + 1
+        """
+        n = starts.shape[0]
+        line_hash = np.empty(n, dtype=np.uint64)
+        is_long = np.empty(n, dtype=np.bool_)
+        for i in range(n):
+            h = _FNV_OFFSET
+            chars = 0
+            for p in range(starts[i], starts[i] + lengths[i]):
+                b = buf[p]
+                h ^= np.uint64(b)
+                h *= _FNV_PRIME
+                # 按 UTF-8 首字节计数，得到与 Python len() 一致的字符数
+                if (b & 0xC0) != 0x80:
+                    chars += 1
+            line_hash[i] = h
+            is_long[i] = chars > min_line_length
+
+        m = max(n - window + 1, 0)
+        hashes = np.empty(m, dtype=np.uint64)
+        valid = np.zeros(m, dtype=np.bool_)
+        for i in range(m):
+            h = _FNV_OFFSET
+            has_long = False
+            for k in range(window):
+                h ^= line_hash[i + k]
+                h *= _FNV_PRIME
+                has_long = has_long or is_long[i + k]
+            hashes[i] = h
+            valid[i] = has_long
+        return hashes, valid
@@ -0,0 +1,113 @@
+"""
+TF-IDF 检索打分的 numba 内核（可选加速）
+
+numba 未安装时 NUMBA_AVAILABLE 为 False，TFIDFRetriever 回退到 SciPy/NumPy 实现。
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, nogil=True, inline="always")
+    def _before(score_a, doc_a, score_b, doc_b):
+        """堆内排序：分数低者在前，同分时下标大者在前（最终结果按分数降序、下标升序）"""
+        return score_a < score_b or (score_a == score_b and doc_a > doc_b)
+
+    @njit(cache=True, nogil=True)
+    def _sift_down(heap_s, heap_i, size):
+        pos = 0
+        score = heap_s[0]
+        doc = heap_i[0]
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            right = child + 1
+            if right < size and _before(heap_s[right], heap_i[right], heap_s[child], heap_i[child]):
+                child = right
+            if not _before(heap_s[child], heap_i[child], score, doc):
+                break
+            heap_s[pos] = heap_s[child]
+            heap_i[pos] = heap_i[child]
+            pos = child
+        heap_s[pos] = score
+        heap_i[pos] = doc
+
+    @njit(cache=True, nogil=True)
+    def score_topk(data, indices, indptr, n_docs, q_idx, q_val, k):
+        """
+        计算查询与所有文档的相似度并选出 top-k
+
+        Args:
+            data, indices, indptr: 文档矩阵的 CSC 数组（按列存储，只遍历查询词所在列）
+            n_docs: 文档数
+            q_idx, q_val: 查询向量的非零列及权重
+            k: 返回数量
+
+        Returns:
+            (文档下标, 相似度)，按相似度降序
+        """
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for j in range(q_idx.shape[0]):
+            col = q_idx[j]
+            w = q_val[j]
+            for p in range(indptr[col], indptr[col + 1]):
+                scores[indices[p]] += data[p] * w
+
+        k = min(k, n_docs)
+        heap_s = np.empty(k, dtype=np.float32)
+        heap_i = np.empty(k, dtype=np.int64)
+        if k <= 0:
+            return heap_i, heap_s
+
+        # 大小为 k 的最小堆，堆顶是当前 top-k 中最差的一个
+        size = 0
+        for d in range(n_docs):
+            s = scores[d]
+            if size < k:
+                pos = size
+                size += 1
+                while pos > 0:
+                    parent = (pos - 1) >> 1
+                    if not _before(s, d, heap_s[parent], heap_i[parent]):
+                        break
+                    heap_s[pos] = heap_s[parent]
+                    heap_i[pos] = heap_i[parent]
+                    pos = parent
+                heap_s[pos] = s
+                heap_i[pos] = d
+            elif _before(heap_s[0], heap_i[0], s, d):
+                heap_s[0] = s
+                heap_i[0] = d
+                _sift_down(heap_s, heap_i, size)
+
+        # 依次弹出堆顶放到末尾，得到降序结果
+        out_s = np.empty(k, dtype=np.float32)
+        out_i = np.empty(k, dtype=np.int64)
+        for pos in range(k - 1, -1, -1):
+            out_s[pos] = heap_s[0]
+            out_i[pos] = heap_i[0]
+            size -= 1
+            heap_s[0] = heap_s[size]
+            heap_i[0] = heap_i[size]
+            _sift_down(heap_s, heap_i, size)
+        return out_i, out_s
+
+    def warmup():
+        """用极小的输入触发编译/加载磁盘缓存，避免首个查询承担 JIT 开销"""
+        score_topk(
+            np.ones(1, dtype=np.float32),
+            np.zeros(1, dtype=np.int32),
+            np.array([0, 1], dtype=np.int32),
+            1,
+            np.zeros(1, dtype=np.int32),
+            np.ones(1, dtype=np.float32),
+            1,
+        )
@@ -5,12 +5,46 @@
 
 import ast
 import re
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
 logger = logging.getLogger("CodeAnalyzer")
 
+# 解析后 AST 的缓存条目数（按 LRU 淘汰），供各分析器共享同一份解析结果
+_AST_CACHE_MAX_ENTRIES = 64
+_AST_CACHE: "OrderedDict[bytes, ast.Module]" = OrderedDict()
+_AST_CACHE_LOCK = threading.Lock()
+
+
+def _get_ast(content: str, digest: Optional[bytes] = None) -> ast.Module:
+    """
+    解析 Python 源码，按内容哈希缓存结果
+
+    返回的 AST 在调用方之间共享，只能读取不能修改。解析失败时抛出异常（不缓存）。
+
+    Args:
+        content: 源码
+        digest: 调用方已算好的内容哈希（blake2b, digest_size=16），省去重复计算
+    """
+    if digest is None:
+        digest = hashlib.blake2b(content.encode('utf-8', 'ignore'), digest_size=16).digest()
+    with _AST_CACHE_LOCK:
+        tree = _AST_CACHE.get(digest)
+        if tree is not None:
+            _AST_CACHE.move_to_end(digest)
+            return tree
+    
+    tree = ast.parse(content)
+    with _AST_CACHE_LOCK:
+        _AST_CACHE[digest] = tree
+        if len(_AST_CACHE) > _AST_CACHE_MAX_ENTRIES:
+            _AST_CACHE.popitem(last=False)
+    return tree
+
 
 class CodeAnalyzer:
     """代码分析器 - 提取代码结构、依赖关系、调用图等信息"""
@@ -68,7 +102,8 @@ class CodeAnalyzer:
     def _analyze_python(self, content: str, file_path: str) -> Dict[str, Any]:
         """分析 Python 代码"""
         try:
-            tree = ast.parse(content)
+            # 与重构建议等分析器共享解析结果（同一内容只解析一次）
+            tree = _get_ast(content)
         except SyntaxError:
             logger.warning(f"Failed to parse Python file: {file_path}")
             return self._basic_analysis(content, '.py')
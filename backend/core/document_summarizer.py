@@ -67,8 +67,6 @@ class DocumentSummarizer:
     
     def _summarize_python(self, content: str, file_path: str) -> Dict[str, Any]:
         """Python 文件摘要"""
-        lines = content.split('\n')
-        
         # 提取文档字符串
         docstring = self._extract_python_docstring(content)
         
@@ -97,7 +95,7 @@ class DocumentSummarizer:
         
         return {
             "language": "Python",
-            "total_lines": len(lines),
+            "total_lines": content.count('\n') + 1,
             "docstring": docstring,
             "imports": imports[:10],  # 限制数量
             "classes": classes,
@@ -107,11 +105,6 @@ class DocumentSummarizer:
     
     def _summarize_javascript(self, content: str, file_path: str) -> Dict[str, Any]:
         """JavaScript 文件摘要"""
-        lines = content.split('\n')
-        
-        # 提取注释作为文档
-        comments = self._extract_comments(content, ['//', '/*'])
-        
         # 提取导入
         imports = self._extract_imports(content)
         
@@ -140,7 +133,7 @@ class DocumentSummarizer:
         
         return {
             "language": "JavaScript",
-            "total_lines": len(lines),
+            "total_lines": content.count('\n') + 1,
             "is_react": is_react,
             "imports": imports[:10],
             "classes": classes,
@@ -164,8 +157,6 @@ class DocumentSummarizer:
     
     def _summarize_java(self, content: str, file_path: str) -> Dict[str, Any]:
         """Java 文件摘要"""
-        lines = content.split('\n')
-        
         # 提取类
         classes = self._extract_classes(content, 'java')
         
@@ -190,7 +181,7 @@ class DocumentSummarizer:
         
         return {
             "language": "Java",
-            "total_lines": len(lines),
+            "total_lines": content.count('\n') + 1,
             "imports": imports[:10],
             "classes": classes,
             "methods": methods,
@@ -199,8 +190,6 @@ class DocumentSummarizer:
     
     def _summarize_go(self, content: str, file_path: str) -> Dict[str, Any]:
         """Go 文件摘要"""
-        lines = content.split('\n')
-        
         # 提取包名
         package_match = re.search(r'package\s+(\w+)', content)
         package_name = package_match.group(1) if package_match else 'main'
@@ -223,7 +212,7 @@ class DocumentSummarizer:
         
         return {
             "language": "Go",
-            "total_lines": len(lines),
+            "total_lines": content.count('\n') + 1,
             "package": package_name,
             "structs": structs,
             "functions": functions,
@@ -232,8 +221,6 @@ class DocumentSummarizer:
     
     def _summarize_rust(self, content: str, file_path: str) -> Dict[str, Any]:
         """Rust 文件摘要"""
-        lines = content.split('\n')
-        
         # 提取函数
         functions = self._extract_functions(content, 'rust')
         
@@ -258,7 +245,7 @@ class DocumentSummarizer:
         
         return {
             "language": "Rust",
-            "total_lines": len(lines),
+            "total_lines": content.count('\n') + 1,
             "structs": structs,
             "enums": enums,
             "functions": functions,
@@ -61,6 +61,8 @@ class HealthAnalyzer:
             total_functions = 0
             total_classes = 0
             total_complexity = 0
+            # 待生成重构建议的 (路径, 内容)，读取完成后批量（多进程）分析
+            refactor_items = []
             
             for file_path in file_paths:
                 try:
@@ -77,13 +79,15 @@ class HealthAnalyzer:
                     for func in code_analysis.get("functions", []):
                         total_complexity += func.get("complexity", 0)
                     
-                    # 重构建议
-                    suggestions = self.refactor_suggester.analyze_file(full_path, content)
-                    code_issues.extend(suggestions)
+                    refactor_items.append((full_path, content))
                 
                 except Exception as e:
                     logger.warning(f"Failed to analyze {file_path}: {e}")
             
+            # 重构建议
+            for suggestions in self.refactor_suggester.analyze_files(refactor_items):
+                code_issues.extend(suggestions)
+            
             # 计算各项指标
             metrics["details"] = {
                 "total_files": total_files,
@@ -76,7 +76,7 @@ class OrchestratorAgent:
                 q = str(args.get("query") or "").strip()
                 top_k = args.get("top_k")
                 top_k = int(top_k) if top_k is not None else 5
-                results = self.rag_backend.retrieve(q, top_k=top_k)
+                results = await asyncio.to_thread(self.rag_backend.retrieve, q, top_k=top_k)
                 return {"results": results, "context": self.rag_backend.format_context(results)}
 
             self.tool_specs = [
@@ -119,7 +119,7 @@ class OrchestratorAgent:
         rag_context = ""
         if self.rag_backend and len(query) >= 6:
             try:
-                rag_results = self.rag_backend.retrieve(query, top_k=5)
+                rag_results = await asyncio.to_thread(self.rag_backend.retrieve, query, top_k=5)
                 rag_context = self.rag_backend.format_context(rag_results)
             except Exception:
                 rag_context = ""
@@ -2,15 +2,44 @@
 Prompt Optimizer - 智能优化用户输入的消息
 """
 
+import asyncio
 import os
 import json
 import re
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 import logging
+import threading
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# 实体提取：驼峰命名、下划线命名和中文实体（至少 2 个字符，CJK 不使用 \b 边界）
+_ENTITY_RE = re.compile(r'[A-Z][A-Za-z0-9]+|[a-z_][a-z0-9_]+|[\u4e00-\u9fa5]{2,}')
+
+# 实体提取时过滤的常见词汇
+_STOP_WORDS = frozenset({
+    '的', '我', '你', '他', '她', '它', '是', '在', '有', '不', '了', '着', '过', '和', '与', '或', '但', '而',
+    '因为', '所以', '如果', '那么', 'this', 'that', 'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare', 'ought', 'used', 'to',
+    'of', 'in', 'for', 'on', 'with', 'at', 'by', 'from', 'as', 'into', 'through', 'during',
+    'before', 'after', 'above', 'below', 'between', 'under', 'again', 'further', 'then', 'once',
+    'here', 'there', 'when', 'where', 'why', 'how', 'all', 'each', 'few', 'more', 'most',
+    'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too',
+    'very', 'just', 'also', 'now',
+})
+
+# 代码风格指南中的固定片段
+_STYLE_GUIDE_HEADER = "\n## CODE STYLE GUIDE"
+_TS_STYLE_HEADER = "\n### TypeScript/JavaScript Style:"
+_PY_STYLE_HEADER = "\n### Python Style:"
+_GENERAL_STYLE_HEADER = "\n### General Style:"
+_TYPE_HINTS_LINE = "- Include type hints"
+
+# CI/CD 配置文件/目录
+_CI_CD_FILES = frozenset({'.github', '.gitlab-ci.yml', '.travis.yml', 'Jenkinsfile', 'azure-pipelines.yml'})
+
 
 class PromptOptimizer:
     """智能提示词优化器 - 基于项目分析和用户意图优化消息"""
@@ -30,6 +59,12 @@ class PromptOptimizer:
         self.relevant_files = []
         self.relevant_functions = []
         self.relevant_classes = []
+        self._root_entries: Dict[str, bool] = {}
+        self._project_context_cached: Optional[str] = None
+        self._style_guide_cached: Optional[str] = None
+        # 同一项目的实例在多个请求间共享，analyze_project/find_relevant_code 在线程中执行，
+        # 用锁保证扫描结果不会被并发的分析读到一半或交替写入
+        self._lock = threading.Lock()
 
     def analyze_project(self) -> Dict[str, Any]:
         """
@@ -38,8 +73,16 @@ class PromptOptimizer:
         Returns:
             项目分析结果
         """
+        with self._lock:
+            return self._analyze_project_locked()
+
+    def _analyze_project_locked(self) -> Dict[str, Any]:
+        """analyze_project 的实现，调用方需持有 self._lock"""
         logger.info(f"开始分析项目: {self.project_path}")
 
+        # 0. 一次性列出根目录（供架构检测和配置读取复用）
+        self._root_entries = self._scan_root_entries()
+
         # 1. 检测技术栈
         self.tech_stack = self._detect_tech_stack()
 
@@ -52,8 +95,12 @@ class PromptOptimizer:
         # 4. 读取项目配置
         self.project_info = self._read_project_config()
 
-        # 5. 扫描项目代码（用于后续引用）
-        self._scan_project_code()
+        # 5. 扫描项目代码（用于后续引用），扫描完成后一次性替换上一次的结果
+        self.relevant_files, self.relevant_functions, self.relevant_classes = self._scan_project_code()
+
+        # 6. 缓存项目上下文和风格指南，避免每条消息重复构建
+        self._project_context_cached = self._build_project_context()
+        self._style_guide_cached = self._build_style_guide()
 
         analysis_result = {
             'tech_stack': self.tech_stack,
@@ -68,9 +115,17 @@ class PromptOptimizer:
         logger.info(f"项目分析完成")
         return analysis_result
 
-    def _scan_project_code(self):
-        """扫描项目代码，提取关键信息"""
+    def _scan_project_code(self) -> Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        扫描项目代码，提取关键信息
+
+        Returns:
+            (相关文件, 函数, 类)
+        """
         logger.info("扫描项目代码...")
+        relevant_files: List[str] = []
+        relevant_functions: List[Dict[str, Any]] = []
+        relevant_classes: List[Dict[str, Any]] = []
 
         # 扫描 Python 文件
         for py_file in self.project_path.rglob('*.py'):
@@ -78,26 +133,30 @@ class PromptOptimizer:
                 with open(py_file, 'r', encoding='utf-8') as f:
                     content = f.read()
 
+                rel_path = str(py_file.relative_to(self.project_path))
+
                 # 提取函数定义
                 functions = re.findall(r'def\s+(\w+)\s*\((.*?)\):', content)
                 for func_name, params in functions:
-                    self.relevant_functions.append({
+                    relevant_functions.append({
                         'name': func_name,
+                        'name_lc': func_name.lower(),
                         'params': params,
-                        'file': str(py_file.relative_to(self.project_path))
+                        'file': rel_path
                     })
 
                 # 提取类定义
                 classes = re.findall(r'class\s+(\w+)(?:\s*\([^)]*\))?:', content)
                 for class_name in classes:
-                    self.relevant_classes.append({
+                    relevant_classes.append({
                         'name': class_name,
-                        'file': str(py_file.relative_to(self.project_path))
+                        'name_lc': class_name.lower(),
+                        'file': rel_path
                     })
 
                 # 保存文件路径
                 if functions or classes:
-                    self.relevant_files.append(str(py_file.relative_to(self.project_path)))
+                    relevant_files.append(rel_path)
 
             except Exception as e:
                 logger.warning(f"扫描文件 {py_file} 失败: {e}")
@@ -108,31 +167,36 @@ class PromptOptimizer:
                 with open(ts_file, 'r', encoding='utf-8') as f:
                     content = f.read()
 
+                rel_path = str(ts_file.relative_to(self.project_path))
+
                 # 提取函数定义
                 functions = re.findall(r'(?:function\s+(\w+)|const\s+(\w+)\s*=\s*\([^)]*\)\s*=>|(\w+)\s*\([^)]*\)\s*{)', content)
                 for match in functions:
                     func_name = match[0] or match[1] or match[2]
                     if func_name:
-                        self.relevant_functions.append({
+                        relevant_functions.append({
                             'name': func_name,
-                            'file': str(ts_file.relative_to(self.project_path))
+                            'name_lc': func_name.lower(),
+                            'file': rel_path
                         })
 
                 # 提取类定义
                 classes = re.findall(r'class\s+(\w+)', content)
                 for class_name in classes:
-                    self.relevant_classes.append({
+                    relevant_classes.append({
                         'name': class_name,
-                        'file': str(ts_file.relative_to(self.project_path))
+                        'name_lc': class_name.lower(),
+                        'file': rel_path
                     })
 
                 if functions or classes:
-                    self.relevant_files.append(str(ts_file.relative_to(self.project_path)))
+                    relevant_files.append(rel_path)
 
             except Exception as e:
                 logger.warning(f"扫描文件 {ts_file} 失败: {e}")
 
-        logger.info(f"扫描完成: 找到 {len(self.relevant_files)} 个相关文件, {len(self.relevant_functions)} 个函数, {len(self.relevant_classes)} 个类")
+        logger.info(f"扫描完成: 找到 {len(relevant_files)} 个相关文件, {len(relevant_functions)} 个函数, {len(relevant_classes)} 个类")
+        return relevant_files, relevant_functions, relevant_classes
 
     def _detect_tech_stack(self) -> List[str]:
         """检测项目使用的技术栈"""
@@ -294,8 +358,9 @@ class PromptOptimizer:
 
                 interface_count += len(re.findall(r'\binterface\s+\w+', content))
                 type_count += len(re.findall(r'\btype\s+\w+', content))
-                single_quote_count += len(re.findall(r"'[^']*'", content))
-                double_quote_count += len(re.findall(r'"[^"]*"', content))
+                # 引号对数量：定长字符计数即可，无需正则
+                single_quote_count += content.count("'") // 2
+                double_quote_count += content.count('"') // 2
                 semicolon_count += len(re.findall(r';\s*$', content, re.MULTILINE))
                 const_count += len(re.findall(r'\bconst\s+', content))
                 let_count += len(re.findall(r'\blet\s+', content))
@@ -340,8 +405,9 @@ class PromptOptimizer:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
 
-                single_quote_count += len(re.findall(r"'[^']*'", content))
-                double_quote_count += len(re.findall(r'"[^"]*"', content))
+                # 引号对数量：定长字符计数即可，无需正则
+                single_quote_count += content.count("'") // 2
+                double_quote_count += content.count('"') // 2
                 type_hint_count += len(re.findall(r':\s*\w+', content))
                 triple_double_count += len(re.findall(r'"""[\s\S]*?"""', content))
                 triple_single_count += len(re.findall(r"'''[\s\S]*?'''", content))
@@ -368,39 +434,50 @@ class PromptOptimizer:
             'line_length': 'standard',
         }
 
-        # 检测缩进
+        # 检测缩进：逐行读取每个文件的前 200 行，确定后立即返回
         for file_path in self.project_path.rglob('*.{py,ts,tsx,js,jsx,go,rs}'):
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-
-                for line in lines:
-                    if line.strip() and line.startswith(' '):
-                        indent_size = len(line) - len(line.lstrip())
-                        if indent_size == 2:
-                            style['indentation'] = '2_spaces'
-                            break
-                        elif indent_size == 4:
-                            style['indentation'] = '4_spaces'
-                            break
-                        elif indent_size == 8:
-                            style['indentation'] = 'tabs'
+                    for i, line in enumerate(f):
+                        if i >= 200:
                             break
+                        if line.strip() and line.startswith(' '):
+                            indent_size = len(line) - len(line.lstrip())
+                            if indent_size == 2:
+                                style['indentation'] = '2_spaces'
+                                return style
+                            elif indent_size == 4:
+                                style['indentation'] = '4_spaces'
+                                return style
+                            elif indent_size == 8:
+                                style['indentation'] = 'tabs'
+                                return style
 
             except Exception as e:
                 logger.warning(f"分析文件 {file_path} 失败: {e}")
 
-            if style['indentation'] != 'unknown':
-                break
-
         return style
 
+    def _scan_root_entries(self) -> Dict[str, bool]:
+        """列出项目根目录条目，返回 {名称: 是否为目录}"""
+        entries = {}
+        try:
+            with os.scandir(self.project_path) as it:
+                for entry in it:
+                    try:
+                        entries[entry.name] = entry.is_dir()
+                    except OSError:
+                        entries[entry.name] = False
+        except OSError as e:
+            logger.warning(f"读取项目根目录失败: {e}")
+        return entries
+
     def _detect_architecture_patterns(self) -> List[str]:
         """检测架构模式"""
         patterns = []
 
         # 检查目录结构
-        dirs = [d.name for d in self.project_path.iterdir() if d.is_dir()]
+        dirs = {name for name, is_dir in self._root_entries.items() if is_dir}
 
         # MVC 模式
         if any(d in dirs for d in ['models', 'views', 'controllers']):
@@ -430,28 +507,17 @@ class PromptOptimizer:
 
     def _read_project_config(self) -> Dict[str, Any]:
         """读取项目配置"""
+        names = self._root_entries.keys()
+
+        # 检查常见文件和 CI/CD 配置
         config = {
             'name': self.project_path.name,
-            'has_git': (self.project_path / '.git').exists(),
-            'has_readme': False,
-            'has_license': False,
-            'has_ci_cd': False,
+            'has_git': '.git' in names,
+            'has_readme': 'README.md' in names,
+            'has_license': 'LICENSE' in names,
+            'has_ci_cd': not _CI_CD_FILES.isdisjoint(names),
         }
 
-        # 检查常见文件
-        if (self.project_path / 'README.md').exists():
-            config['has_readme'] = True
-
-        if (self.project_path / 'LICENSE').exists():
-            config['has_license'] = True
-
-        # 检查 CI/CD 配置
-        ci_files = ['.github', '.gitlab-ci.yml', '.travis.yml', 'Jenkinsfile', 'azure-pipelines.yml']
-        for ci_file in ci_files:
-            if (self.project_path / ci_file).exists():
-                config['has_ci_cd'] = True
-                break
-
         return config
 
     def analyze_user_intent(self, user_input: str) -> Dict[str, Any]:
@@ -524,11 +590,11 @@ class PromptOptimizer:
 
         # 提取实体（如具体的函数名、类名等）
         # 匹配驼峰命名、下划线命名和中文实体
-        entities = re.findall(r'\b([A-Z][a-zA-Z0-9]*|[a-z_][a-z0-9_]*|[\u4e00-\u9fa5]+)\b', user_input)
-        # 过滤掉常见词汇
-        stop_words = {'的', '我', '你', '他', '她', '它', '是', '在', '有', '不', '了', '着', '过', '和', '与', '或', '但', '而', '因为', '所以', '如果', '那么', 'this', 'that', 'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare', 'ought', 'used', 'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by', 'from', 'as', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'between', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when', 'where', 'why', 'how', 'all', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'also', 'now'}
-        filtered_entities = [e for e in entities if e.lower() not in stop_words and len(e) > 1]
-        intent['entities'] = list(set(filtered_entities))[:5]  # 限制数量
+        # 长度限制由正则完成，停用词在迭代中过滤
+        filtered_entities = (
+            e for e in _ENTITY_RE.findall(user_input) if e.lower() not in _STOP_WORDS
+        )
+        intent['entities'] = list(dict.fromkeys(filtered_entities))[:5]  # 去重并限制数量
 
         logger.info(f"意图分析完成: {intent['type']}, 关键词: {intent['keywords']}, 实体: {intent['entities']}")
         return intent
@@ -546,59 +612,51 @@ class PromptOptimizer:
         """
         logger.info("查找相关代码...")
 
-        relevant_code = []
+        # 去重并限制数量，找到 5 个后立即停止
+        seen = set()
+        unique_code = []
+        with self._lock:
+            for code_type, item in self._iter_relevant_code(intent):
+                key = (code_type, item['name'], item['file'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                code = {'type': code_type, 'name': item['name'], 'file': item['file']}
+                if code_type == 'function':
+                    code['params'] = item.get('params', '')
+                unique_code.append(code)
+                if len(unique_code) == 5:  # 最多返回 5 个
+                    break
+
+        logger.info(f"找到 {len(unique_code)} 个相关代码片段")
+        return unique_code
+
+    def _iter_relevant_code(self, intent: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """按优先级依次产出 (类型, 函数/类信息)，由调用方决定何时停止"""
+        keywords_lc = [k.lower() for k in intent.get('keywords', [])]
+        entities_lc = [e.lower() for e in intent.get('entities', [])]
 
         # 根据关键词查找相关函数
-        for keyword in intent.get('keywords', []):
+        for keyword in keywords_lc:
             for func in self.relevant_functions:
-                if keyword.lower() in func['name'].lower():
-                    relevant_code.append({
-                        'type': 'function',
-                        'name': func['name'],
-                        'file': func['file'],
-                        'params': func.get('params', '')
-                    })
+                if keyword in func['name_lc']:
+                    yield 'function', func
 
         # 根据关键词查找相关类
-        for keyword in intent.get('keywords', []):
+        for keyword in keywords_lc:
             for cls in self.relevant_classes:
-                if keyword.lower() in cls['name'].lower():
-                    relevant_code.append({
-                        'type': 'class',
-                        'name': cls['name'],
-                        'file': cls['file']
-                    })
+                if keyword in cls['name_lc']:
+                    yield 'class', cls
 
         # 根据实体查找
-        for entity in intent.get('entities', []):
+        for entity in entities_lc:
             for func in self.relevant_functions:
-                if entity.lower() in func['name'].lower():
-                    relevant_code.append({
-                        'type': 'function',
-                        'name': func['name'],
-                        'file': func['file'],
-                        'params': func.get('params', '')
-                    })
+                if entity in func['name_lc']:
+                    yield 'function', func
 
             for cls in self.relevant_classes:
-                if entity.lower() in cls['name'].lower():
-                    relevant_code.append({
-                        'type': 'class',
-                        'name': cls['name'],
-                        'file': cls['file']
-                    })
-
-        # 去重并限制数量
-        seen = set()
-        unique_code = []
-        for code in relevant_code:
-            key = (code['type'], code['name'], code['file'])
-            if key not in seen:
-                seen.add(key)
-                unique_code.append(code)
-
-        logger.info(f"找到 {len(unique_code)} 个相关代码片段")
-        return unique_code[:5]  # 最多返回 5 个
+                if entity in cls['name_lc']:
+                    yield 'class', cls
 
     async def optimize_user_message(self, user_input: str, persona: str = "partner", iflow_client=None) -> Dict[str, Any]:
         """
@@ -614,15 +672,15 @@ class PromptOptimizer:
         """
         logger.info(f"开始智能优化用户消息: {user_input[:100]}...")
 
-        # 1. 分析用户意图
-        intent = self.analyze_user_intent(user_input)
+        # 1. 分析用户意图（CPU 密集，放到线程中避免阻塞事件循环）
+        intent = await asyncio.to_thread(self.analyze_user_intent, user_input)
 
         # 2. 查找相关代码
-        relevant_code = self.find_relevant_code(user_input, intent)
+        relevant_code = await asyncio.to_thread(self.find_relevant_code, user_input, intent)
 
-        # 3. 构建项目上下文
-        project_context = self._build_project_context()
-        style_guide = self._build_style_guide()
+        # 3. 获取项目上下文
+        project_context = self.get_project_context()
+        style_guide = self.get_style_guide()
 
         # 4. 使用大模型优化消息
         if iflow_client:
@@ -803,6 +861,18 @@ class PromptOptimizer:
 
         return '\n'.join(message_parts)
 
+    def get_project_context(self) -> str:
+        """获取项目上下文（优先使用 analyze_project 缓存的结果）"""
+        if self._project_context_cached is None:
+            self._project_context_cached = self._build_project_context()
+        return self._project_context_cached
+
+    def get_style_guide(self) -> str:
+        """获取代码风格指南（优先使用 analyze_project 缓存的结果）"""
+        if self._style_guide_cached is None:
+            self._style_guide_cached = self._build_style_guide()
+        return self._style_guide_cached
+
     def _build_project_context(self) -> str:
         """构建项目上下文"""
         context_parts = []
@@ -832,57 +902,80 @@ class PromptOptimizer:
         return '\n'.join(context_parts)
 
     def _build_style_guide(self) -> str:
-        """构建代码风格指南"""
-        guide_parts = []
-
-        guide_parts.append("\n## CODE STYLE GUIDE")
-
-        # TypeScript/JavaScript 风格
-        if self.code_style.get('typescript'):
-            ts_style = self.code_style['typescript']
-            guide_parts.append("\n### TypeScript/JavaScript Style:")
-
-            if ts_style.get('interface_vs_type') != 'unknown':
-                guide_parts.append(f"- Prefer {ts_style['interface_vs_type']} over type")
-
-            if ts_style.get('quote_style') != 'unknown':
-                guide_parts.append(f"- Use {ts_style['quote_style']} quotes")
-
-            if ts_style.get('semicolon_usage') != 'unknown':
-                guide_parts.append(f"- Semicolons: {ts_style['semicolon_usage']}")
-
-            if ts_style.get('const_vs_let') != 'unknown':
-                guide_parts.append(f"- Variable declaration: {ts_style['const_vs_let']}")
-
-        # Python 风格
-        if self.code_style.get('python'):
-            py_style = self.code_style['python']
-            guide_parts.append("\n### Python Style:")
-
-            if py_style.get('quote_style') != 'unknown':
-                guide_parts.append(f"- Use {py_style['quote_style']} quotes")
-
-            if py_style.get('type_hints'):
-                guide_parts.append("- Include type hints")
-
-            if py_style.get('docstring_style') != 'unknown':
-                guide_parts.append(f"- Use {py_style['docstring_style']} for docstrings")
-
-        # 通用风格
-        if self.code_style.get('general'):
-            general_style = self.code_style['general']
-            guide_parts.append("\n### General Style:")
-
-            if general_style.get('indentation') != 'unknown':
-                guide_parts.append(f"- Indentation: {general_style['indentation']}")
-
-        return '\n'.join(guide_parts)
-
-
-# 创建全局实例
-_prompt_optimizer_cache = {}
-
-
+        """构建代码风格指南（相同的风格特征复用已渲染的结果）"""
+        ts_style = self.code_style.get('typescript') or {}
+        py_style = self.code_style.get('python') or {}
+        general_style = self.code_style.get('general') or {}
+
+        return _render_style_guide(
+            (
+                ts_style.get('interface_vs_type'),
+                ts_style.get('quote_style'),
+                ts_style.get('semicolon_usage'),
+                ts_style.get('const_vs_let'),
+            ) if ts_style else None,
+            (
+                py_style.get('quote_style'),
+                bool(py_style.get('type_hints')),
+                py_style.get('docstring_style'),
+            ) if py_style else None,
+            (general_style.get('indentation'),) if general_style else None,
+        )
+
+
+@lru_cache(maxsize=64)
+def _render_style_guide(
+    ts_style: Optional[Tuple[Any, ...]],
+    py_style: Optional[Tuple[Any, ...]],
+    general_style: Optional[Tuple[Any, ...]],
+) -> str:
+    """根据风格特征元组渲染代码风格指南"""
+    guide_parts = [_STYLE_GUIDE_HEADER]
+
+    # TypeScript/JavaScript 风格
+    if ts_style is not None:
+        interface_vs_type, quote_style, semicolon_usage, const_vs_let = ts_style
+        guide_parts.append(_TS_STYLE_HEADER)
+
+        if interface_vs_type != 'unknown':
+            guide_parts.append(f"- Prefer {interface_vs_type} over type")
+
+        if quote_style != 'unknown':
+            guide_parts.append(f"- Use {quote_style} quotes")
+
+        if semicolon_usage != 'unknown':
+            guide_parts.append(f"- Semicolons: {semicolon_usage}")
+
+        if const_vs_let != 'unknown':
+            guide_parts.append(f"- Variable declaration: {const_vs_let}")
+
+    # Python 风格
+    if py_style is not None:
+        quote_style, type_hints, docstring_style = py_style
+        guide_parts.append(_PY_STYLE_HEADER)
+
+        if quote_style != 'unknown':
+            guide_parts.append(f"- Use {quote_style} quotes")
+
+        if type_hints:
+            guide_parts.append(_TYPE_HINTS_LINE)
+
+        if docstring_style != 'unknown':
+            guide_parts.append(f"- Use {docstring_style} for docstrings")
+
+    # 通用风格
+    if general_style is not None:
+        (indentation,) = general_style
+        guide_parts.append(_GENERAL_STYLE_HEADER)
+
+        if indentation != 'unknown':
+            guide_parts.append(f"- Indentation: {indentation}")
+
+    return '\n'.join(guide_parts)
+
+
+# 创建全局实例（LRU 限制缓存数量，避免长时间运行时无限增长）
+@lru_cache(maxsize=128)
 def get_prompt_optimizer(project_path: str) -> PromptOptimizer:
     """
     获取提示词优化器实例（带缓存）
@@ -893,6 +986,4 @@ def get_prompt_optimizer(project_path: str) -> PromptOptimizer:
     Returns:
         PromptOptimizer 实例
     """
-    if project_path not in _prompt_optimizer_cache:
-        _prompt_optimizer_cache[project_path] = PromptOptimizer(project_path)
-    return _prompt_optimizer_cache[project_path]
+    return PromptOptimizer(project_path)
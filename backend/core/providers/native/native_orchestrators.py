@@ -1,15 +1,54 @@
 from __future__ import annotations
 
 import asyncio
+import importlib
 import os
-from typing import Any, AsyncGenerator, Dict, List, Optional, Union
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, Union
 
+from ..provider_status import _ORCHESTRATION_ALIASES, _availability
 
+# 已加载的 SDK 符号缓存：key -> 符号元组；导入失败时缓存 None，避免每次调用重复导入
+_LAZY: Dict[str, Optional[Tuple[Any, ...]]] = {}
+
+
+def _load(key: str, *specs: Tuple[str, Optional[str]]) -> Optional[Tuple[Any, ...]]:
+    """按 (模块, 属性) 列表只导入一次 SDK 符号；属性为 None 时返回模块本身。"""
+    if key in _LAZY:
+        return _LAZY[key]
+    try:
+        loaded: Optional[Tuple[Any, ...]] = tuple(
+            importlib.import_module(module) if attr is None else getattr(importlib.import_module(module), attr)
+            for module, attr in specs
+        )
+    except Exception:
+        loaded = None
+    _LAZY[key] = loaded
+    return loaded
+
+
+@lru_cache(maxsize=64)
 def _has_env(*names: str) -> bool:
-    for n in names:
-        if not os.getenv(n):
-            return False
-    return True
+    """进程内缓存环境变量检查结果；运行时修改环境变量后需调用 clear_cache()。"""
+    return all(os.environ.get(n) for n in names)
+
+
+def clear_cache() -> None:
+    """清除已加载的 SDK 符号（含导入失败的记录）和环境变量检查缓存，安装/卸载 SDK 后重新导入。"""
+    _LAZY.clear()
+    _has_env.cache_clear()
+    # 让导入系统重新扫描 sys.path，识别运行期间新安装的包
+    importlib.invalidate_caches()
+
+
+@lru_cache(maxsize=32)
+def _render_tools_hint(tools: Tuple[Tuple[str, str], ...]) -> str:
+    return "\n".join([f"- {name}: {description}" for name, description in tools])
+
+
+def _tools_hint(tool_specs: List[Any]) -> str:
+    """渲染工具说明；按工具的 (名称, 描述) 缓存，不同代理或修改过的工具列表互不影响。"""
+    return _render_tools_hint(tuple((t.name, t.description) for t in tool_specs))
 
 
 async def run_semantic_kernel(
@@ -19,13 +58,15 @@ async def run_semantic_kernel(
     memory_context: str,
     max_rounds: int,
 ) -> Optional[str]:
-    try:
-        import semantic_kernel as sk  # noqa: F401
-        from semantic_kernel import Kernel
-        from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-        from semantic_kernel.functions import KernelArguments
-    except Exception:
+    mods = _load(
+        "semantic_kernel",
+        ("semantic_kernel", "Kernel"),
+        ("semantic_kernel.connectors.ai.open_ai", "OpenAIChatCompletion"),
+        ("semantic_kernel.functions", "KernelArguments"),
+    )
+    if mods is None:
         return None
+    Kernel, OpenAIChatCompletion, KernelArguments = mods
 
     if not _has_env("OPENAI_API_KEY", "OPENAI_CHAT_MODEL_ID"):
         return None
@@ -33,14 +74,15 @@ async def run_semantic_kernel(
     kernel = Kernel()
     kernel.add_service(OpenAIChatCompletion())
 
-    tools_hint = "\n".join([f"- {t.name}: {t.description}" for t in tool_specs])
-    prompt = (
-        "你是一个编排代理。优先使用工具完成任务。\n"
-        f"可用工具：\n{tools_hint}\n\n"
-        f"长期记忆：\n{memory_context}\n\n"
-        f"检索上下文：\n{rag_context}\n\n"
-        f"用户问题：{query}\n"
-        "请输出最终答案。"
+    prompt = "".join(
+        (
+            "你是一个编排代理。优先使用工具完成任务。\n",
+            "可用工具：\n", _tools_hint(tool_specs), "\n\n",
+            "长期记忆：\n", memory_context or "", "\n\n",
+            "检索上下文：\n", rag_context or "", "\n\n",
+            "用户问题：", query, "\n",
+            "请输出最终答案。",
+        )
     )
     fn = kernel.add_function(
         plugin_name="orchestrator",
@@ -61,11 +103,10 @@ async def run_autogen(
     memory_context: str,
     max_rounds: int,
 ) -> Optional[str]:
-    try:
-        import autogen  # noqa: F401
-        from autogen import AssistantAgent, UserProxyAgent
-    except Exception:
+    mods = _load("autogen", ("autogen", "AssistantAgent"), ("autogen", "UserProxyAgent"))
+    if mods is None:
         return None
+    AssistantAgent, UserProxyAgent = mods
 
     if not _has_env("OPENAI_API_KEY"):
         return None
@@ -94,14 +135,17 @@ async def run_autogen(
         except Exception:
             continue
 
-    full = query
-    if memory_context:
-        full = f"长期记忆：\n{memory_context}\n\n" + full
+    parts = []
     if rag_context:
-        full = f"检索上下文：\n{rag_context}\n\n" + full
+        parts.append(f"检索上下文：\n{rag_context}\n\n")
+    if memory_context:
+        parts.append(f"长期记忆：\n{memory_context}\n\n")
+    parts.append(query)
+    full = "".join(parts)
 
     try:
-        user.initiate_chat(assistant, message=full)
+        # initiate_chat 是同步阻塞调用，放到线程中执行
+        await asyncio.to_thread(user.initiate_chat, assistant, message=full)
         msgs = assistant.chat_messages.get(user, [])
         texts = [m.get("content") for m in msgs if isinstance(m, dict) and m.get("content")]
         return "\n".join(texts).strip() if texts else None
@@ -116,18 +160,16 @@ async def run_crewai(
     memory_context: str,
     max_rounds: int,
 ) -> Optional[str]:
-    try:
-        from crewai import Agent, Crew, Task
-    except Exception:
+    mods = _load("crewai", ("crewai", "Agent"), ("crewai", "Crew"), ("crewai", "Task"))
+    if mods is None:
         return None
+    Agent, Crew, Task = mods
 
     if not _has_env("OPENAI_API_KEY"):
         return None
 
-    try:
-        from crewai_tools import BaseTool
-    except Exception:
-        BaseTool = None
+    tool_mods = _load("crewai_tools", ("crewai_tools", "BaseTool"))
+    BaseTool = tool_mods[0] if tool_mods is not None else None
 
     tools = []
     if BaseTool is not None:
@@ -148,15 +190,16 @@ async def run_crewai(
         tools=tools,
         verbose=False,
     )
-    ctx = ""
+    parts = []
     if memory_context:
-        ctx += f"长期记忆：\n{memory_context}\n\n"
+        parts.append(f"长期记忆：\n{memory_context}\n\n")
     if rag_context:
-        ctx += f"检索上下文：\n{rag_context}\n\n"
-    task = Task(description=ctx + query, agent=agent)
+        parts.append(f"检索上下文：\n{rag_context}\n\n")
+    parts.append(query)
+    task = Task(description="".join(parts), agent=agent)
     crew = Crew(agents=[agent], tasks=[task], verbose=False)
     try:
-        res = crew.kickoff()
+        res = await asyncio.to_thread(crew.kickoff)
         return str(res)
     except Exception:
         return None
@@ -169,13 +212,20 @@ async def run_swe_agent(
     memory_context: str,
     max_rounds: int,
 ) -> Optional[str]:
-    try:
-        import sweagent  # noqa: F401
-    except Exception:
+    if _load("swe_agent", ("sweagent", None)) is None:
         return None
     return None
 
 
+# 规范 provider 名称 -> 编排协程
+_DISPATCH = {
+    "semantic_kernel": run_semantic_kernel,
+    "autogen": run_autogen,
+    "crewai": run_crewai,
+    "swe_agent": run_swe_agent,
+}
+
+
 async def run_native_orchestrator(
     provider: str,
     query: str,
@@ -184,19 +234,22 @@ async def run_native_orchestrator(
     memory_context: str,
     max_rounds: int,
 ) -> Optional[str]:
-    provider = (provider or "").strip().lower()
-    if provider in ("semantic_kernel", "sk"):
-        return await run_semantic_kernel(query, tool_specs, rag_context, memory_context, max_rounds)
-    if provider == "autogen":
-        return await run_autogen(query, tool_specs, rag_context, memory_context, max_rounds)
-    if provider == "crewai":
-        return await run_crewai(query, tool_specs, rag_context, memory_context, max_rounds)
-    if provider in ("swe_agent", "sweagent"):
-        return await run_swe_agent(query, tool_specs, rag_context, memory_context, max_rounds)
-    return None
+    canonical = _ORCHESTRATION_ALIASES.get((provider or "").strip().lower())
+    fn = _DISPATCH.get(canonical)
+    # SDK 未安装时直接返回，不进入具体编排函数
+    if fn is None or not _availability().get(canonical, False):
+        return None
+    return await fn(query, tool_specs, rag_context, memory_context, max_rounds)
 
 
 async def stream_text(text: str, chunk_size: int = 800) -> AsyncGenerator[str, None]:
-    for i in range(0, len(text or ""), chunk_size):
-        yield (text or "")[i : i + chunk_size]
+    t = text or ""
+    n = len(t)
+    if n <= chunk_size:
+        # 短文本（常见情况）直接整体返回，无需切片
+        if t:
+            yield t
+        return
+    for i in range(0, n, chunk_size):
+        yield t[i : i + chunk_size]
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
 from dataclasses import dataclass
 from typing import List
 
@@ -19,7 +20,9 @@ def _split_list(value: str) -> List[str]:
     return [p for p in parts if p]
 
 
+@lru_cache(maxsize=None)
 def get_provider_config() -> ProviderConfig:
+    """读取一次环境变量并缓存；修改环境变量后需调用 refresh()。"""
     orchestration_provider = os.getenv("ORCHESTRATOR_PROVIDER", "langchain").strip().lower()
     orchestration_fallback = _split_list(os.getenv("ORCHESTRATOR_FALLBACK", "langchain,json"))
     memory_provider = os.getenv("MEMORY_PROVIDER", "business").strip().lower()
@@ -33,3 +36,8 @@ def get_provider_config() -> ProviderConfig:
         rag_backend=rag_backend,
     )
 
+
+
+def refresh() -> None:
+    """清除缓存的 provider 配置（主要用于测试或运行时修改环境变量后）。"""
+    get_provider_config.cache_clear()
@@ -1,71 +1,101 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from importlib.util import find_spec
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, Tuple
 
+from . import provider_config
 from .provider_config import get_provider_config
 
 
+@dataclass(frozen=True)
+class _ProviderSpec:
+    # 额外别名（规范名称本身总是可用）
+    aliases: Tuple[str, ...]
+    # 探测的模块，任一存在即视为已安装；为空表示不需要 SDK
+    modules: Tuple[str, ...]
+    # 兼容规则：native=需要本身的 SDK；langchain=缺失时可由 LangChain 兜底；always=总是兼容
+    compat: str
+    # 是否可作为编排 provider
+    orchestrator: bool
+
+
+_PROVIDERS: Dict[str, _ProviderSpec] = {
+    "langchain": _ProviderSpec(("lc",), ("langchain", "langchain_core"), "native", True),
+    "json": _ProviderSpec(("legacy_json",), (), "always", True),
+    "semantic_kernel": _ProviderSpec(("sk",), ("semantic_kernel",), "langchain", True),
+    "autogen": _ProviderSpec((), ("autogen",), "langchain", True),
+    "crewai": _ProviderSpec((), ("crewai",), "langchain", True),
+    "memgpt": _ProviderSpec((), ("memgpt",), "always", False),
+    "guidance": _ProviderSpec((), ("guidance",), "always", False),
+    "dspy": _ProviderSpec((), ("dspy",), "always", False),
+    "swe_agent": _ProviderSpec(("sweagent",), ("sweagent",), "langchain", True),
+    "llamaindex": _ProviderSpec((), ("llama_index",), "native", False),
+}
+
+# 编排 provider 别名 -> 规范名称
+_ORCHESTRATION_ALIASES: Dict[str, str] = {
+    alias: canon
+    for canon, spec in _PROVIDERS.items()
+    if spec.orchestrator
+    for alias in (canon, *spec.aliases)
+}
+
+
+@lru_cache(maxsize=None)
 def _has(module: str) -> bool:
     return find_spec(module) is not None
 
 
-def provider_availability() -> Dict[str, bool]:
+@lru_cache(maxsize=None)
+def _availability() -> Dict[str, bool]:
     return {
-        "langchain": _has("langchain") or _has("langchain_core"),
-        "semantic_kernel": _has("semantic_kernel"),
-        "autogen": _has("autogen"),
-        "crewai": _has("crewai"),
-        "memgpt": _has("memgpt"),
-        "guidance": _has("guidance"),
-        "dspy": _has("dspy"),
-        "swe_agent": _has("sweagent"),
-        "llamaindex": _has("llama_index"),
+        canon: any(_has(m) for m in spec.modules)
+        for canon, spec in _PROVIDERS.items()
+        if spec.modules
     }
 
 
+def _compatibility(avail: Dict[str, bool]) -> Dict[str, bool]:
+    langchain = avail.get("langchain", False)
+    compatible = {}
+    for canon, spec in _PROVIDERS.items():
+        if spec.compat == "always":
+            compatible[canon] = True
+        elif spec.compat == "langchain":
+            compatible[canon] = avail.get(canon, False) or langchain
+        else:
+            compatible[canon] = avail.get(canon, False)
+    return compatible
+
+
+def provider_availability() -> Dict[str, bool]:
+    """各 provider 的 SDK 是否已安装；进程内只探测一次，返回副本供调用方修改。"""
+    return dict(_availability())
+
+
+def refresh() -> None:
+    """清除可用性与配置缓存（安装/卸载 SDK 或修改环境变量后调用）。"""
+    from .native import native_orchestrators
+
+    _has.cache_clear()
+    _availability.cache_clear()
+    native_orchestrators.clear_cache()
+    provider_config.refresh()
+
+
 def effective_provider_plan() -> Dict:
     cfg = get_provider_config()
     avail = provider_availability()
-    compatible = {
-        "langchain": avail.get("langchain", False),
-        "json": True,
-        "semantic_kernel": avail.get("semantic_kernel", False) or avail.get("langchain", False),
-        "autogen": avail.get("autogen", False) or avail.get("langchain", False),
-        "crewai": avail.get("crewai", False) or avail.get("langchain", False),
-        "memgpt": True,
-        "guidance": True,
-        "dspy": True,
-        "swe_agent": avail.get("swe_agent", False) or avail.get("langchain", False),
-        "llamaindex": avail.get("llamaindex", False),
-    }
+    compatible = _compatibility(avail)
     candidates = [cfg.orchestration_provider] + [p for p in cfg.orchestration_fallback if p != cfg.orchestration_provider]
     chosen = None
     for c in candidates:
-        if c in ("json", "legacy_json"):
-            if compatible.get("json"):
-                chosen = "json"
-                break
-        if c in ("langchain", "lc"):
-            if compatible.get("langchain"):
-                chosen = "langchain"
-                break
-        if c in ("sk", "semantic_kernel"):
-            if compatible.get("semantic_kernel"):
-                chosen = "semantic_kernel"
-                break
-        if c in ("autogen",):
-            if compatible.get("autogen"):
-                chosen = "autogen"
-                break
-        if c in ("crewai",):
-            if compatible.get("crewai"):
-                chosen = "crewai"
-                break
-        if c in ("swe_agent", "sweagent"):
-            if compatible.get("swe_agent"):
-                chosen = "swe_agent"
-                break
+        canon = _ORCHESTRATION_ALIASES.get(c)
+        if canon is not None and compatible.get(canon):
+            chosen = canon
+            break
     if not chosen:
         chosen = "json"
 
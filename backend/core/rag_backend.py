@@ -1,8 +1,57 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import math
 import os
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("RAGBackend")
+
+# LlamaIndex 索引的后台构建线程
+_INDEX_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llamaindex-build")
+
+# format_context 中每条结果保留的最大字符数
+_MAX_CONTENT_CHARS = 2000
+
+# 持久化索引目录中记录项目文件指纹的文件名
+_FINGERPRINT_FILE = "fingerprint"
+
+# 检索缓存的默认 TTL（秒），RAG_CACHE_TTL 未设置或无效时使用
+_DEFAULT_CACHE_TTL = 300.0
+
+
+def _directory_fingerprint(root: str, exclude: str) -> str:
+    """
+    目录下文件的路径、大小和修改时间摘要，文件增删改后随之变化
+
+    与 SimpleDirectoryReader 的默认行为一致跳过隐藏文件和目录；exclude 目录（索引自身的
+    持久化目录）不计入。
+    """
+    exclude = os.path.abspath(exclude)
+    digest = hashlib.blake2b(digest_size=16)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if not d.startswith(".") and os.path.abspath(os.path.join(dirpath, d)) != exclude
+        )
+        for name in sorted(filenames):
+            if name.startswith("."):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest.update(
+                f"{os.path.relpath(path, root)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", "surrogateescape")
+            )
+    return digest.hexdigest()
 
 
 class RAGBackend(ABC):
@@ -21,13 +70,29 @@ class LegacyRAGBackend(RAGBackend):
 
         self.project_path = project_path
         self._service = get_rag_service(project_path, use_chromadb=False)
+        self._service_version = self._service.index_version
+
+    @property
+    def index_version(self) -> int:
+        """项目索引的版本号，其他 RAGService 实例重新索引或增删文档后变化"""
+        return self._service.index_version
 
     def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        version = self._service.index_version
+        if version != self._service_version:
+            # 索引已被其他实例更新，重新创建服务以加载磁盘上的新索引
+            from backend.core.rag_service import get_rag_service
+
+            self._service = get_rag_service(self.project_path, use_chromadb=False)
+            self._service_version = version
         return self._service.retrieve(query, n_results=top_k)
 
     def format_context(self, results: List[Dict[str, Any]]) -> str:
-        lines: List[str] = []
-        for i, r in enumerate(results or []):
+        return "\n\n".join(self._iter_context_blocks(results or [])).strip()
+
+    @staticmethod
+    def _iter_context_blocks(results: List[Dict[str, Any]]):
+        for i, r in enumerate(results):
             meta = r.get("metadata") if isinstance(r, dict) else {}
             file_path = ""
             if isinstance(meta, dict):
@@ -37,11 +102,13 @@ class LegacyRAGBackend(RAGBackend):
             head = f"[{i + 1}] {file_path}".strip()
             if score is not None:
                 head = f"{head} (score={score})"
-            lines.append(head)
-            if content:
-                lines.append(content[:2000])
-            lines.append("")
-        return "\n".join(lines).strip()
+            if not content:
+                yield head
+                continue
+            # 仅在超长时截断，避免为短内容额外复制
+            if len(content) > _MAX_CONTENT_CHARS:
+                content = content[:_MAX_CONTENT_CHARS]
+            yield f"{head}\n{content}"
 
 
 class LlamaIndexRAGBackend(RAGBackend):
@@ -52,16 +119,65 @@ class LlamaIndexRAGBackend(RAGBackend):
         except Exception as e:
             raise ImportError("llama_index not installed") from e
 
+        from backend.core.rag_service import _project_storage_dir
+
         self._index = None
+        self.persist_dir = os.path.join(_project_storage_dir(project_path), "llamaindex")
+        # 后台加载/构建索引，避免首次检索时同步阻塞；构建失败后置为 None，下次检索时重新提交
+        self._future_lock = threading.Lock()
+        self._index_future: Optional[Future] = _INDEX_EXECUTOR.submit(self._build_index)
 
-    def _ensure_index(self):
-        if self._index is not None:
-            return
-        from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
+    def _build_index(self):
+        from llama_index.core import (
+            SimpleDirectoryReader,
+            StorageContext,
+            VectorStoreIndex,
+            load_index_from_storage,
+        )
+
+        # 持久化的索引只在项目文件未变化时复用，否则重新构建
+        fingerprint = _directory_fingerprint(self.project_path, self.persist_dir)
+        fingerprint_path = os.path.join(self.persist_dir, _FINGERPRINT_FILE)
+        if os.path.isdir(self.persist_dir):
+            try:
+                with open(fingerprint_path, "r", encoding="utf-8") as f:
+                    stored = f.read().strip()
+            except OSError:
+                stored = None
+            if stored == fingerprint:
+                try:
+                    storage_context = StorageContext.from_defaults(persist_dir=self.persist_dir)
+                    return load_index_from_storage(storage_context)
+                except Exception as e:
+                    logger.warning(f"Failed to load LlamaIndex index from {self.persist_dir}, rebuilding: {e}")
 
         reader = SimpleDirectoryReader(self.project_path, recursive=True, required_exts=None)
         docs = reader.load_data()
-        self._index = VectorStoreIndex.from_documents(docs)
+        index = VectorStoreIndex.from_documents(docs)
+        try:
+            index.storage_context.persist(persist_dir=self.persist_dir)
+            # 索引写完后再写指纹，持久化中途失败时不会误用不完整的索引
+            with open(fingerprint_path, "w", encoding="utf-8") as f:
+                f.write(fingerprint)
+        except Exception as e:
+            logger.warning(f"Failed to persist LlamaIndex index to {self.persist_dir}: {e}")
+        return index
+
+    def _ensure_index(self):
+        if self._index is not None:
+            return
+        with self._future_lock:
+            if self._index_future is None:
+                self._index_future = _INDEX_EXECUTOR.submit(self._build_index)
+            future = self._index_future
+        try:
+            self._index = future.result()
+        except Exception:
+            # 不保留失败的结果，下次检索时重新构建
+            with self._future_lock:
+                if self._index_future is future:
+                    self._index_future = None
+            raise
 
     def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         self._ensure_index()
@@ -73,16 +189,92 @@ class LlamaIndexRAGBackend(RAGBackend):
         return "\n\n".join([str(r.get("content") or "") for r in (results or [])]).strip()
 
 
+class CachedRAGBackend(RAGBackend):
+    """
+    在任意 RAGBackend 前加一层精确匹配的 LRU 缓存（带 TTL）
+
+    inner 提供 index_version 时，版本变化（重新索引、增删文档）后整个缓存失效。
+    """
+
+    def __init__(self, inner: RAGBackend, maxsize: int = 512, ttl: float = _DEFAULT_CACHE_TTL):
+        self.inner = inner
+        self.project_path = getattr(inner, "project_path", None)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # retrieve 可能在 asyncio.to_thread 的工作线程中并发调用
+        self._lock = threading.Lock()
+        self._exact: "OrderedDict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._index_version = getattr(inner, "index_version", None)
+
+    @staticmethod
+    def _key(query: str, top_k: int) -> Tuple[str, int]:
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()[:16], top_k
+
+    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        key = self._key(query, top_k)
+        now = time.monotonic()
+        version = getattr(self.inner, "index_version", None)
+        with self._lock:
+            if version != self._index_version:
+                self._exact.clear()
+                self._index_version = version
+            hit = self._exact.get(key)
+            if hit is not None:
+                stored_at, results = hit
+                if now - stored_at <= self.ttl:
+                    self._exact.move_to_end(key)
+                    # 返回副本，调用方修改列表不会影响缓存
+                    return list(results)
+                del self._exact[key]
+
+        results = self.inner.retrieve(query, top_k=top_k)
+        with self._lock:
+            # 检索期间索引发生变化时不缓存这次的结果
+            if getattr(self.inner, "index_version", None) == version == self._index_version:
+                self._exact[key] = (now, list(results))
+                if len(self._exact) > self.maxsize:
+                    self._exact.popitem(last=False)
+        return results
+
+    def format_context(self, results: List[Dict[str, Any]]) -> str:
+        return self.inner.format_context(results)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._exact.clear()
+
+
+def _cache_ttl() -> float:
+    """读取 RAG_CACHE_TTL，非数字、负数或非有限值时回退到默认值"""
+    value = os.getenv("RAG_CACHE_TTL")
+    if not value:
+        return _DEFAULT_CACHE_TTL
+    try:
+        ttl = float(value)
+    except ValueError:
+        ttl = -1.0
+    if not math.isfinite(ttl) or ttl < 0:
+        logger.warning(f"Invalid RAG_CACHE_TTL={value!r}, using {_DEFAULT_CACHE_TTL:g}s")
+        return _DEFAULT_CACHE_TTL
+    return ttl
+
+
 def get_rag_backend(project_path: str) -> Optional[RAGBackend]:
     enabled = os.getenv("RAG_ENABLED", "true").lower() == "true"
     if not enabled:
         return None
 
     backend = os.getenv("RAG_BACKEND", "legacy").lower().strip()
+    inner: RAGBackend
     if backend in ("llamaindex", "llama"):
         try:
-            return LlamaIndexRAGBackend(project_path)
+            inner = LlamaIndexRAGBackend(project_path)
         except Exception:
-            return LegacyRAGBackend(project_path)
-    return LegacyRAGBackend(project_path)
+            inner = LegacyRAGBackend(project_path)
+    else:
+        inner = LegacyRAGBackend(project_path)
+
+    if os.getenv("RAG_CACHE_ENABLED", "true").lower() != "true":
+        return inner
+    return CachedRAGBackend(inner, ttl=_cache_ttl())
 
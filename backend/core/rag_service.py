@@ -4,13 +4,23 @@ RAG (Retrieval-Augmented Generation) 服务
 """
 
 import os
+import re
 import logging
 import hashlib
 import asyncio
+import heapq
+import threading
+import time
 from typing import List, Dict, Any, Optional, AsyncGenerator, Set
 from pathlib import Path
 from datetime import datetime
 import json
+from bisect import bisect_left
+from functools import lru_cache
+from collections import OrderedDict, defaultdict, deque
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
 # Word 文档支持
 try:
@@ -39,34 +49,133 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
 
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
+    from scipy.sparse import vstack, save_npz, load_npz
     import numpy as np
-    SKLEARN_AVAILABLE = True
+    # scikit-learn 导入耗时较长，这里只检测是否安装，由 TFIDFRetriever 在使用时导入
+    SKLEARN_AVAILABLE = find_spec("sklearn") is not None
 except ImportError:
-    logger.warning("scikit-learn not available. Install with: pip install scikit-learn")
     SKLEARN_AVAILABLE = False
 
+if not SKLEARN_AVAILABLE:
+    logger.warning("scikit-learn not available. Install with: pip install scikit-learn")
+
+try:
+    from blake3 import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# 项目 .gitignore 规则匹配（可选）
+try:
+    import pathspec
+    PATHSPEC_AVAILABLE = True
+except ImportError:
+    PATHSPEC_AVAILABLE = False
+
+# TF-IDF 打分/top-k 的 numba 内核（可选）
+try:
+    from backend.core._tfidf_numba import NUMBA_AVAILABLE
+    if NUMBA_AVAILABLE:
+        from backend.core._tfidf_numba import score_topk as _numba_score_topk, warmup as _numba_warmup
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # 导入新的代码分析器和智能分块器
 from backend.core.code_analyzer import CodeAnalyzer, analyze_code
+from backend.core.rag_backend import _cache_ttl
 from backend.core.smart_chunker import SmartChunker, chunk_content
 from backend.core.document_summarizer import DocumentSummarizer, summarize_document
 
 # 强制禁用 ChromaDB，只使用 TF-IDF
 CHROMADB_AVAILABLE = False  # 强制禁用 ChromaDB
 
+# 各项目索引内容的版本号（进程内共享，键为原始项目路径）：
+# 任一 RAGService 实例修改索引后递增，同一项目的其他实例和外部检索缓存据此发现索引已变化
+_INDEX_VERSIONS: Dict[str, int] = {}
+_INDEX_VERSIONS_LOCK = threading.Lock()
+
 
-# 模型缓存
+# 模型缓存：{(模型名称, 设备): 模型}
 _model_cache = {}
 
+# 倒数排名融合（RRF）的平滑常数 k
+_RRF_K = 60
 
-def read_file_content(file_path: str, extract_images: bool = False) -> Dict[str, Any]:
+# 写入 ChromaDB 的每批文档数
+_ADD_BATCH_SIZE = 100
+
+# 嵌入缓存的最大条目数（超出后按 LRU 淘汰）
+_EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+
+# 调试日志分隔线
+_LOG_SEPARATOR = "=" * 80
+
+# RAG 存储根目录
+_RAG_STORAGE_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "storage", "rag")
+
+# 二进制文件检测：ASCII 范围内的字节视为文本
+_TEXT_BYTES = bytes(range(128))
+
+# 文本分块的分割位置
+_SPLIT_BOUNDARY_RE = re.compile(r'[。.\n]')
+
+# 代码结构提取（整段内容一次扫描，按命名分组区分 def/class/import）
+_PY_STRUCT_RE = re.compile(
+    r'^[ \t]*(?:'
+    r'def[ \t]+(?P<function>\w+)'
+    r'|class[ \t]+(?P<class>\w+)'
+    r'|(?P<import>(?:import|from)[ \t][^\n]*)'
+    r')',
+    re.MULTILINE,
+)
+_JS_STRUCT_RE = re.compile(
+    r'^[ \t]*(?:'
+    r'(?P<function>(?:export[ \t]+(?:default[ \t]+)?)?(?:async[ \t]+)?function\b[^\n]*'
+    r'|(?:export[ \t]+)?(?:const|let|var)[ \t]+\w+[ \t]*=[ \t]*(?:async[ \t]*)?'
+    r'(?:\([^)\n]*\)|\w+)[ \t]*(?::[^=\n]*)?=>[^\n]*)'
+    r'|(?:export[ \t]+(?:default[ \t]+)?)?(?:abstract[ \t]+)?class[ \t]+(?P<class>[^{\n]*)'
+    r'|(?P<import>(?:import[ \t]|require\()[^\n]*)'
+    r')',
+    re.MULTILINE,
+)
+
+
+def _project_storage_dir(project_path: str) -> str:
+    """
+    获取项目的 RAG 存储目录（v2_<blake2b>）
+    
+    首次使用时将旧版以 MD5 命名的目录迁移过来，保留已有索引。
+    """
+    storage_dir = os.path.join(
+        _RAG_STORAGE_ROOT,
+        f"v2_{hashlib.blake2b(project_path.encode(), digest_size=16).hexdigest()}"
+    )
+    if not os.path.isdir(storage_dir):
+        legacy_dir = os.path.join(_RAG_STORAGE_ROOT, hashlib.md5(project_path.encode()).hexdigest())
+        if os.path.isdir(legacy_dir):
+            try:
+                os.replace(legacy_dir, storage_dir)
+                logger.info(f"Migrated RAG storage: {legacy_dir} -> {storage_dir}")
+            except OSError as e:
+                logger.warning(f"Failed to migrate RAG storage {legacy_dir}: {e}")
+                return legacy_dir
+    return storage_dir
+
+
+def read_file_content(
+    file_path: str,
+    extract_images: bool = False,
+    image_dir: Optional[str] = None,
+    inline: bool = False
+) -> Dict[str, Any]:
     """
     读取文件内容，支持多种格式（包括 Word 文档）
     
     Args:
         file_path: 文件路径
         extract_images: 是否提取图片
+        image_dir: 图片存储目录（按内容哈希命名，相同图片只写一次）
+        inline: 是否在结果中附带 base64 编码的图片数据
         
     Returns:
         包含内容和图片的字典
@@ -97,24 +206,36 @@ def read_file_content(file_path: str, extract_images: bool = False) -> Dict[str,
             
             # 提取图片
             if extract_images:
-                import io
-                import base64
                 for rel in doc.part.rels.values():
                     if "image" in rel.target_ref:
                         try:
                             image_data = rel.target_part.blob
-                            # 转换为 base64
-                            image_base64 = base64.b64encode(image_data).decode('utf-8')
                             # 尝试获取图片类型
                             image_type = rel.target_ref.split('.')[-1].lower()
                             if image_type not in ['png', 'jpg', 'jpeg', 'gif', 'bmp']:
                                 image_type = 'png'
                             
-                            images.append({
-                                "data": image_base64,
+                            image_sha = hashlib.blake2b(image_data).hexdigest()[:24]
+                            image = {
+                                "path": None,
+                                "sha": image_sha,
                                 "type": image_type,
                                 "description": f"[图片: {rel.target_ref}]"
-                            })
+                            }
+                            
+                            # 按内容哈希写入存储目录，已存在则跳过
+                            if image_dir:
+                                image_path = Path(image_dir) / f"{image_sha}.{image_type}"
+                                if not image_path.exists():
+                                    image_path.parent.mkdir(parents=True, exist_ok=True)
+                                    image_path.write_bytes(image_data)
+                                image["path"] = str(image_path)
+                            
+                            if inline:
+                                import base64
+                                image["data"] = base64.b64encode(image_data).decode('utf-8')
+                            
+                            images.append(image)
                             
                             # 在内容中添加图片占位符
                             content.append(f"[图片: {rel.target_ref}]")
@@ -151,6 +272,22 @@ def read_file_content(file_path: str, extract_images: bool = False) -> Dict[str,
         raise
 
 
+@lru_cache(maxsize=None)
+def _get_embedding_device() -> str:
+    """选择嵌入模型的运行设备：CUDA > MPS > CPU（每个进程只探测一次）"""
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+
 def get_embedding_model(model_name: str = "paraphrase-multilingual-MiniLM-L12-v2"):
     """
     获取或缓存的嵌入模型
@@ -166,13 +303,18 @@ def get_embedding_model(model_name: str = "paraphrase-multilingual-MiniLM-L12-v2
     if not SENTENCE_TRANSFORMERS_AVAILABLE:
         return None
     
-    if model_name in _model_cache:
-        return _model_cache[model_name]
+    device = _get_embedding_device()
+    cache_key = (model_name, device)
+    if cache_key in _model_cache:
+        return _model_cache[cache_key]
     
     try:
-        model = SentenceTransformer(model_name)
-        _model_cache[model_name] = model
-        logger.info(f"Loaded and cached embedding model: {model_name}")
+        model = SentenceTransformer(model_name, device=device)
+        # GPU 上使用半精度推理
+        if device == "cuda":
+            model.half()
+        _model_cache[cache_key] = model
+        logger.info(f"Loaded and cached embedding model: {model_name} ({device})")
         return model
     except Exception as e:
         logger.error(f"Failed to load embedding model {model_name}: {e}")
@@ -192,8 +334,8 @@ class Document:
         self.doc_id = doc_id or self._generate_id()
     
     def _generate_id(self) -> str:
-        """生成文档 ID"""
-        content_hash = hashlib.md5(self.content.encode()).hexdigest()[:16]
+        """生成文档 ID（固定使用 blake2b，保证 ID 不随环境中安装的可选依赖变化）"""
+        content_hash = hashlib.blake2b(self.content.encode(), digest_size=8).hexdigest()
         return f"doc_{content_hash}"
     
     def to_dict(self) -> Dict[str, Any]:
@@ -214,7 +356,9 @@ class RAGIndexer:
         embedding_model: str = "paraphrase-multilingual-MiniLM-L12-v2",
         chunk_size: int = 1000,
         chunk_overlap: int = 100,
-        incremental: bool = True
+        incremental: bool = True,
+        embedding_batch_size: int = 64,
+        embedding_max_seq_length: int = 256
     ):
         """
         初始化索引器
@@ -225,43 +369,59 @@ class RAGIndexer:
             chunk_size: 文档分块大小
             chunk_overlap: 分块重叠大小
             incremental: 是否启用增量索引
+            embedding_batch_size: 嵌入生成的批大小
+            embedding_max_seq_length: 嵌入模型的最大 token 数（代码块通常较短）
         """
         self.project_path = project_path
         self.embedding_model_name = embedding_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.incremental = incremental
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_max_seq_length = embedding_max_seq_length
         
         self.embedding_model = None
         self._init_embedding_model()
         
+        # 嵌入缓存：{内容哈希: 向量}，首次生成嵌入时加载
+        self.embedding_cache: Optional[OrderedDict] = None
+        self._embedding_cache_dirty = False
+        
         # 初始化代码分析器、智能分块器和文档摘要器
         self.code_analyzer = CodeAnalyzer()
         self.smart_chunker = SmartChunker(chunk_size, 200, chunk_overlap)
         self.document_summarizer = DocumentSummarizer()
         
         # 支持的文件类型
-        self.supported_extensions = {
+        self.supported_extensions = frozenset({
             '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.go', '.rs',
             '.md', '.txt', '.rst', '.json', '.yaml', '.yml',
             '.html', '.css', '.scss', '.less',
             '.docx'  # Word 文档支持
-        }
+        })
         
         # 忽略的目录
-        self.ignore_dirs = {
+        self.ignore_dirs = frozenset({
             'node_modules', '__pycache__', '.git', '.vscode',
             'dist', 'build', 'target', 'venv', 'env', '.env'
-        }
+        })
         
         # 忽略的文件
-        self.ignore_files = {
+        self.ignore_files = frozenset({
             '.gitignore', '.env', '.DS_Store', 'package-lock.json',
             'yarn.lock', 'pnpm-lock.yaml'
-        }
+        })
+        
+        # 项目 .gitignore 规则（编译一次，遍历时用于剪枝目录和过滤文件）
+        self._ignore_spec = self._load_ignore_spec()
+        
+        # 存储目录（项目路径在对象生命周期内不变，只计算一次）
+        self.storage_dir = _project_storage_dir(project_path)
         
         # 文件哈希缓存（用于增量索引）
+        # 格式：{相对路径: {"mtime": ns, "size": 字节数, "sha": 内容哈希}}，旧版为 MD5 字符串
         self.file_hashes = {}
+        self._file_hashes_dirty = False
         self._load_file_hashes()
     
     def _init_embedding_model(self):
@@ -270,21 +430,21 @@ class RAGIndexer:
             logger.warning("Sentence transformers not available, embedding generation will be disabled")
             return
         
-        try:
-            # 使用多语言模型支持中英文
-            self.embedding_model = SentenceTransformer(self.embedding_model_name)
-            logger.info(f"Embedding model loaded: {self.embedding_model_name}")
-        except Exception as e:
-            logger.error(f"Failed to load embedding model: {e}")
+        # 使用多语言模型支持中英文；模型按 (名称, 设备) 在进程内共享
+        self.embedding_model = get_embedding_model(self.embedding_model_name)
+        if self.embedding_model is None:
+            return
+        
+        # 显式限制序列长度，避免短代码块被填充到模型默认的最大长度
+        self.embedding_model.max_seq_length = min(
+            self.embedding_max_seq_length,
+            self.embedding_model.max_seq_length or self.embedding_max_seq_length
+        )
+        logger.info(f"Embedding model loaded: {self.embedding_model_name}")
     
     def _load_file_hashes(self):
         """加载文件哈希缓存"""
-        hash_file = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "..", "storage", "rag",
-            hashlib.md5(self.project_path.encode()).hexdigest(),
-            "file_hashes.json"
-        )
+        hash_file = os.path.join(self.storage_dir, "file_hashes.json")
         
         if os.path.exists(hash_file):
             try:
@@ -296,52 +456,129 @@ class RAGIndexer:
     
     def _save_file_hashes(self):
         """保存文件哈希缓存"""
-        hash_file = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "..", "storage", "rag",
-            hashlib.md5(self.project_path.encode()).hexdigest(),
-            "file_hashes.json"
-        )
+        hash_file = os.path.join(self.storage_dir, "file_hashes.json")
         
         os.makedirs(os.path.dirname(hash_file), exist_ok=True)
         
         try:
             with open(hash_file, 'w', encoding='utf-8') as f:
                 json.dump(self.file_hashes, f, indent=2)
+            self._file_hashes_dirty = False
             logger.info(f"Saved {len(self.file_hashes)} file hashes")
         except Exception as e:
             logger.error(f"Failed to save file hashes: {e}")
     
-    def _get_file_hash(self, file_path: str) -> str:
-        """计算文件哈希"""
+    def _get_file_hash(self, file_path: str, algorithm: str = "blake2b") -> str:
+        """计算文件哈希（分块流式读取）"""
         try:
             with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+                if hasattr(hashlib, "file_digest"):
+                    return hashlib.file_digest(f, algorithm).hexdigest()
+                h = hashlib.new(algorithm)
+                buf = bytearray(64 * 1024)
+                view = memoryview(buf)
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    h.update(view[:n])
+                return h.hexdigest()
         except Exception as e:
             logger.error(f"Failed to calculate hash for {file_path}: {e}")
             return ""
     
-    def _is_file_changed(self, file_path: str) -> bool:
-        """检查文件是否已更改"""
+    def _file_record(self, file_path: str, st: os.stat_result = None) -> Dict[str, Any]:
+        """生成文件指纹记录（mtime + 大小 + 内容哈希）"""
+        if st is None:
+            st = os.stat(file_path)
+        return {
+            "mtime": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha": self._get_file_hash(file_path),
+        }
+    
+    def _is_file_changed(self, file_path: str, st: os.stat_result = None) -> bool:
+        """
+        检查文件是否已更改
+        
+        先比较 mtime 和大小，一致时直接认为未变更；不一致时再比较内容哈希。
+        """
         if not self.incremental:
             return True
         
         rel_path = os.path.relpath(file_path, self.project_path)
-        current_hash = self._get_file_hash(file_path)
+        entry = self.file_hashes.get(rel_path)
+        if entry is None:
+            return True
         
-        if not current_hash:
+        try:
+            if st is None:
+                st = os.stat(file_path)
+        except OSError:
             return True
         
-        if rel_path not in self.file_hashes:
+        if isinstance(entry, str):
+            # 旧版记录只有 MD5：内容未变时升级为新格式，避免下次重复哈希
+            if self._get_file_hash(file_path, "md5") != entry:
+                return True
+            self.file_hashes[rel_path] = self._file_record(file_path, st)
+            self._file_hashes_dirty = True
+            return False
+        
+        if entry.get("mtime") == st.st_mtime_ns and entry.get("size") == st.st_size:
+            return False
+        
+        current_hash = self._get_file_hash(file_path)
+        if not current_hash or current_hash != entry.get("sha"):
             return True
         
-        return self.file_hashes[rel_path] != current_hash
+        # 内容未变（例如仅 touch）：刷新 mtime，下次走快速路径
+        entry["mtime"] = st.st_mtime_ns
+        self._file_hashes_dirty = True
+        return False
+    
+    def _changed_file_record(self, file_path: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        检查文件是否需要重新索引，需要时返回新的文件指纹记录
+        
+        每个文件只 stat 一次；mtime 和大小未变时不读取内容（正常编辑总会更新 mtime），
+        变化时最多计算一次内容哈希，并直接复用到返回的记录中。
+        
+        Returns:
+            新的指纹记录；文件未变更时返回 None
+        """
+        st = os.stat(file_path)
+        rel_path = os.path.relpath(file_path, self.project_path)
+        entry = self.file_hashes.get(rel_path) if self.incremental and not force else None
+        
+        if entry is None:
+            return self._file_record(file_path, st)
+        
+        if isinstance(entry, str):
+            # 旧版记录只有 MD5
+            if not self._is_file_changed(file_path, st):
+                return None
+            return self._file_record(file_path, st)
+        
+        if entry.get("mtime") == st.st_mtime_ns and entry.get("size") == st.st_size:
+            return None
+        
+        record = {"mtime": st.st_mtime_ns, "size": st.st_size, "sha": self._get_file_hash(file_path)}
+        if record["sha"] and record["sha"] == entry.get("sha"):
+            # 内容未变（例如仅 touch）：刷新 mtime，下次走快速路径
+            entry["mtime"] = st.st_mtime_ns
+            self._file_hashes_dirty = True
+            return None
+        return record
     
     def _split_text(self, text: str) -> List[str]:
         """将文本分割成块"""
         if len(text) <= self.chunk_size:
             return [text]
         
+        # 一次扫描得到所有可分割位置（句号或换行符），之后每块只需二分查找
+        boundaries = [m.start() for m in _SPLIT_BOUNDARY_RE.finditer(text)]
+        
         chunks = []
         start = 0
         
@@ -349,23 +586,19 @@ class RAGIndexer:
             # 计算结束位置
             end = start + self.chunk_size
             
-            # 如果不是最后一块，尝试在句号或换行符处分割
+            # 如果不是最后一块，尝试在 [start, end) 内最后一个分割位置处分割
             if end < len(text):
-                # 寻找最近的句号
-                last_period = text.rfind('。', start, end)
-                last_dot = text.rfind('.', start, end)
-                last_newline = text.rfind('\n', start, end)
-                
-                split_pos = max(last_period, last_dot, last_newline)
-                if split_pos > start:
-                    end = split_pos + 1
+                i = bisect_left(boundaries, end) - 1
+                if i >= 0 and boundaries[i] > start:
+                    end = boundaries[i] + 1
             
             chunk = text[start:end].strip()
             if chunk:
                 chunks.append(chunk)
             
-            # 移动到下一块（带重叠）
-            start = end - self.chunk_overlap
+            # 移动到下一块（带重叠）；分割点落在重叠区内时不重叠，避免原地打转
+            next_start = end - self.chunk_overlap
+            start = next_start if next_start > start else end
         
         return chunks
     
@@ -388,43 +621,87 @@ class RAGIndexer:
     
     def _extract_python_structure(self, content: str, structure: Dict[str, Any]):
         """提取 Python 代码结构"""
-        lines = content.split('\n')
-        
-        for line in lines:
-            # 提取函数定义
-            if line.strip().startswith('def '):
-                func_name = line.strip().split('(')[0].replace('def ', '').strip()
-                structure['functions'].append(func_name)
-            
-            # 提取类定义
-            elif line.strip().startswith('class '):
-                class_name = line.strip().split('(')[0].split(':')[0].replace('class ', '').strip()
-                structure['classes'].append(class_name)
-            
-            # 提取导入
-            elif line.strip().startswith('import ') or line.strip().startswith('from '):
-                structure['imports'].append(line.strip())
+        for m in _PY_STRUCT_RE.finditer(content):
+            kind = m.lastgroup
+            if kind == 'function':
+                structure['functions'].append(m.group('function'))
+            elif kind == 'class':
+                structure['classes'].append(m.group('class'))
+            else:
+                structure['imports'].append(m.group('import').strip())
     
     def _extract_javascript_structure(self, content: str, structure: Dict[str, Any]):
         """提取 JavaScript/TypeScript 代码结构"""
-        lines = content.split('\n')
+        for m in _JS_STRUCT_RE.finditer(content):
+            kind = m.lastgroup
+            if kind == 'function':
+                structure['functions'].append(m.group('function').strip()[:80])
+            elif kind == 'class':
+                structure['classes'].append(m.group('class').strip())
+            else:
+                structure['imports'].append(m.group('import').strip())
+    
+    def _load_ignore_spec(self):
+        """编译项目根目录 .gitignore 的规则；pathspec 未安装或文件不存在时返回 None"""
+        if not PATHSPEC_AVAILABLE:
+            return None
+        
+        gitignore = os.path.join(self.project_path, '.gitignore')
+        try:
+            with open(gitignore, 'r', encoding='utf-8', errors='ignore') as f:
+                return pathspec.GitIgnoreSpec.from_lines(f)
+        except OSError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to parse {gitignore}: {e}")
+            return None
+    
+    def _iter_project_files(self):
+        """
+        使用 os.scandir 单次遍历项目，按 os.walk 的顺序产出文件的 DirEntry
+        （DirEntry 缓存了 stat 信息，可避免重复的 stat 系统调用）
         
-        for line in lines:
-            # 提取函数定义
-            if 'function ' in line or '=> ' in line:
-                structure['functions'].append(line.strip()[:80])
+        跳过 ignore_dirs 中的目录以及项目 .gitignore 忽略的目录和文件。
+        """
+        spec = self._ignore_spec
+        # 栈中保存 (绝对路径, 相对项目根目录的 POSIX 风格前缀)
+        stack = [(self.project_path, "")]
+        while stack:
+            current, prefix = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logger.warning(f"Cannot scan directory {current}: {e}")
+                continue
             
-            # 提取类定义
-            elif 'class ' in line and line.strip().startswith('class '):
-                class_name = line.strip().split('{')[0].replace('class ', '').strip()
-                structure['classes'].append(class_name)
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # 与 os.walk 一致：不进入目录符号链接
+                        if entry.name in self.ignore_dirs or entry.is_symlink():
+                            continue
+                        rel_dir = f"{prefix}{entry.name}/"
+                        if spec is None or not spec.match_file(rel_dir):
+                            subdirs.append((entry.path, rel_dir))
+                    elif entry.is_file():
+                        if spec is None or not spec.match_file(prefix + entry.name):
+                            yield entry
+                except OSError:
+                    continue
             
-            # 提取导入
-            elif line.strip().startswith('import ') or line.strip().startswith('require('):
-                structure['imports'].append(line.strip())
+            # 逆序入栈，保证按名称顺序深度优先遍历
+            stack.extend(reversed(subdirs))
     
-    def _should_ignore_file(self, file_path: str) -> bool:
-        """判断是否应该忽略文件"""
+    def _should_ignore_file(self, file_path: str, file_size: Optional[int] = None) -> bool:
+        """
+        判断是否应该忽略文件
+        
+        Args:
+            file_path: 文件路径
+            file_size: 已知的文件大小（来自 DirEntry.stat），为 None 时重新 stat
+        """
         filename = os.path.basename(file_path)
         
         # 检查文件扩展名
@@ -438,7 +715,9 @@ class RAGIndexer:
         
         # 检查文件大小（限制 1MB）
         try:
-            if os.path.getsize(file_path) > 1024 * 1024:
+            if file_size is None:
+                file_size = os.path.getsize(file_path)
+            if file_size > 1024 * 1024:
                 logger.warning(f"File too large, skipping: {file_path}")
                 return True
         except:
@@ -448,8 +727,12 @@ class RAGIndexer:
         try:
             with open(file_path, 'rb') as f:
                 chunk = f.read(1024)
-                # 检查是否包含大量非文本字符
-                non_text_ratio = sum(1 for byte in chunk if byte > 127) / len(chunk) if chunk else 0
+                # 包含 NUL 字节基本可以确定是二进制文件
+                if b'\x00' in chunk:
+                    logger.warning(f"Binary file detected, skipping: {file_path}")
+                    return True
+                # 检查是否包含大量非文本字符（translate 删除 ASCII 字节后剩下的即非文本字节）
+                non_text_ratio = len(chunk.translate(None, _TEXT_BYTES)) / len(chunk) if chunk else 0
                 if non_text_ratio > 0.3:  # 如果超过30%的字符是非文本字符，认为是二进制文件
                     logger.warning(f"Binary file detected, skipping: {file_path}")
                     return True
@@ -468,111 +751,232 @@ class RAGIndexer:
         Returns:
             索引的文档列表
         """
-        documents = []
-        total_files = 0
-        processed_files = 0
-        
-        # 统计文件数量
-        for root, dirs, files in os.walk(self.project_path):
-            # 过滤忽略的目录
-            dirs[:] = [d for d in dirs if d not in self.ignore_dirs]
-            
-            for file in files:
-                file_path = os.path.join(root, file)
-                if not self._should_ignore_file(file_path):
-                    total_files += 1
+        # 单次遍历收集待索引的文件（总数在处理前即已确定，无需额外统计）
+        file_paths = []
+        for entry in self._iter_project_files():
+            try:
+                file_size = entry.stat().st_size
+            except OSError:
+                continue
+            if not self._should_ignore_file(entry.path, file_size):
+                file_paths.append(entry.path)
         
+        total_files = len(file_paths)
         logger.info(f"Found {total_files} files to index")
         
-        # 遍历项目文件
-        for root, dirs, files in os.walk(self.project_path):
-            # 过滤忽略的目录
-            dirs[:] = [d for d in dirs if d not in self.ignore_dirs]
-            
-            for file in files:
-                file_path = os.path.join(root, file)
-                
-                if self._should_ignore_file(file_path):
-                    continue
-                
+        # 并发处理文件：读取/解析/分块在线程中执行，信号量限制并发数
+        semaphore = asyncio.Semaphore((os.cpu_count() or 1) * 4)
+        processed_files = 0
+        # 同一次索引的所有文件共用一个时间戳
+        indexed_at = datetime.now().isoformat()
+        
+        async def _process_file(file_path: str) -> List[Document]:
+            nonlocal processed_files
+            async with semaphore:
                 try:
-                    # 读取文件内容
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    if not content.strip():
-                        continue
-                    
-                    # 提取相对路径
-                    rel_path = os.path.relpath(file_path, self.project_path)
-                    
-                    # 提取代码结构
-                    structure = self._extract_code_structure(content, file_path)
-                    
-                    # 生成文档摘要
-                    summary = self.document_summarizer.summarize(file_path, content)
-                    
-                    # 创建元数据（ChromaDB 只接受基本类型，字典需要转换为 JSON 字符串）
-                    metadata = {
-                        "file_path": rel_path,
-                        "file_type": os.path.splitext(file)[1].lower(),
-                        "file_size": len(content),
-                        "indexed_at": datetime.now().isoformat(),
-                        "structure": json.dumps(structure, ensure_ascii=False),
-                        "summary": summary.get("summary", ""),
-                        "language": summary.get("language", ""),
-                        "total_lines": summary.get("total_lines", 0)
-                    }
-                    
-                    # 分割文本
-                    chunks = self._split_text(content)
-                    
-                    # 为每个块创建文档
-                    for i, chunk in enumerate(chunks):
-                        chunk_metadata = metadata.copy()
-                        chunk_metadata["chunk_index"] = i
-                        chunk_metadata["total_chunks"] = len(chunks)
-                        
-                        doc = Document(
-                            content=chunk,
-                            metadata=chunk_metadata
-                        )
-                        documents.append(doc)
-                    
-                    processed_files += 1
-                    
-                    # 调用进度回调
-                    if progress_callback:
-                        await progress_callback(processed_files, total_files, rel_path)
-                    
+                    result = await asyncio.to_thread(self._read_and_process, file_path, indexed_at)
                 except Exception as e:
                     logger.error(f"Error indexing file {file_path}: {e}")
+                    return []
+            
+            if result is None:
+                return []
+            
+            rel_path, file_documents = result
+            processed_files += 1
+            
+            # 调用进度回调
+            if progress_callback:
+                await progress_callback(processed_files, total_files, rel_path)
+            
+            return file_documents
+        
+        per_file_documents = await asyncio.gather(*(_process_file(p) for p in file_paths))
+        documents = [doc for file_documents in per_file_documents for doc in file_documents]
         
         logger.info(f"Indexed {len(documents)} chunks from {processed_files} files")
         return documents
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """生成文本嵌入"""
+    def _read_and_process(self, file_path: str, indexed_at: Optional[str] = None) -> Optional[tuple]:
+        """
+        读取并处理单个文件（在工作线程中执行）
+        
+        Args:
+            file_path: 文件路径
+            indexed_at: 索引时间（ISO 格式），为 None 时取当前时间
+        
+        Returns:
+            (相对路径, 文档列表)，空文件返回 None
+        """
+        # 读取文件内容
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        
+        if not content.strip():
+            return None
+        
+        # 提取相对路径
+        rel_path = os.path.relpath(file_path, self.project_path)
+        
+        # 提取代码结构
+        structure = self._extract_code_structure(content, file_path)
+        
+        # 生成文档摘要
+        summary = self.document_summarizer.summarize(file_path, content)
+        
+        # 创建元数据（ChromaDB 只接受基本类型，字典需要转换为 JSON 字符串）
+        metadata = {
+            "file_path": rel_path,
+            "file_type": os.path.splitext(file_path)[1].lower(),
+            "file_size": len(content),
+            "indexed_at": indexed_at or datetime.now().isoformat(),
+            "structure": json.dumps(structure, ensure_ascii=False),
+            "summary": summary.get("summary", ""),
+            "language": summary.get("language", ""),
+            "total_lines": summary.get("total_lines", 0)
+        }
+        
+        # 分割文本
+        chunks = self._split_text(content)
+        
+        # 为每个块创建文档（每块元数据一次构造完成，值与文件级元数据共享）
+        total_chunks = len(chunks)
+        documents = [
+            Document(
+                content=chunk,
+                metadata={**metadata, "chunk_index": i, "total_chunks": total_chunks}
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+        
+        return rel_path, documents
+    
+    def generate_embeddings(self, texts: List[str], persist: bool = True) -> List[List[float]]:
+        """
+        生成文本嵌入
+        
+        Args:
+            texts: 文本列表
+            persist: 有新嵌入时是否立即保存嵌入缓存；分批调用时传 False，
+                由调用方在最后一批之后调用 _save_embedding_cache
+        """
         if not self.embedding_model:
             logger.warning("Embedding model not available")
             return []
         
         try:
-            embeddings = self.embedding_model.encode(
-                texts,
-                show_progress_bar=False,
-                convert_to_numpy=True
-            )
-            return embeddings.tolist()
+            if self.embedding_cache is None:
+                self._load_embedding_cache()
+            cache = self.embedding_cache
+            
+            # 只对缓存未命中的内容（去重后）生成嵌入
+            keys = [hashlib.blake2b(text.encode(), digest_size=8).hexdigest() for text in texts]
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in cache and key not in missing:
+                    missing[key] = text
+            
+            if missing:
+                # encode 内部会按文本长度排序后分批，并在返回前恢复原顺序
+                embeddings = self.embedding_model.encode(
+                    list(missing.values()),
+                    batch_size=self.embedding_batch_size,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+                cache.update(zip(missing.keys(), embeddings))
+            
+            # 每个不同的内容只转换一次（重复的块共享同一个向量列表），并标记为最近使用
+            vectors = {}
+            for key in dict.fromkeys(keys):
+                vectors[key] = cache[key].tolist()
+                cache.move_to_end(key)
+            while len(cache) > _EMBEDDING_CACHE_MAX_ENTRIES:
+                cache.popitem(last=False)
+            
+            result = [vectors[key] for key in keys]
+            if missing:
+                self._embedding_cache_dirty = True
+                if persist:
+                    self._save_embedding_cache()
+            logger.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+            return result
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             return []
+    
+    def _embedding_cache_paths(self):
+        """嵌入缓存文件路径：向量矩阵(.npz) 与对应的键(JSON)"""
+        return (
+            os.path.join(self.storage_dir, "embeddings_cache.npz"),
+            os.path.join(self.storage_dir, "embeddings_cache_keys.json"),
+        )
+    
+    def _load_embedding_cache(self):
+        """加载嵌入缓存（模型不一致或向量与键的数量对不上时丢弃）"""
+        import numpy
+        
+        self.embedding_cache = OrderedDict()
+        vectors_file, keys_file = self._embedding_cache_paths()
+        if not (os.path.exists(vectors_file) and os.path.exists(keys_file)):
+            return
+        
+        try:
+            with open(keys_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("model") != self.embedding_model_name:
+                return
+            with numpy.load(vectors_file) as npz:
+                vectors = npz["vectors"]
+                count = int(npz["count"]) if "count" in npz.files else -1
+            keys = data["keys"]
+            if not (count == len(vectors) == len(keys)):
+                # 两个文件不是同一次保存写入的（如保存中途被中断），向量与键无法对应
+                logger.warning("Embedding cache files do not match, discarding")
+                return
+            self.embedding_cache.update(zip(keys, vectors))
+            logger.info(f"Loaded {len(self.embedding_cache)} cached embeddings")
+        except Exception as e:
+            logger.error(f"Failed to load embedding cache: {e}")
+            self.embedding_cache = OrderedDict()
+    
+    def _save_embedding_cache(self):
+        """
+        保存嵌入缓存（按 LRU 顺序）
+        
+        两个文件先写到临时文件再用 os.replace 替换，不会留下写了一半的文件；
+        向量文件中记录行数，加载时与键的数量核对。
+        """
+        import numpy
+        
+        if not self.embedding_cache:
+            self._embedding_cache_dirty = False
+            return
+        
+        vectors_file, keys_file = self._embedding_cache_paths()
+        os.makedirs(os.path.dirname(vectors_file), exist_ok=True)
+        
+        try:
+            keys = list(self.embedding_cache)
+            # 传入文件对象，避免 numpy.savez 给临时文件名追加 .npz 后缀
+            with open(vectors_file + ".tmp", 'wb') as f:
+                numpy.savez(f, vectors=numpy.stack(list(self.embedding_cache.values())), count=len(keys))
+            with open(keys_file + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({"model": self.embedding_model_name, "keys": keys}, f)
+            os.replace(vectors_file + ".tmp", vectors_file)
+            os.replace(keys_file + ".tmp", keys_file)
+            self._embedding_cache_dirty = False
+        except Exception as e:
+            logger.error(f"Failed to save embedding cache: {e}")
 
 
 class TFIDFRetriever:
     """
     基于 TF-IDF 的轻量级检索器
     当 ChromaDB 不可用时的备选方案
+
+    文档向量使用无状态的 HashingVectorizer 生成（次线性 TF + L2 归一化），
+    新增文档只需向量化增量部分再堆叠到已有矩阵；IDF 权重作用在查询向量上。
     """
     
     def __init__(self, project_path: str):
@@ -584,53 +988,175 @@ class TFIDFRetriever:
         """
         self.project_path = project_path
         self.vectorizer = None
+        # 查询向量使用的 IDF 权重（稠密数组，长度为特征数）
+        self._idf = None
         self.documents = []
         self.embeddings = None
+        # 按列存储的文档矩阵副本，检索时按查询词所在列切片（self.embeddings 变化后重建）
+        self._embeddings_csc = None
+        self._embeddings_csc_source = None
         
         # 存储目录
-        self.storage_dir = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "..", "storage", "rag",
-            hashlib.md5(project_path.encode()).hexdigest()
-        )
+        self.storage_dir = _project_storage_dir(project_path)
         os.makedirs(self.storage_dir, exist_ok=True)
         
         # 加载已保存的索引
         self._load_index()
     
+    def _index_paths(self) -> Dict[str, str]:
+        """索引文件路径：稀疏矩阵(.npz)、文档(JSONL)、向量化配置(JSON)"""
+        return {
+            "embeddings": os.path.join(self.storage_dir, "tfidf_embeddings.npz"),
+            "documents": os.path.join(self.storage_dir, "tfidf_documents.jsonl"),
+            "config": os.path.join(self.storage_dir, "tfidf_config.json"),
+            "legacy": os.path.join(self.storage_dir, "tfidf_index.pkl"),
+        }
+    
     def _load_index(self):
         """加载已保存的索引"""
+        paths = self._index_paths()
+        
+        if not os.path.exists(paths["config"]):
+            if os.path.exists(paths["legacy"]):
+                self._load_legacy_index(paths["legacy"])
+            return
+        
+        try:
+            with open(paths["config"], 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            
+            documents = []
+            with open(paths["documents"], 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        documents.append(Document(item["content"], item["metadata"], doc_id=item["id"]))
+            
+            embeddings = None
+            if documents and os.path.exists(paths["embeddings"]):
+                embeddings = load_npz(paths["embeddings"]).tocsr().astype(np.float32, copy=False)
+            
+            vectorizer_params = config.get("vectorizer")
+            if vectorizer_params:
+                from sklearn.feature_extraction.text import HashingVectorizer
+                
+                vectorizer_params["ngram_range"] = tuple(vectorizer_params["ngram_range"])
+                self.vectorizer = HashingVectorizer(**vectorizer_params)
+            self.documents = documents
+            self.embeddings = embeddings
+            
+            if self.embeddings is None or self.embeddings.shape[0] != len(self.documents):
+                # 矩阵缺失或与文档不一致，从文档重建
+                if self.documents:
+                    self._rebuild_embeddings()
+            else:
+                self._fit_idf()
+            logger.info(f"Loaded TF-IDF index with {len(self.documents)} documents")
+        except Exception as e:
+            logger.error(f"Failed to load TF-IDF index: {e}")
+    
+    def _load_legacy_index(self, index_file: str):
+        """加载旧版 pickle 索引，并转换为新的存储格式"""
         import pickle
+        from sklearn.feature_extraction.text import HashingVectorizer
         
-        index_file = os.path.join(self.storage_dir, "tfidf_index.pkl")
+        try:
+            with open(index_file, 'rb') as f:
+                data = pickle.load(f)
+                self.vectorizer = data.get('vectorizer')
+                self.documents = data.get('documents', [])
+                self.embeddings = data.get('embeddings')
+            # 旧版索引使用 TfidfVectorizer，需要按新的向量化方式重建
+            if self.documents and not isinstance(self.vectorizer, HashingVectorizer):
+                self._rebuild_embeddings()
+            elif self.embeddings is not None:
+                self.embeddings = self.embeddings.astype(np.float32, copy=False)
+                self._fit_idf()
+            logger.info(f"Loaded legacy TF-IDF index with {len(self.documents)} documents")
+        except Exception as e:
+            logger.error(f"Failed to load TF-IDF index: {e}")
+            return
         
-        if os.path.exists(index_file):
+        if self._save_index():
             try:
-                with open(index_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.vectorizer = data.get('vectorizer')
-                    self.documents = data.get('documents', [])
-                    self.embeddings = data.get('embeddings')
-                logger.info(f"Loaded TF-IDF index with {len(self.documents)} documents")
-            except Exception as e:
-                logger.error(f"Failed to load TF-IDF index: {e}")
+                os.remove(index_file)
+            except OSError as e:
+                logger.warning(f"Failed to remove legacy TF-IDF index {index_file}: {e}")
     
-    def _save_index(self):
+    def _save_index(self) -> bool:
         """保存索引到磁盘"""
-        import pickle
+        paths = self._index_paths()
         
-        index_file = os.path.join(self.storage_dir, "tfidf_index.pkl")
+        config = {"version": 2, "vectorizer": None}
+        if self.vectorizer is not None:
+            config["vectorizer"] = {
+                key: self.vectorizer.get_params()[key]
+                for key in ("n_features", "stop_words", "ngram_range", "alternate_sign", "norm")
+            }
         
         try:
-            with open(index_file, 'wb') as f:
-                pickle.dump({
-                    'vectorizer': self.vectorizer,
-                    'documents': self.documents,
-                    'embeddings': self.embeddings
-                }, f)
+            # 配置文件最后写入，作为索引完整的标志
+            if os.path.exists(paths["config"]):
+                os.remove(paths["config"])
+            
+            if self.embeddings is not None and self.embeddings.shape[0] > 0:
+                save_npz(paths["embeddings"], self.embeddings)
+            elif os.path.exists(paths["embeddings"]):
+                os.remove(paths["embeddings"])
+            
+            with open(paths["documents"], 'w', encoding='utf-8') as f:
+                for doc in self.documents:
+                    f.write(json.dumps(doc.to_dict(), ensure_ascii=False, default=str))
+                    f.write("\n")
+            
+            with open(paths["config"], 'w', encoding='utf-8') as f:
+                json.dump(config, f)
             logger.info(f"Saved TF-IDF index with {len(self.documents)} documents")
+            return True
         except Exception as e:
             logger.error(f"Failed to save TF-IDF index: {e}")
+            return False
+    
+    def _vectorize(self, texts: List[str]):
+        """将文本转换为次线性 TF、L2 归一化的稀疏行向量"""
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.preprocessing import normalize
+        
+        if self.vectorizer is None:
+            self.vectorizer = HashingVectorizer(
+                n_features=2 ** 18,
+                stop_words='english',
+                ngram_range=(1, 2),
+                alternate_sign=False,
+                norm=None
+            )
+        # 使用 float32 存储，内存与检索时的数据量减半
+        rows = self.vectorizer.transform(texts).astype(np.float32, copy=False)
+        np.log(rows.data, out=rows.data)
+        rows.data += 1
+        return normalize(rows, norm='l2', copy=False)
+    
+    def _fit_idf(self):
+        """
+        根据当前文档矩阵重新计算 IDF（只统计非零列，无需重新分词）
+        
+        与 TfidfTransformer(smooth_idf=True) 的 idf_ 相同：ln((1 + n) / (1 + df)) + 1，
+        文档频率直接由 CSR 矩阵的列下标计数得到，加载索引时无需再拟合 transformer。
+        """
+        if self.embeddings is None or self.embeddings.shape[0] == 0:
+            self._idf = None
+            return
+        
+        n_samples, n_features = self.embeddings.shape
+        df = np.bincount(self.embeddings.indices, minlength=n_features).astype(self.embeddings.dtype)
+        df += 1
+        self._idf = np.log((n_samples + 1) / df) + 1
+    
+    def _rebuild_embeddings(self):
+        """从已保存的文档重新生成全部向量"""
+        self.vectorizer = None
+        self.embeddings = self._vectorize([doc.content for doc in self.documents])
+        self._fit_idf()
     
     async def add_documents(
         self,
@@ -649,23 +1175,76 @@ class TFIDFRetriever:
         if not documents:
             return
         
-        # 添加新文档
+        # 只向量化新增文档，并堆叠到已有矩阵
+        new_rows = self._vectorize([doc.content for doc in documents])
         self.documents.extend(documents)
-        
-        # 重新构建 TF-IDF 向量
-        texts = [doc.content for doc in self.documents]
-        self.vectorizer = TfidfVectorizer(
-            max_features=5000,
-            stop_words='english',
-            ngram_range=(1, 2)
-        )
-        self.embeddings = self.vectorizer.fit_transform(texts)
+        if self.embeddings is None:
+            self.embeddings = new_rows
+        else:
+            self.embeddings = vstack([self.embeddings, new_rows], format='csr')
+        self._fit_idf()
         
         # 保存索引
         self._save_index()
         
         logger.info(f"Added {len(documents)} documents to TF-IDF index, total: {len(self.documents)}")
     
+    @staticmethod
+    def _top_k(scores, k: int):
+        """返回分数最高的 k 个下标（按分数降序）"""
+        if k <= 0:
+            return scores[:0].astype(np.intp)
+        if k < scores.shape[0]:
+            idx = np.argpartition(-scores, k - 1)[:k]
+        else:
+            idx = np.arange(scores.shape[0])
+        return idx[np.argsort(-scores[idx], kind='stable')]
+    
+    def _query_weights(self, query: str):
+        """
+        计算查询向量的非零列及其权重（次线性 TF × IDF，L2 归一化）
+        
+        与 TfidfTransformer.transform 结果一致，但直接在 .data 数组上原地计算，
+        省去每次查询的参数校验和稀疏矩阵拷贝。
+        """
+        q = self.vectorizer.transform([query])
+        data = q.data
+        np.log(data, out=data)
+        data += 1
+        data *= self._idf[q.indices]
+        norm = np.sqrt(np.dot(data, data))
+        if norm > 0:
+            data /= norm
+        return q.indices, data.astype(np.float32)
+    
+    def _get_embeddings_csc(self):
+        """获取按列存储的文档矩阵，文档矩阵变化后重新生成"""
+        if self._embeddings_csc_source is not self.embeddings:
+            self._embeddings_csc = self.embeddings.tocsc()
+            self._embeddings_csc_source = self.embeddings
+        return self._embeddings_csc
+    
+    def _score_top_k(self, query_indices, query_weights, k: int):
+        """
+        计算相似度并选出 top-k
+        
+        文档行与查询向量均已 L2 归一化，稀疏点积即余弦相似度；查询只有少数非零列，
+        只取文档矩阵中这些列参与计算。安装了 numba 时打分与选取在同一个 JIT 内核中完成。
+        
+        Returns:
+            (文档下标, 相似度)，按相似度降序
+        """
+        csc = self._get_embeddings_csc()
+        if NUMBA_AVAILABLE:
+            return _numba_score_topk(
+                csc.data, csc.indices, csc.indptr, csc.shape[0],
+                query_indices, query_weights, k
+            )
+        similarities = csc[:, query_indices] @ query_weights
+        # argpartition 选出 top-k 后只对这 k 个排序
+        top_indices = self._top_k(similarities, k)
+        return top_indices, similarities[top_indices]
+    
     def retrieve(
         self,
         query: str,
@@ -683,27 +1262,26 @@ class TFIDFRetriever:
         Returns:
             检索结果列表
         """
-        if not self.vectorizer or not self.documents:
+        if self.vectorizer is None or self._idf is None or not self.documents:
             return []
         
         try:
-            # 转换查询为向量
-            query_vector = self.vectorizer.transform([query])
+            # 转换查询为向量（IDF 加权）
+            query_indices, query_weights = self._query_weights(query)
             
-            # 计算相似度
-            similarities = cosine_similarity(query_vector, self.embeddings).flatten()
-            
-            # 获取最相似的文档
-            top_indices = similarities.argsort()[-n_results:][::-1]
+            # 计算相似度并获取最相似的文档
+            top_indices, top_scores = self._score_top_k(query_indices, query_weights, n_results)
             
             # 构建结果
             results = []
-            logger.info(f"TF-IDF 检索开始: 查询='{query}', 请求结果数={n_results}, 总文档数={len(self.documents)}")
-            logger.info(f"  相似度数组: {similarities[:10]}... (前10个)")
+            debug = logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                logger.debug(f"TF-IDF 检索开始: 查询='{query}', 请求结果数={n_results}, 总文档数={len(self.documents)}")
+                logger.debug(f"  top-k 相似度: {top_scores[:10]}... (前10个)")
             
-            for idx in top_indices:
+            for idx, score in zip(top_indices, top_scores):
                 doc = self.documents[idx]
-                similarity = similarities[idx]
+                similarity = float(score)
                 
                 # 应用过滤条件
                 if filters:
@@ -715,21 +1293,22 @@ class TFIDFRetriever:
                     if not match:
                         continue
                 
-                # 添加详细调试日志
-                logger.info(f"=" * 80)
-                logger.info(f"TF-IDF 检索结果 #{len(results)+1}:")
-                logger.info(f"  索引位置: {idx}")
-                logger.info(f"  文档ID: {doc.doc_id}")
-                logger.info(f"  文件路径: {doc.metadata.get('file_path')}")
-                logger.info(f"  块索引: {doc.metadata.get('chunk_index')}/{doc.metadata.get('total_chunks')}")
-                logger.info(f"  相似度: {similarity:.6f}")
-                logger.info(f"  距离: {1 - similarity:.6f}")
-                logger.info(f"  行号范围: {doc.metadata.get('start_line')}-{doc.metadata.get('end_line')}")
-                logger.info(f"  语言: {doc.metadata.get('language', 'N/A')}")
-                logger.info(f"  内容长度: {len(doc.content)} 字符")
-                logger.info(f"  内容预览: {doc.content[:200]}")
-                logger.info(f"  完整元数据: {doc.metadata}")
-                logger.info(f"=" * 80)
+                # 详细调试日志（仅 DEBUG 级别时格式化）
+                if debug:
+                    logger.debug(_LOG_SEPARATOR)
+                    logger.debug(f"TF-IDF 检索结果 #{len(results)+1}:")
+                    logger.debug(f"  索引位置: {idx}")
+                    logger.debug(f"  文档ID: {doc.doc_id}")
+                    logger.debug(f"  文件路径: {doc.metadata.get('file_path')}")
+                    logger.debug(f"  块索引: {doc.metadata.get('chunk_index')}/{doc.metadata.get('total_chunks')}")
+                    logger.debug(f"  相似度: {similarity:.6f}")
+                    logger.debug(f"  距离: {1 - similarity:.6f}")
+                    logger.debug(f"  行号范围: {doc.metadata.get('start_line')}-{doc.metadata.get('end_line')}")
+                    logger.debug(f"  语言: {doc.metadata.get('language', 'N/A')}")
+                    logger.debug(f"  内容长度: {len(doc.content)} 字符")
+                    logger.debug(f"  内容预览: {doc.content[:200]}")
+                    logger.debug(f"  完整元数据: {doc.metadata}")
+                    logger.debug(_LOG_SEPARATOR)
                 
                 results.append({
                     "id": doc.doc_id,
@@ -739,7 +1318,8 @@ class TFIDFRetriever:
                     "similarity": similarity
                 })
             
-            logger.info(f"TF-IDF 检索完成: 返回 {len(results)} 个结果")
+            if debug:
+                logger.debug(f"TF-IDF 检索完成: 返回 {len(results)} 个结果")
             
             return results
         
@@ -755,6 +1335,7 @@ class TFIDFRetriever:
             if os.path.exists(self.storage_dir):
                 shutil.rmtree(self.storage_dir)
             self.vectorizer = None
+            self._idf = None
             self.documents = []
             self.embeddings = None
             logger.info(f"Deleted TF-IDF index")
@@ -777,15 +1358,15 @@ class TFIDFRetriever:
     def delete_document(self, doc_id: str):
         """删除特定文档"""
         try:
-            # 从文档列表中删除
-            self.documents = [doc for doc in self.documents if doc.doc_id != doc_id]
+            # 从文档列表和向量矩阵中删除对应行
+            keep = [i for i, doc in enumerate(self.documents) if doc.doc_id != doc_id]
+            self.documents = [self.documents[i] for i in keep]
             
-            # 重建索引
-            if self.documents:
-                texts = [doc.content for doc in self.documents]
-                self.embeddings = self.vectorizer.transform(texts)
+            if self.documents and self.embeddings is not None:
+                self.embeddings = self.embeddings[keep]
             else:
                 self.embeddings = None
+            self._fit_idf()
             
             # 保存索引
             self._save_index()
@@ -843,11 +1424,7 @@ class RAGRetriever:
         
         # 设置持久化目录
         if chroma_persist_dir is None:
-            chroma_persist_dir = os.path.join(
-                os.path.dirname(os.path.dirname(__file__)),
-                "..", "storage", "rag",
-                hashlib.md5(project_path.encode()).hexdigest()
-            )
+            chroma_persist_dir = _project_storage_dir(project_path)
         
         os.makedirs(chroma_persist_dir, exist_ok=True)
         
@@ -1080,34 +1657,33 @@ class HybridRetriever:
         
         使用倒数排名融合（Reciprocal Rank Fusion, RRF）
         """
-        # 创建文档 ID 到分数的映射
-        scores = {}
+        # 创建文档 ID 到分数的映射，同时记录文档 ID 到结果的映射
+        scores = defaultdict(float)
+        result_map = {}
         
         # TF-IDF 分数（转换为排名分数）
-        for rank, result in enumerate(tfidf_results):
+        # RRF: 1 / (k + rank)，k 通常为 60；rank 从 1 开始，直接作为 enumerate 的起点
+        tfidf_weight = 1 - alpha
+        for rank, result in enumerate(tfidf_results, _RRF_K + 1):
             doc_id = result["id"]
-            # RRF: 1 / (k + rank)，k 通常为 60
-            rrf_score = 1.0 / (60 + rank + 1)
-            scores[doc_id] = scores.get(doc_id, 0) + rrf_score * (1 - alpha)
+            scores[doc_id] += tfidf_weight / rank
+            result_map[doc_id] = result
         
-        # 语义检索分数
-        for rank, result in enumerate(semantic_results):
+        # 语义检索分数（同一文档两路都命中时保留语义检索的结果）
+        for rank, result in enumerate(semantic_results, _RRF_K + 1):
             doc_id = result["id"]
-            rrf_score = 1.0 / (60 + rank + 1)
-            scores[doc_id] = scores.get(doc_id, 0) + rrf_score * alpha
+            scores[doc_id] += alpha / rank
+            result_map[doc_id] = result
         
-        # 按分数排序
-        sorted_results = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        # 只取分数最高的 n_results 个（与完整排序后截断的结果一致）
+        top_scores = heapq.nlargest(n_results, scores.items(), key=itemgetter(1))
         
         # 获取前 n_results 个结果
         final_results = []
-        result_map = {r["id"]: r for r in tfidf_results + semantic_results}
-        
-        for doc_id, score in sorted_results[:n_results]:
-            if doc_id in result_map:
-                result = result_map[doc_id].copy()
-                result["fusion_score"] = score
-                final_results.append(result)
+        for doc_id, score in top_scores:
+            result = result_map[doc_id].copy()
+            result["fusion_score"] = score
+            final_results.append(result)
         
         return final_results
     
@@ -1129,6 +1705,59 @@ class HybridRetriever:
         return stats
 
 
+class _SemanticQueryCache:
+    """
+    查询级语义缓存
+    
+    查询向量与已缓存查询的余弦相似度不低于阈值、且 n_results/filters 相同时直接复用结果。
+    条目数很少，直接用 NumPy 做暴力内积检索即可。
+    """
+    
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, ttl: float = 300.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # retrieve 可能在 asyncio.to_thread 的工作线程中并发调用
+        self._lock = threading.Lock()
+        self._vectors = None
+        # 与 _vectors 的行一一对应：(参数键, 结果, 过期时间)
+        self._entries: List[tuple] = []
+    
+    @staticmethod
+    def params_key(n_results: int, filters: Optional[Dict[str, Any]]) -> tuple:
+        return n_results, json.dumps(filters, sort_keys=True, default=str) if filters else ""
+    
+    def lookup(self, vector, params_key: tuple) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            if not self._entries:
+                return None
+            similarities = self._vectors @ vector
+            now = time.monotonic()
+            for i in np.argsort(-similarities):
+                if similarities[i] < self.threshold:
+                    break
+                key, results, expires_at = self._entries[i]
+                if key == params_key and expires_at > now:
+                    return [dict(r) for r in results]
+            return None
+    
+    def add(self, vector, params_key: tuple, results: List[Dict[str, Any]]):
+        with self._lock:
+            now = time.monotonic()
+            # 丢弃过期条目；超出容量时淘汰最早加入的条目
+            keep = [i for i, entry in enumerate(self._entries) if entry[2] > now]
+            keep = keep[max(0, len(keep) - self.max_entries + 1):]
+            self._entries = [self._entries[i] for i in keep]
+            self._entries.append((params_key, [dict(r) for r in results], now + self.ttl))
+            rows = [self._vectors[keep]] if keep else []
+            self._vectors = np.vstack(rows + [vector[np.newaxis, :]])
+    
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+
+
 class RAGService:
     """RAG 服务 - 统一的 RAG 功能接口"""
     
@@ -1145,8 +1774,15 @@ class RAGService:
         self.indexer = RAGIndexer(project_path)
         self.retriever = None
         self._initialized = False
+        # 没有任何可用的检索器（依赖未安装），记录后不再重复尝试初始化
+        self._unavailable = False
         self.use_hybrid = use_hybrid
         
+        # 查询级语义缓存（仅在语义检索可用时启用，见 retrieve）
+        self._query_cache = None
+        if os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true":
+            self._query_cache = _SemanticQueryCache(ttl=_cache_ttl())
+        
         # 搜索历史记录
         self.search_history = []
         self._load_search_history()
@@ -1164,8 +1800,15 @@ class RAGService:
             self.use_chromadb = use_chromadb
             logger.info(f"RAG Service initialized with {'ChromaDB' if self.use_chromadb else 'TF-IDF'} retriever")
     
-    def _ensure_initialized(self):
-        """确保检索器已初始化"""
+    def _ensure_initialized(self) -> bool:
+        """
+        确保检索器已初始化
+        
+        Returns:
+            是否有可用的检索器；不可用的结果会被记住，之后的调用直接返回 False
+        """
+        if self._unavailable:
+            return False
         if not self._initialized:
             logger.info(f"Initializing retriever: use_chromadb={self.use_chromadb}, use_hybrid={self.use_hybrid}")
             logger.info(f"CHROMADB_AVAILABLE={CHROMADB_AVAILABLE}, SKLEARN_AVAILABLE={SKLEARN_AVAILABLE}")
@@ -1182,9 +1825,17 @@ class RAGService:
                 logger.info("Using TFIDFRetriever (scikit-learn)")
             else:
                 logger.error("No retriever available! Neither ChromaDB nor scikit-learn is installed.")
-                return
+                self._unavailable = True
+                return False
+            if NUMBA_AVAILABLE and not isinstance(self.retriever, RAGRetriever):
+                # 预热 TF-IDF 打分内核（cache=True 时从磁盘加载已编译版本）
+                try:
+                    _numba_warmup()
+                except Exception as e:
+                    logger.warning(f"numba warmup failed: {e}")
             self._initialized = True
             logger.info(f"Retriever initialized successfully")
+        return True
     
     async def index_project(self, progress_callback=None, force_reindex: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -1199,46 +1850,26 @@ class RAGService:
         """
         logger.info(f"Starting project indexing: {self.project_path} (force_reindex={force_reindex})")
         
-        yield {"type": "status", "message": "开始扫描项目文件...", "progress": 0}
-        
-        # 获取文件列表
-        all_files = []
-        changed_files = []
-        deleted_files = []
+        if not self._ensure_initialized():
+            yield {
+                "type": "error",
+                "message": "没有可用的检索器（ChromaDB 和 scikit-learn 均未安装）",
+                "progress": 100
+            }
+            return
         
-        for root, dirs, files in os.walk(self.project_path):
-            # 过滤忽略的目录
-            dirs[:] = [d for d in dirs if d in self.indexer.ignore_dirs]
-            
-            for file in files:
-                file_path = os.path.join(root, file)
-                
-                if self.indexer._should_ignore_file(file_path):
-                    continue
-                
-                all_files.append(file_path)
+        yield {"type": "status", "message": "开始扫描项目文件并检查变更...", "progress": 0}
         
-        yield {"type": "status", "message": f"发现 {len(all_files)} 个文件，检查变更...", "progress": 10}
+        # 遍历项目并检查文件变更（在工作线程中进行，边遍历边并行 stat/哈希，不保存完整文件列表）
+        seen_paths, changed_files = await asyncio.to_thread(self._scan_changed_files, force_reindex)
         
-        # 检查文件变更
-        for file_path in all_files:
-            rel_path = os.path.relpath(file_path, self.project_path)
-            current_hash = self.indexer._get_file_hash(file_path)
-            
-            if force_reindex:
-                # 强制重新索引所有文件
-                changed_files.append((file_path, rel_path, current_hash))
-            else:
-                # 检查是否是新文件或已更改的文件
-                old_hash = self.indexer.file_hashes.get(rel_path, "")
-                if old_hash != current_hash:
-                    changed_files.append((file_path, rel_path, current_hash))
+        yield {"type": "status", "message": f"发现 {len(seen_paths)} 个文件，检查删除的文件...", "progress": 10}
         
-        # 检查删除的文件
-        for rel_path in list(self.indexer.file_hashes.keys()):
-            full_path = os.path.join(self.project_path, rel_path)
-            if not os.path.exists(full_path):
-                deleted_files.append(rel_path)
+        # 检查删除的文件：已记录但本次遍历未出现的文件（纯内存比较，无需逐个 stat）
+        deleted_files = [
+            rel_path for rel_path in self.indexer.file_hashes
+            if os.path.join(self.project_path, rel_path) not in seen_paths
+        ]
         
         yield {
             "type": "status",
@@ -1247,90 +1878,63 @@ class RAGService:
         }
         
         if not changed_files and not deleted_files:
+            # 旧格式哈希记录可能已升级，保存以便下次走快速路径
+            if self.indexer._file_hashes_dirty:
+                self.indexer._save_file_hashes()
             yield {
                 "type": "complete",
                 "message": "没有文件变更，无需重新索引",
                 "progress": 100,
-                "stats": self.get_stats() if self._initialized else {}
+                "stats": self.get_stats()
             }
             return
         
-        # 处理变更的文件
-        documents = []
-        processed_count = 0
+        # 处理变更的文件：读取/解析/分块在线程中并发执行，信号量限制并发数
+        image_dir = os.path.join(self.indexer.storage_dir, "images")
+        semaphore = asyncio.Semaphore((os.cpu_count() or 1) * 4)
+        indexed_at = datetime.now().isoformat()
         
-        for file_path, rel_path, file_hash in changed_files:
-            try:
-                # 读取文件内容（使用新的 read_file_content 函数支持 Word 文档和图片）
+        async def _process(index: int, file_path: str, rel_path: str, file_record: Dict[str, Any]):
+            async with semaphore:
                 try:
-                    file_data = read_file_content(file_path, extract_images=True)
-                    content = file_data["content"]
-                    images = file_data.get("images", [])
+                    file_documents = await asyncio.to_thread(
+                        self._process_changed_file, file_path, rel_path, file_record["sha"], image_dir, indexed_at
+                    )
                 except Exception as e:
-                    logger.warning(f"Cannot read file, skipping: {file_path} - {e}")
-                    continue
-                
-                if not content.strip():
-                    continue
-                
-                # 对于非 Word 文档，检查内容是否包含过多不可打印字符（可能是二进制文件）
-                ext = os.path.splitext(file_path)[1].lower()
-                if ext != '.docx':
-                    non_printable_ratio = sum(1 for c in content if ord(c) > 127) / len(content) if content else 0
-                    if non_printable_ratio > 0.3:
-                        logger.warning(f"File contains too many non-printable characters, skipping: {file_path}")
-                        continue
-                
-                # 提取代码结构
-                structure = self.indexer._extract_code_structure(content, file_path)
-                
-                # 生成文档摘要
-                summary = self.indexer.document_summarizer.summarize(file_path, content)
-                
-                # 创建元数据（ChromaDB 只接受基本类型，字典需要转换为 JSON 字符串）
-                metadata = {
-                    "file_path": rel_path,
-                    "file_type": os.path.splitext(file_path)[1].lower(),
-                    "file_size": len(content),
-                    "indexed_at": datetime.now().isoformat(),
-                    "file_hash": file_hash,
-                    "structure": json.dumps(structure, ensure_ascii=False),
-                    "summary": summary.get("summary", ""),
-                    "language": summary.get("language", ""),
-                    "total_lines": summary.get("total_lines", 0)
+                    logger.error(f"Error indexing file {file_path}: {e}")
+                    file_documents = None
+            return index, rel_path, file_record, file_documents
+        
+        tasks = [
+            _process(i, file_path, rel_path, file_record)
+            for i, (file_path, rel_path, file_record) in enumerate(changed_files)
+        ]
+        
+        # 按完成顺序汇报进度，按原文件顺序汇总文档
+        per_file_documents: List[Optional[List[Document]]] = [None] * len(changed_files)
+        processed_count = 0
+        
+        for future in asyncio.as_completed(tasks):
+            index, rel_path, file_record, file_documents = await future
+            if file_documents is None:
+                continue
+            
+            per_file_documents[index] = file_documents
+            
+            # 更新文件哈希（只在事件循环线程中写入）
+            self.indexer.file_hashes[rel_path] = file_record
+            processed_count += 1
+            
+            # 更新进度
+            progress = 20 + int((processed_count / len(changed_files)) * 50)
+            if processed_count % 10 == 0:  # 每10个文件更新一次
+                yield {
+                    "type": "status",
+                    "message": f"已处理 {processed_count}/{len(changed_files)} 个文件...",
+                    "progress": progress
                 }
-                
-                # 使用智能分块器
-                chunks = self.indexer.smart_chunker.chunk(content, file_path, structure)
-                
-                # 为每个块创建文档
-                for i, chunk_data in enumerate(chunks):
-                    chunk_metadata = metadata.copy()
-                    chunk_metadata.update(chunk_data["metadata"])
-                    chunk_metadata["chunk_index"] = i
-                    chunk_metadata["total_chunks"] = len(chunks)
-                    
-                    doc = Document(
-                        content=chunk_data["content"],
-                        metadata=chunk_metadata
-                    )
-                    documents.append(doc)
-                
-                # 更新文件哈希
-                self.indexer.file_hashes[rel_path] = file_hash
-                processed_count += 1
-                
-                # 更新进度
-                progress = 20 + int((processed_count / len(changed_files)) * 50)
-                if processed_count % 10 == 0:  # 每10个文件更新一次
-                    yield {
-                        "type": "status",
-                        "message": f"已处理 {processed_count}/{len(changed_files)} 个文件...",
-                        "progress": progress
-                    }
-                
-            except Exception as e:
-                logger.error(f"Error indexing file {file_path}: {e}")
+        
+        documents = [doc for file_documents in per_file_documents if file_documents for doc in file_documents]
         
         # 保存文件哈希
         self.indexer._save_file_hashes()
@@ -1340,21 +1944,64 @@ class RAGService:
                 "type": "complete",
                 "message": "没有新的文档需要索引",
                 "progress": 100,
-                "stats": self.get_stats() if self._initialized else {}
+                "stats": self.get_stats()
             }
             return
         
         yield {"type": "status", "message": f"生成 {len(documents)} 个文档块，正在添加到数据库...", "progress": 75}
         
-        # 生成嵌入（仅在使用 ChromaDB 时）
-        embeddings = None
-        if self.use_chromadb and self.indexer.embedding_model:
-            texts = [doc.content for doc in documents]
-            embeddings = self.indexer.generate_embeddings(texts)
+        total = len(documents)
+        if isinstance(self.retriever, RAGRetriever):
+            # ChromaDB：分批生成嵌入并写入，限制峰值内存，每批汇报一次进度
+            for start in range(0, total, _ADD_BATCH_SIZE):
+                batch = documents[start:start + _ADD_BATCH_SIZE]
+                
+                # 生成嵌入（在线程池中编码，不阻塞事件循环）
+                embeddings = None
+                if self.indexer.embedding_model:
+                    embeddings = await asyncio.to_thread(
+                        self.indexer.generate_embeddings, [doc.content for doc in batch], False
+                    ) or None
+                
+                await self.retriever.add_documents(batch, embeddings, progress_callback)
+                self._clear_query_cache()
+                
+                done = min(start + _ADD_BATCH_SIZE, total)
+                yield {
+                    "type": "status",
+                    "message": f"已添加 {done}/{total} 个文档块...",
+                    "progress": 75 + int(done / total * 20)
+                }
+        else:
+            # TF-IDF（含混合检索）每次添加都会重新计算 IDF 并保存整个索引，一次性添加；
+            # 嵌入仍分批在线程池中生成，每批汇报一次进度
+            embeddings = None
+            if self.use_chromadb and self.indexer.embedding_model:
+                embeddings = []
+                for start in range(0, total, _ADD_BATCH_SIZE):
+                    batch_embeddings = await asyncio.to_thread(
+                        self.indexer.generate_embeddings,
+                        [doc.content for doc in documents[start:start + _ADD_BATCH_SIZE]],
+                        False
+                    )
+                    if not batch_embeddings:
+                        embeddings = []
+                        break
+                    embeddings.extend(batch_embeddings)
+                    
+                    done = min(start + _ADD_BATCH_SIZE, total)
+                    yield {
+                        "type": "status",
+                        "message": f"已生成 {done}/{total} 个文档块的嵌入...",
+                        "progress": 75 + int(done / total * 15)
+                    }
+                embeddings = embeddings or None
+            await self.retriever.add_documents(documents, embeddings, progress_callback)
+            self._clear_query_cache()
         
-        # 添加到向量数据库
-        self._ensure_initialized()
-        await self.retriever.add_documents(documents, embeddings, progress_callback)
+        # 嵌入缓存在所有批次完成后统一保存一次
+        if self.indexer._embedding_cache_dirty:
+            await asyncio.to_thread(self.indexer._save_embedding_cache)
         
         # 获取统计信息
         stats = self.retriever.get_stats()
@@ -1368,6 +2015,144 @@ class RAGService:
             "deleted_files": len(deleted_files)
         }
     
+    def _check_file_changed(self, file_path: str, force_reindex: bool) -> Optional[tuple]:
+        """
+        检查单个文件是否需要重新索引（mtime + 大小一致的文件无需计算哈希）
+        
+        Returns:
+            (文件路径, 相对路径, 文件指纹记录)，未变更时返回 None
+        """
+        # 强制重新索引所有文件，或者是新文件/已更改的文件
+        try:
+            record = self.indexer._changed_file_record(file_path, force=force_reindex)
+        except OSError as e:
+            logger.warning(f"Cannot stat file, skipping: {file_path} - {e}")
+            return None
+        if record is None:
+            return None
+        return file_path, os.path.relpath(file_path, self.project_path), record
+    
+    def _iter_candidate_files(self):
+        """
+        遍历项目，逐个产出需要检查变更的文件路径
+        
+        跳过 ignore_dirs 中的目录（node_modules、.git、venv 等），文件大小取自 DirEntry 的缓存。
+        """
+        for entry in self.indexer._iter_project_files():
+            try:
+                file_size = entry.stat().st_size
+            except OSError:
+                continue
+            if not self.indexer._should_ignore_file(entry.path, file_size):
+                yield entry.path
+    
+    def _scan_changed_files(self, force_reindex: bool) -> tuple:
+        """
+        遍历项目并并行检查文件变更，结果保持遍历顺序
+        
+        遍历与 stat/哈希重叠进行；未完成的检查任务数有上限。遍历到的路径只保存在集合中，
+        供检测删除的文件使用。
+        
+        Returns:
+            (遍历到的文件路径集合, 变更文件列表)
+        """
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+        seen_paths = set()
+        changed_files = []
+        pending = deque()
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for file_path in self._iter_candidate_files():
+                seen_paths.add(file_path)
+                pending.append(executor.submit(self._check_file_changed, file_path, force_reindex))
+                # 按提交顺序取回最早的结果，限制排队中的任务数
+                if len(pending) >= max_workers * 4:
+                    result = pending.popleft().result()
+                    if result is not None:
+                        changed_files.append(result)
+            
+            for future in pending:
+                result = future.result()
+                if result is not None:
+                    changed_files.append(result)
+        
+        return seen_paths, changed_files
+    
+    def _process_changed_file(
+        self,
+        file_path: str,
+        rel_path: str,
+        file_hash: str,
+        image_dir: str,
+        indexed_at: str
+    ) -> Optional[List[Document]]:
+        """
+        读取、解析并分块单个变更文件（在工作线程中执行）
+        
+        Args:
+            indexed_at: 本次索引的时间戳（同一次索引的所有文件共用）
+        
+        Returns:
+            文档块列表；文件无法读取、为空或疑似二进制时返回 None
+        """
+        # 读取文件内容（使用新的 read_file_content 函数支持 Word 文档和图片）
+        try:
+            file_data = read_file_content(file_path, extract_images=True, image_dir=image_dir)
+            content = file_data["content"]
+        except Exception as e:
+            logger.warning(f"Cannot read file, skipping: {file_path} - {e}")
+            return None
+        
+        if not content.strip():
+            return None
+        
+        # 对于非 Word 文档，检查内容是否包含过多不可打印字符（可能是二进制文件）
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext != '.docx':
+            # encode('ascii', 'ignore') 在 C 层丢弃非 ASCII 字符，长度差即非 ASCII 字符数
+            non_ascii = len(content) - len(content.encode('ascii', 'ignore'))
+            non_printable_ratio = non_ascii / len(content) if content else 0
+            if non_printable_ratio > 0.3:
+                logger.warning(f"File contains too many non-printable characters, skipping: {file_path}")
+                return None
+        
+        # 提取代码结构
+        structure = self.indexer._extract_code_structure(content, file_path)
+        
+        # 生成文档摘要
+        summary = self.indexer.document_summarizer.summarize(file_path, content)
+        
+        # 创建元数据（ChromaDB 只接受基本类型，字典需要转换为 JSON 字符串）
+        metadata = {
+            "file_path": rel_path,
+            "file_type": ext,
+            "file_size": len(content),
+            "indexed_at": indexed_at,
+            "file_hash": file_hash,
+            "structure": json.dumps(structure, ensure_ascii=False),
+            "summary": summary.get("summary", ""),
+            "language": summary.get("language", ""),
+            "total_lines": summary.get("total_lines", 0)
+        }
+        
+        # 使用智能分块器
+        chunks = self.indexer.smart_chunker.chunk(content, file_path, structure)
+        
+        # 为每个块创建文档（每块元数据一次构造完成，值与文件级元数据共享）
+        total_chunks = len(chunks)
+        return [
+            Document(
+                content=chunk_data["content"],
+                metadata={
+                    **metadata,
+                    **chunk_data["metadata"],
+                    "chunk_index": i,
+                    "total_chunks": total_chunks
+                }
+            )
+            for i, chunk_data in enumerate(chunks)
+        ]
+    
     def retrieve(self, query: str, n_results: int = 5, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         检索相关文档
@@ -1380,20 +2165,59 @@ class RAGService:
         Returns:
             检索结果
         """
-        self._ensure_initialized()
-        results = self.retriever.retrieve(query, n_results, filters)
+        if not self._ensure_initialized():
+            return []
+        
+        # 语义检索（ChromaDB）开销较大：先用查询向量查缓存，相似查询直接复用结果
+        query_vector = None
+        if self._query_cache is not None and self._uses_semantic_retrieval():
+            query_vector = self._embed_query(query)
+        
+        results = None
+        if query_vector is not None:
+            params_key = _SemanticQueryCache.params_key(n_results, filters)
+            results = self._query_cache.lookup(query_vector, params_key)
+        
+        if results is None:
+            results = self.retriever.retrieve(query, n_results, filters)
+            if query_vector is not None:
+                self._query_cache.add(query_vector, params_key, results)
         
         # 记录搜索历史
         self._add_search_history(query, len(results), filters)
         
         return results
     
+    def _uses_semantic_retrieval(self) -> bool:
+        """当前检索器是否包含语义（向量）检索"""
+        if isinstance(self.retriever, RAGRetriever):
+            return True
+        return isinstance(self.retriever, HybridRetriever) and self.retriever.semantic_retriever is not None
+    
+    def _embed_query(self, query: str):
+        """生成 L2 归一化的查询向量，嵌入模型不可用时返回 None"""
+        model = self.indexer.embedding_model
+        if model is None:
+            return None
+        try:
+            return model.encode(query, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False)
+        except Exception as e:
+            logger.warning(f"Failed to embed query for cache: {e}")
+            return None
+    
+    def _clear_query_cache(self):
+        """索引内容变化后清空查询缓存并递增项目的 index_version"""
+        self._bump_index_version()
+        if self._query_cache is not None:
+            self._query_cache.clear()
+    
     async def add_document(
         self,
         file_name: str,
         content: str,
         file_type: str = None,
-        images: List[Dict[str, Any]] = None
+        images: List[Dict[str, Any]] = None,
+        indexed_at: str = None
     ) -> Dict[str, Any]:
         """
         添加单个文档到索引
@@ -1403,6 +2227,7 @@ class RAGService:
             content: 文档内容
             file_type: 文件类型（可选）
             images: 图片列表（可选）
+            indexed_at: 索引时间（ISO 格式，可选），批量添加时由调用方统一传入
         
         Returns:
             添加结果
@@ -1410,6 +2235,9 @@ class RAGService:
         if not content.strip():
             return {"success": False, "error": "文档内容为空"}
         
+        if not self._ensure_initialized():
+            return {"success": False, "error": "没有可用的检索器"}
+        
         if images is None:
             images = []
         
@@ -1423,13 +2251,17 @@ class RAGService:
         # 生成文档摘要
         summary = self.indexer.document_summarizer.summarize(file_name, content)
         
-        # 创建元数据
-        file_hash = hashlib.md5(content.encode()).hexdigest()
+        # 创建元数据（安装了 blake3 时使用 SIMD 加速的 BLAKE3，加前缀以区分算法）
+        content_bytes = content.encode()
+        if BLAKE3_AVAILABLE:
+            file_hash = f"b3:{blake3(content_bytes).hexdigest()}"
+        else:
+            file_hash = hashlib.blake2b(content_bytes).hexdigest()
         metadata = {
             "file_path": f"uploaded/{file_name}",
             "file_type": file_type,
             "file_size": len(content),
-            "indexed_at": datetime.now().isoformat(),
+            "indexed_at": indexed_at or datetime.now().isoformat(),
             "file_hash": file_hash,
             "structure": json.dumps(structure, ensure_ascii=False),
             "summary": summary.get("summary", ""),
@@ -1443,30 +2275,30 @@ class RAGService:
         # 使用智能分块器
         chunks = self.indexer.smart_chunker.chunk(content, file_name, structure)
         
-        # 为每个块创建文档
-        documents = []
-        for i, chunk_data in enumerate(chunks):
-            chunk_metadata = metadata.copy()
-            chunk_metadata.update(chunk_data["metadata"])
-            chunk_metadata["chunk_index"] = i
-            chunk_metadata["total_chunks"] = len(chunks)
-            
-            # 如果有图片，在内容中添加图片信息
-            chunk_content = chunk_data["content"]
-            if images:
-                # 在文档开头添加图片信息
-                image_info = "\n\n".join([img.get("description", "[图片]") for img in images])
-                chunk_content = f"[文档包含 {len(images)} 张图片]\n{image_info}\n\n{chunk_content}"
-            
-            doc = Document(
-                content=chunk_content,
-                metadata=chunk_metadata
+        # 如果有图片，在每个块的开头添加图片信息
+        image_header = ""
+        if images:
+            image_info = "\n\n".join([img.get("description", "[图片]") for img in images])
+            image_header = f"[文档包含 {len(images)} 张图片]\n{image_info}\n\n"
+        
+        # 为每个块创建文档（每块元数据一次构造完成，值与文件级元数据共享）
+        total_chunks = len(chunks)
+        documents = [
+            Document(
+                content=image_header + chunk_data["content"],
+                metadata={
+                    **metadata,
+                    **chunk_data["metadata"],
+                    "chunk_index": i,
+                    "total_chunks": total_chunks
+                }
             )
-            documents.append(doc)
+            for i, chunk_data in enumerate(chunks)
+        ]
         
         # 添加到向量数据库
-        self._ensure_initialized()
         await self.retriever.add_documents(documents)
+        self._clear_query_cache()
         
         return {
             "success": True,
@@ -1490,12 +2322,14 @@ class RAGService:
         """
         total = len(file_paths)
         processed = 0
+        image_dir = os.path.join(self.indexer.storage_dir, "images")
+        indexed_at = datetime.now().isoformat()
         
         for file_path in file_paths:
             try:
                 # 读取文件（使用新的 read_file_content 函数支持 Word 文档和图片）
                 try:
-                    file_data = read_file_content(file_path, extract_images=True)
+                    file_data = read_file_content(file_path, extract_images=True, image_dir=image_dir)
                     content = file_data["content"]
                     images = file_data.get("images", [])
                 except Exception as e:
@@ -1512,7 +2346,7 @@ class RAGService:
                 file_type = os.path.splitext(file_name)[1].lower()
                 
                 # 添加文档
-                result = await self.add_document(file_name, content, file_type, images=images)
+                result = await self.add_document(file_name, content, file_type, images=images, indexed_at=indexed_at)
                 
                 processed += 1
                 
@@ -1545,13 +2379,25 @@ class RAGService:
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
-        self._ensure_initialized()
+        if not self._ensure_initialized():
+            return {}
         return self.retriever.get_stats()
     
+    @property
+    def index_version(self) -> int:
+        """项目索引内容的版本号，本进程内任一实例重新索引或增删文档后递增"""
+        return _INDEX_VERSIONS.get(self.project_path, 0)
+    
+    def _bump_index_version(self):
+        """索引内容变化后递增项目的 index_version"""
+        with _INDEX_VERSIONS_LOCK:
+            _INDEX_VERSIONS[self.project_path] = _INDEX_VERSIONS.get(self.project_path, 0) + 1
+    
     def reset(self):
         """重置 RAG 服务"""
         if self.retriever:
             self.retriever.delete_collection()
+        self._clear_query_cache()
         self._initialized = False
     
     def delete_document(self, doc_id: str) -> Dict[str, Any]:
@@ -1569,6 +2415,7 @@ class RAGService:
         try:
             if hasattr(self.retriever, 'delete_document'):
                 self.retriever.delete_document(doc_id)
+                self._clear_query_cache()
                 logger.info(f"Deleted document: {doc_id}")
                 return {
                     "success": True,
@@ -1618,6 +2465,7 @@ class RAGService:
             if hasattr(self.retriever, 'add_documents'):
                 import asyncio
                 asyncio.run(self.retriever.add_documents([new_doc]))
+                self._clear_query_cache()
                 logger.info(f"Updated document: {doc_id}")
                 return {
                     "success": True,
@@ -1803,12 +2651,7 @@ class RAGService:
     
     def _load_search_history(self):
         """加载搜索历史记录"""
-        history_file = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "..", "storage", "rag",
-            hashlib.md5(self.project_path.encode()).hexdigest(),
-            "search_history.json"
-        )
+        history_file = os.path.join(self.indexer.storage_dir, "search_history.json")
         
         if os.path.exists(history_file):
             try:
@@ -1821,12 +2664,7 @@ class RAGService:
     
     def _save_search_history(self):
         """保存搜索历史记录"""
-        history_file = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "..", "storage", "rag",
-            hashlib.md5(self.project_path.encode()).hexdigest(),
-            "search_history.json"
-        )
+        history_file = os.path.join(self.indexer.storage_dir, "search_history.json")
         
         os.makedirs(os.path.dirname(history_file), exist_ok=True)
         
@@ -4,19 +4,252 @@
 """
 
 import ast
+import os
 import re
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
-from backend.core.code_analyzer import CodeAnalyzer, get_code_analyzer
-from backend.core.code_style_analyzer import CodeStyleAnalyzer, get_code_style_analyzer
+from backend.core.code_analyzer import CodeAnalyzer, get_code_analyzer, _get_ast
 
 logger = logging.getLogger("RefactorSuggester")
 
+# analyze_file 结果缓存的最大条目数（按 LRU 淘汰）
+_ANALYSIS_CACHE_MAX_ENTRIES = 256
+
+# analyze_files 中少于该数量的待分析文件直接在当前进程中处理（启动进程池的开销更大）
+_PARALLEL_MIN_FILES = 32
+# analyze_files 每次分发给工作进程的文件数
+_PARALLEL_CHUNKSIZE = 16
+# analyze_files 默认工作进程数的环境变量（未设置时为 1，即不启用多进程）
+_WORKERS_ENV = "REFACTOR_WORKERS"
+
+# 重复代码检测：以连续多少行为一个代码块
+_DUPLICATE_WINDOW_LINES = 4
+# 重复代码检测：不超过该长度的行视为短行（全部由短行组成的代码块不检测）
+_DUPLICATE_MIN_LINE_LENGTH = 10
+# 重复代码检测：超过该行数的文件（多为生成文件）不做检测
+_DUPLICATE_MAX_LINES = 20000
+# 重复代码检测：不少于该行数的文件在 numba 可用时用 numba 内核计算窗口哈希
+_DUPLICATE_NUMBA_MIN_LINES = 2000
+
+# 重复代码窗口哈希的 numba 内核（可选，需要 numpy）
+try:
+    from backend.core._dup_numba import NUMBA_AVAILABLE
+    if NUMBA_AVAILABLE:
+        import numpy as np
+        from backend.core._dup_numba import window_hashes as _numba_window_hashes
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# 基于正则的检查规则
+_SCAN_PATTERNS = {
+    # 魔法数字（不是简单的 0, 1, -1）
+    "magic": r'\b(?!0|1|-1)\d{2,}\b',
+    # 循环中的数据库查询
+    "loop_query": r'for\s+\w+\s+in.*:\s+.*\.query\(',
+    # 硬编码的密钥
+    "secret": r'(?i:(password|secret|api_key|token)\s*=\s*["\'].*["\'])',
+    # 字符串格式化拼接的 SQL
+    "sql_injection": r'execute\s*\(\s*["\'].*%.*["\']\s*\)',
+}
+
+# 所有规则合并为一个正则，对内容只扫描一遍（按 lastgroup 区分命中的规则）。
+# 魔法数字需要逐个报告，正常匹配；其余规则只关心是否出现，用零宽前瞻包裹，
+# 避免它们的匹配范围吞掉同一区域内的魔法数字。前瞻分支先用这些规则可能的首字符
+# 过滤（f/p/s/a/t/e 及大写；忽略大小写时 ſ 等同于 s），大部分位置无需逐个尝试前瞻
+_SCAN_RE = re.compile(
+    f"(?P<magic>{_SCAN_PATTERNS['magic']})|(?=[aefpstAEFPST\u017f])(?:"
+    + "|".join(
+        f"(?=(?P<{name}>{pattern}))"
+        for name, pattern in _SCAN_PATTERNS.items()
+        if name != "magic"
+    )
+    + ")"
+)
+# Python 文件的魔法数字由 AST 检查，扫描时去掉 magic 分支
+_SCAN_FLAGS_RE = re.compile(
+    "(?=[aefpstAEFPST\u017f])(?:"
+    + "|".join(
+        f"(?=(?P<{name}>{pattern}))"
+        for name, pattern in _SCAN_PATTERNS.items()
+        if name != "magic"
+    )
+    + ")"
+)
+
+# 按 AST 分析的文件后缀
+_PYTHON_SUFFIXES = ('.py', '.pyi')
+
+# AST 中数值字面量的魔法数字判断，与正则扫描共用同一规则
+_MAGIC_RE = re.compile(_SCAN_PATTERNS["magic"])
+
+# 计入嵌套层级的语句块
+_NESTING_NODES = tuple(
+    getattr(ast, name)
+    for name in ('If', 'For', 'AsyncFor', 'While', 'With', 'AsyncWith', 'Try', 'TryStar', 'Match')
+    if hasattr(ast, name)
+)
+
+
+def _window_groups(stripped: List[str], window: int) -> Tuple[List[Optional[int]], Dict[int, List[int]]]:
+    """
+    按窗口哈希对行窗口分组
+    
+    Returns:
+        (每个窗口的哈希，不可能重复或全部为短行的窗口为 None；{窗口哈希: 窗口起始行下标列表}，按首次出现排序)
+    """
+    # 预过滤：重复窗口中的每一行在文件中都至少出现两次，
+    # 只需对完全由重复行组成的窗口计算哈希，大部分窗口无需构造
+    line_counts = Counter(stripped)
+    
+    window_keys: List[Optional[int]] = [None] * max(len(stripped) - window + 1, 0)
+    groups = defaultdict(list)
+    run = 0  # 以当前行结尾的连续重复行数
+    for j, text in enumerate(stripped):
+        run = run + 1 if line_counts[text] > 1 else 0
+        if run < window:
+            continue
+        i = j - window + 1
+        block = tuple(stripped[i:j + 1])
+        if all(len(line) <= _DUPLICATE_MIN_LINE_LENGTH for line in block):
+            continue
+        key = hash(block)
+        window_keys[i] = key
+        groups[key].append(i)
+    return window_keys, groups
+
+
+def _window_groups_numba(stripped: List[str], window: int) -> Tuple[List[Optional[int]], Dict[int, List[int]]]:
+    """_window_groups 的 numba 版本：内核计算 FNV-1a 窗口哈希，排序后找出相同哈希的连续段（只保留出现两次以上的）"""
+    # 去除首尾空白后的行不含换行符，拼接后按换行符切出每行的字节范围
+    buf = np.frombuffer('\n'.join(stripped).encode('utf-8', 'surrogatepass'), dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 10)
+    starts = np.concatenate(([0], newlines + 1)).astype(np.int64)
+    lengths = np.concatenate((newlines, [buf.size])).astype(np.int64) - starts
+    hashes, valid = _numba_window_hashes(buf, starts, lengths, window, _DUPLICATE_MIN_LINE_LENGTH)
+    
+    window_keys: List[Optional[int]] = [
+        key if ok else None for key, ok in zip(hashes.tolist(), valid.tolist())
+    ]
+    
+    candidates = np.flatnonzero(valid)
+    # 稳定排序：同一哈希内的窗口保持起始行递增
+    order = np.argsort(hashes[candidates], kind='stable')
+    sorted_starts = candidates[order]
+    sorted_hashes = hashes[sorted_starts]
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(sorted_hashes)) + 1, [sorted_hashes.size]))
+    runs = [
+        sorted_starts[a:b].tolist()
+        for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        if b - a >= 2
+    ]
+    # 与纯 Python 版本一致，按首次出现的位置排列
+    runs.sort(key=lambda starts: starts[0])
+    return window_keys, {window_keys[starts[0]]: starts for starts in runs}
+
+
+class _StructureVisitor(ast.NodeVisitor):
+    """一次遍历 Python AST，收集嵌套层级、数值字面量和函数参数"""
+    
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.depth = 0
+        # [(行号, 嵌套层级, 行内容)]，按先序遍历顺序
+        self.nesting: List[Tuple[int, int, str]] = []
+        # [(行号, 行内容, 数字)]
+        self.magic_numbers: List[Tuple[int, str, str]] = []
+        self.functions: List[Dict[str, Any]] = []
+    
+    def _line(self, lineno: int) -> str:
+        return self.lines[lineno - 1] if 0 < lineno <= len(self.lines) else ""
+    
+    def _visit_block(self, node: ast.AST) -> None:
+        self.depth += 1
+        self.nesting.append((node.lineno, self.depth, self._line(node.lineno)))
+        if isinstance(node, ast.If):
+            self.visit(node.test)
+            for child in node.body:
+                self.visit(child)
+            orelse = node.orelse
+            # elif 在 AST 中是 else 里的 If（与外层 if 对齐），不算多一层嵌套
+            if len(orelse) == 1 and isinstance(orelse[0], ast.If) and orelse[0].col_offset == node.col_offset:
+                self.depth -= 1
+                self.visit(orelse[0])
+                return
+            for child in orelse:
+                self.visit(child)
+        else:
+            self.generic_visit(node)
+        self.depth -= 1
+    
+    def visit(self, node: ast.AST) -> None:
+        if isinstance(node, _NESTING_NODES):
+            self._visit_block(node)
+        else:
+            super().visit(node)
+    
+    def visit_Constant(self, node: ast.Constant) -> None:
+        value = node.value
+        # 魔法数字：数值字面量（不含 bool）的源码按正则扫描的同一规则判断，两条路径结果一致
+        if type(value) in (int, float):
+            line = self._line(node.lineno)
+            text = str(value)
+            if node.end_lineno == node.lineno:
+                # col_offset 是 UTF-8 字节偏移
+                raw = line.encode('utf-8')[node.col_offset:node.end_col_offset]
+                text = raw.decode('utf-8', errors='replace')
+            match = _MAGIC_RE.search(text)
+            if match:
+                self.magic_numbers.append((node.lineno, line, match.group()))
+    
+    def _visit_assignment(self, node: ast.AST, targets: List[ast.AST]) -> None:
+        # 给全大写名称赋值即定义常量，正是魔法数字的推荐写法，不检查其值
+        if node.value is not None and all(isinstance(t, ast.Name) and t.id.isupper() for t in targets):
+            for target in targets:
+                self.visit(target)
+            return
+        self.generic_visit(node)
+    
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self._visit_assignment(node, node.targets)
+    
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self._visit_assignment(node, [node.target])
+    
+    def visit_FunctionDef(self, node: ast.AST) -> None:
+        args = node.args
+        parameters = [a.arg for a in (*args.posonlyargs, *args.args, *args.kwonlyargs)]
+        if args.vararg:
+            parameters.append(args.vararg.arg)
+        if args.kwarg:
+            parameters.append(args.kwarg.arg)
+        if parameters and parameters[0] in ('self', 'cls'):
+            parameters = parameters[1:]
+        self.functions.append({
+            "name": node.name,
+            "line_number": node.lineno,
+            "parameters": parameters,
+            "snippet": self._line(node.lineno).strip(),
+        })
+        self.generic_visit(node)
+    
+    visit_AsyncFunctionDef = visit_FunctionDef
+
 
 class RefactorSuggestion:
     """重构建议"""
     
+    # 全项目扫描会产生大量实例，用 __slots__ 省去每个实例的 __dict__
+    __slots__ = (
+        "suggestion_type", "title", "description", "severity", "file_path",
+        "line_number", "code_snippet", "suggested_fix", "category",
+    )
+    
     def __init__(
         self,
         suggestion_type: str,
@@ -58,7 +291,9 @@ class RefactorSuggester:
     
     def __init__(self):
         self.code_analyzer = get_code_analyzer()
-        self.code_style_analyzer = get_code_style_analyzer()
+        # 分析结果缓存：{(文件路径, 内容哈希): 建议元组}，内容未变时直接复用
+        self._cache: "OrderedDict[Tuple[str, bytes], Tuple[RefactorSuggestion, ...]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def analyze_file(
         self,
@@ -75,35 +310,121 @@ class RefactorSuggester:
         Returns:
             重构建议列表
         """
+        key = (file_path, hashlib.blake2b(content.encode('utf-8', 'ignore'), digest_size=16).digest())
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return list(cached)
+        
         suggestions = []
         
         try:
             # 代码结构分析
             code_analysis = self.code_analyzer.analyze(file_path, content)
             
-            # 代码风格分析
-            style_analysis = self.code_style_analyzer.analyze(content)
+            # 按行切分一次，供各项检查共用（按 '\n' 切分，与 AST 和正则扫描的行号一致）
+            lines = content.split('\n')
+            
+            # Python 文件的 AST 结构（嵌套、数值字面量、参数），其他语言为 None
+            structure = self._ast_walk(file_path, content, lines, key[1])
+            
+            # 正则规则单次扫描
+            scan = self._scan_content(content, magic=structure is None)
             
             # 生成各种重构建议
             suggestions.extend(self._check_function_length(file_path, content, code_analysis))
             suggestions.extend(self._check_complexity(file_path, content, code_analysis))
-            suggestions.extend(self._check_duplicate_code(file_path, content))
+            suggestions.extend(self._check_duplicate_code(file_path, lines))
             suggestions.extend(self._check_unused_variables(file_path, content, code_analysis))
-            suggestions.extend(self._check_magic_numbers(file_path, content))
-            suggestions.extend(self._check_long_parameter_list(file_path, content, code_analysis))
-            suggestions.extend(self._check_deep_nesting(file_path, content))
+            suggestions.extend(self._check_magic_numbers(file_path, scan, structure))
+            suggestions.extend(self._check_long_parameter_list(file_path, content, code_analysis, structure))
+            suggestions.extend(self._check_deep_nesting(file_path, lines, structure))
             suggestions.extend(self._check_large_classes(file_path, content, code_analysis))
-            suggestions.extend(self._check_code_smells(file_path, content))
-            suggestions.extend(self._check_performance_issues(file_path, content))
-            suggestions.extend(self._check_security_issues(file_path, content))
+            suggestions.extend(self._check_code_smells(file_path, scan))
+            suggestions.extend(self._check_performance_issues(file_path, scan))
+            suggestions.extend(self._check_security_issues(file_path, scan))
             
             logger.info(f"Generated {len(suggestions)} refactor suggestions for {file_path}")
             
         except Exception as e:
             logger.exception(f"Error analyzing file {file_path}: {e}")
+            return suggestions
+        
+        with self._cache_lock:
+            self._cache[key] = tuple(suggestions)
+            if len(self._cache) > _ANALYSIS_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
         
         return suggestions
     
+    def analyze_files(
+        self,
+        items: List[Tuple[str, str]],
+        workers: Optional[int] = None
+    ) -> List[List[RefactorSuggestion]]:
+        """
+        批量分析文件，指定多个工作进程且文件较多时用多进程并行
+        
+        多进程默认关闭：spawn 启动的工作进程会重新导入 __main__（服务进程下即 server.py 及其
+        全部依赖），只有文件很多时才划算。工作进程通过 get_refactor_suggester() 各自无参数构造
+        RefactorSuggester。结果会写入当前实例的缓存；进程池不可用时回退到逐个分析。
+        
+        Args:
+            items: [(文件路径, 文件内容), ...]
+            workers: 工作进程数，默认取环境变量 REFACTOR_WORKERS，未设置时为 1（逐个分析）
+        
+        Returns:
+            与 items 一一对应的重构建议列表
+        """
+        results: List[Optional[List[RefactorSuggestion]]] = [None] * len(items)
+        pending = []
+        for i, (file_path, content) in enumerate(items):
+            key = (file_path, hashlib.blake2b(content.encode('utf-8', 'ignore'), digest_size=16).digest())
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            if cached is not None:
+                results[i] = list(cached)
+            else:
+                pending.append((i, key))
+        
+        if workers is None:
+            workers = _default_workers()
+        if len(pending) >= _PARALLEL_MIN_FILES and workers > 1:
+            try:
+                # 使用 spawn 启动工作进程，避免在多线程的服务进程中 fork
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                ) as executor:
+                    outputs = list(executor.map(
+                        _worker_analyze,
+                        [items[i] for i, _ in pending],
+                        chunksize=_PARALLEL_CHUNKSIZE
+                    ))
+            except Exception as e:
+                logger.warning(f"Parallel refactor analysis failed, falling back to serial: {e}")
+            else:
+                with self._cache_lock:
+                    for (i, key), suggestions in zip(pending, outputs):
+                        results[i] = suggestions
+                        self._cache[key] = tuple(suggestions)
+                        self._cache.move_to_end(key)
+                    while len(self._cache) > _ANALYSIS_CACHE_MAX_ENTRIES:
+                        self._cache.popitem(last=False)
+                return results
+        
+        for i, _ in pending:
+            results[i] = self.analyze_file(*items[i])
+        return results
+    
+    def clear_cache(self) -> None:
+        """清空分析结果缓存"""
+        with self._cache_lock:
+            self._cache.clear()
+    
     def _check_function_length(
         self,
         file_path: str,
@@ -163,35 +484,66 @@ class RefactorSuggester:
     def _check_duplicate_code(
         self,
         file_path: str,
-        content: str
+        lines: List[str]
     ) -> List[RefactorSuggestion]:
-        """检查重复代码"""
-        suggestions = []
-        lines = content.split('\n')
+        """
+        检查重复代码
         
-        # 简单的重复代码检测
-        code_blocks = {}
-        for i, line in enumerate(lines):
-            if len(line.strip()) > 10:  # 忽略短行
-                if line.strip() in code_blocks:
-                    code_blocks[line.strip()].append(i)
-                else:
-                    code_blocks[line.strip()] = [i]
-        
-        # 找出重复的代码块
-        for code, line_numbers in code_blocks.items():
-            if len(line_numbers) > 2:  # 重复超过2次
-                suggestions.append(RefactorSuggestion(
-                    suggestion_type="duplicate_code",
-                    title="重复代码",
-                    description=f"代码片段在文件中重复出现 {len(line_numbers)} 次。重复代码会增加维护成本。",
-                    severity="medium",
-                    file_path=file_path,
-                    line_number=line_numbers[0],
-                    code_snippet=code,
-                    suggested_fix="提取重复代码为独立的函数或常量。",
-                    category="maintainability"
-                ))
+        以连续 _DUPLICATE_WINDOW_LINES 行（去除首尾空白）为窗口，按窗口的哈希值分组，
+        同一组的窗口即重复的代码块；更长的重复块由多个相邻窗口组成，只在第一个窗口处报告一次。
+        """
+        suggestions = []
+        if len(lines) > _DUPLICATE_MAX_LINES:
+            return [RefactorSuggestion(
+                suggestion_type="large_file",
+                title="文件过大",
+                description=f"文件有 {len(lines)} 行，超过了 {_DUPLICATE_MAX_LINES} 行，已跳过重复代码检测。",
+                severity="low",
+                file_path=file_path,
+                line_number=1,
+                code_snippet="",
+                suggested_fix="如果不是生成文件，考虑将其拆分为多个模块。",
+                category="maintainability"
+            )]
+        
+        stripped = [line.strip() for line in lines]
+        window = _DUPLICATE_WINDOW_LINES
+        
+        if NUMBA_AVAILABLE and len(stripped) >= _DUPLICATE_NUMBA_MIN_LINES:
+            window_keys, groups = _window_groups_numba(stripped, window)
+        else:
+            window_keys, groups = _window_groups(stripped, window)
+        
+        def occurrences(start: int) -> List[int]:
+            """与 start 处窗口内容相同的所有窗口（排除哈希冲突）"""
+            block = stripped[start:start + window]
+            return [i for i in groups.get(window_keys[start], ()) if stripped[i:i + window] == block]
+        
+        for starts in groups.values():
+            if len(starts) < 2:
+                continue
+            starts = occurrences(starts[0])
+            if len(starts) < 2:
+                continue
+            
+            # 每个位置的前一个窗口也互相重复时，说明是同一重复块的延续，已在前面报告
+            if starts[0] > 0 and window_keys[starts[0] - 1] is not None:
+                if occurrences(starts[0] - 1) == [i - 1 for i in starts]:
+                    continue
+            
+            line_numbers = [i + 1 for i in starts]
+            suggestions.append(RefactorSuggestion(
+                suggestion_type="duplicate_code",
+                title="重复代码",
+                description=f"连续 {window} 行以上的代码块在文件中重复出现 {len(starts)} 次"
+                            f"（第 {', '.join(map(str, line_numbers[:3]))} 行等）。重复代码会增加维护成本。",
+                severity="medium",
+                file_path=file_path,
+                line_number=line_numbers[0],
+                code_snippet='\n'.join(lines[starts[0]:starts[0] + window]),
+                suggested_fix="提取重复代码为独立的函数或常量。",
+                category="maintainability"
+            ))
         
         return suggestions
     
@@ -222,32 +574,103 @@ class RefactorSuggester:
         
         return suggestions
     
+    def _ast_walk(
+        self,
+        file_path: str,
+        content: str,
+        lines: List[str],
+        digest: Optional[bytes] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        解析 Python 文件并单次遍历 AST
+        
+        Returns:
+            {"nesting": [(行号, 层级, 行内容)], "magic_numbers": [(行号, 行内容, 数字)], "functions": [...]}；
+            非 Python 文件或无法解析时返回 None（回退到基于文本的检查）
+        """
+        if not file_path.lower().endswith(_PYTHON_SUFFIXES):
+            return None
+        try:
+            tree = _get_ast(content, digest)
+        except (SyntaxError, ValueError, RecursionError):
+            return None
+        
+        visitor = _StructureVisitor(lines)
+        try:
+            visitor.visit(tree)
+        except RecursionError:
+            return None
+        return {
+            "nesting": visitor.nesting,
+            "magic_numbers": visitor.magic_numbers,
+            "functions": visitor.functions,
+        }
+    
+    def _scan_content(self, content: str, magic: bool = True) -> Dict[str, Any]:
+        """
+        用合并后的正则单次扫描内容（magic 为 False 时不检查魔法数字）
+        
+        Returns:
+            {"magic": [(行号, 行内容, 数字), ...], "loop_query": bool, "secret": bool, "sql_injection": bool,
+             "class_count": int, "self_count": int, "has_join": bool, "plus_count": int}
+        """
+        # 字面量计数直接用 str.count（C 实现），比并入正则后逐个匹配回调更快；
+        # 用到 "+" 计数的规则要求内容中没有 join，有 join 时跳过这次计数
+        has_join = 'join' in content
+        result = {
+            "magic": [], "loop_query": False, "secret": False, "sql_injection": False,
+            "class_count": content.count('class '),
+            "self_count": content.count('self.'),
+            "has_join": has_join,
+            "plus_count": 0 if has_join else content.count('+'),
+        }
+        found = result["magic"]
+        # 当前匹配所在行的起止位置（匹配按位置递增，只需向后推进）
+        line_number = 1
+        line_start = 0
+        line_end = content.find('\n')
+        if line_end < 0:
+            line_end = len(content)
+        
+        for match in (_SCAN_RE if magic else _SCAN_FLAGS_RE).finditer(content):
+            name = match.lastgroup
+            if name != "magic":
+                result[name] = True
+                continue
+            
+            pos = match.start()
+            while pos > line_end:
+                line_number += 1
+                line_start = line_end + 1
+                line_end = content.find('\n', line_start)
+                if line_end < 0:
+                    line_end = len(content)
+            found.append((line_number, content[line_start:line_end], match.group()))
+        
+        return result
+    
     def _check_magic_numbers(
         self,
         file_path: str,
-        content: str
+        scan: Dict[str, Any],
+        structure: Optional[Dict[str, Any]] = None
     ) -> List[RefactorSuggestion]:
-        """检查魔法数字"""
+        """检查魔法数字（Python 文件使用 AST 中的数值字面量，忽略注释、字符串和常量定义）"""
         suggestions = []
+        magic_numbers = structure["magic_numbers"] if structure is not None else scan["magic"]
         
-        # 匹配数字（不是简单的 0, 1, -1）
-        magic_number_pattern = r'\b(?!0|1|-1)\d{2,}\b'
-        
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            matches = re.finditer(magic_number_pattern, line)
-            for match in matches:
-                suggestions.append(RefactorSuggestion(
-                    suggestion_type="magic_number",
-                    title="魔法数字",
-                    description=f"使用了魔法数字 '{match.group()}'。魔法数字降低了代码的可读性和可维护性。",
-                    severity="low",
-                    file_path=file_path,
-                    line_number=i + 1,
-                    code_snippet=line.strip(),
-                    suggested_fix=f"将魔法数字 '{match.group()}' 替换为有意义的常量。",
-                    category="readability"
-                ))
+        for line_number, line, number in magic_numbers:
+            suggestions.append(RefactorSuggestion(
+                suggestion_type="magic_number",
+                title="魔法数字",
+                description=f"使用了魔法数字 '{number}'。魔法数字降低了代码的可读性和可维护性。",
+                severity="low",
+                file_path=file_path,
+                line_number=line_number,
+                code_snippet=line.strip(),
+                suggested_fix=f"将魔法数字 '{number}' 替换为有意义的常量。",
+                category="readability"
+            ))
         
         return suggestions
     
@@ -255,13 +678,17 @@ class RefactorSuggester:
         self,
         file_path: str,
         content: str,
-        code_analysis: Dict[str, Any]
+        code_analysis: Dict[str, Any],
+        structure: Optional[Dict[str, Any]] = None
     ) -> List[RefactorSuggestion]:
         """检查过长的参数列表"""
         suggestions = []
         max_params = 5
         
-        functions = code_analysis.get("functions", [])
+        if structure is not None:
+            functions = structure["functions"]
+        else:
+            functions = code_analysis.get("functions", [])
         
         for func in functions:
             param_count = len(func.get("parameters", []))
@@ -283,17 +710,45 @@ class RefactorSuggester:
     def _check_deep_nesting(
         self,
         file_path: str,
-        content: str
+        lines: List[str],
+        structure: Optional[Dict[str, Any]] = None
     ) -> List[RefactorSuggestion]:
         """检查过深的嵌套"""
         suggestions = []
         max_nesting = 4
         
-        lines = content.split('\n')
+        if structure is not None:
+            # 按语句块统计：每段超限的嵌套只在最外层超限的语句块处报告一次，层级取其中最深处
+            current = None
+            for line_number, depth, line in structure["nesting"]:
+                if depth <= max_nesting:
+                    continue
+                if depth == max_nesting + 1:
+                    current = [line_number, depth, line]
+                    suggestions.append(current)
+                elif depth > current[1]:
+                    current[1] = depth
+            return [
+                RefactorSuggestion(
+                    suggestion_type="deep_nesting",
+                    title="过深的嵌套",
+                    description=f"代码嵌套层级达到 {nesting_level}，超过了推荐的 {max_nesting} 层。深嵌套会降低代码可读性。",
+                    severity="medium",
+                    file_path=file_path,
+                    line_number=line_number,
+                    code_snippet=line.strip(),
+                    suggested_fix="使用早期返回、提取方法或卫语句来减少嵌套层级。",
+                    category="readability"
+                )
+                for line_number, nesting_level, line in suggestions
+            ]
+        
+        max_indent = max_nesting * 4  # 假设每个缩进是4个空格
         for i, line in enumerate(lines):
-            # 计算缩进级别
-            indent = len(line) - len(line.lstrip())
-            if indent > max_nesting * 4:  # 假设每个缩进是4个空格
+            # 计算缩进级别（在 CPython 中 lstrip 比正则匹配缩进更快，去掉缩进的结果顺便用作代码片段）
+            rest = line.lstrip()
+            indent = len(line) - len(rest)
+            if indent > max_indent:
                 nesting_level = indent // 4
                 suggestions.append(RefactorSuggestion(
                     suggestion_type="deep_nesting",
@@ -302,7 +757,7 @@ class RefactorSuggester:
                     severity="medium",
                     file_path=file_path,
                     line_number=i + 1,
-                    code_snippet=line.strip(),
+                    code_snippet=rest.rstrip(),
                     suggested_fix="使用早期返回、提取方法或卫语句来减少嵌套层级。",
                     category="readability"
                 ))
@@ -340,13 +795,13 @@ class RefactorSuggester:
     def _check_code_smells(
         self,
         file_path: str,
-        content: str
+        scan: Dict[str, Any]
     ) -> List[RefactorSuggestion]:
         """检查代码异味"""
         suggestions = []
         
         # 检查 God Object
-        if content.count('class ') > 5:
+        if scan["class_count"] > 5:
             suggestions.append(RefactorSuggestion(
                 suggestion_type="god_object",
                 title="可能的 God Object",
@@ -360,7 +815,7 @@ class RefactorSuggester:
             ))
         
         # 检查 Feature Envy
-        if content.count('self.') > 20:
+        if scan["self_count"] > 20:
             suggestions.append(RefactorSuggestion(
                 suggestion_type="feature_envy",
                 title="可能的 Feature Envy",
@@ -378,13 +833,13 @@ class RefactorSuggester:
     def _check_performance_issues(
         self,
         file_path: str,
-        content: str
+        scan: Dict[str, Any]
     ) -> List[RefactorSuggestion]:
         """检查性能问题"""
         suggestions = []
         
         # 检查循环中的数据库查询
-        if re.search(r'for\s+\w+\s+in.*:\s+.*\.query\(', content, re.MULTILINE):
+        if scan["loop_query"]:
             suggestions.append(RefactorSuggestion(
                 suggestion_type="n_plus_one_query",
                 title="可能的 N+1 查询问题",
@@ -398,7 +853,7 @@ class RefactorSuggester:
             ))
         
         # 检查不必要的字符串拼接
-        if content.count('+') > 10 and 'join' not in content:
+        if not scan["has_join"] and scan["plus_count"] > 10:
             suggestions.append(RefactorSuggestion(
                 suggestion_type="inefficient_string_concat",
                 title="低效的字符串拼接",
@@ -416,13 +871,13 @@ class RefactorSuggester:
     def _check_security_issues(
         self,
         file_path: str,
-        content: str
+        scan: Dict[str, Any]
     ) -> List[RefactorSuggestion]:
         """检查安全问题"""
         suggestions = []
         
         # 检查硬编码的密钥
-        if re.search(r'(password|secret|api_key|token)\s*=\s*["\'].*["\']', content, re.IGNORECASE):
+        if scan["secret"]:
             suggestions.append(RefactorSuggestion(
                 suggestion_type="hardcoded_secret",
                 title="硬编码的敏感信息",
@@ -436,7 +891,7 @@ class RefactorSuggester:
             ))
         
         # 检查 SQL 注入风险
-        if re.search(r'execute\s*\(\s*["\'].*%.*["\']\s*\)', content):
+        if scan["sql_injection"]:
             suggestions.append(RefactorSuggestion(
                 suggestion_type="sql_injection",
                 title="可能的 SQL 注入风险",
@@ -456,6 +911,23 @@ class RefactorSuggester:
 _refactor_suggester = None
 
 
+def _default_workers() -> int:
+    """读取 REFACTOR_WORKERS 环境变量，无效值按 1 处理"""
+    value = os.getenv(_WORKERS_ENV)
+    if not value:
+        return 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(f"Invalid {_WORKERS_ENV}={value!r}, analyzing files serially")
+        return 1
+
+
+def _worker_analyze(item: Tuple[str, str]) -> List[RefactorSuggestion]:
+    """analyze_files 的工作进程入口（模块级函数，可被 pickle）"""
+    return get_refactor_suggester().analyze_file(*item)
+
+
 def get_refactor_suggester() -> RefactorSuggester:
     """获取重构建议服务实例"""
     global _refactor_suggester
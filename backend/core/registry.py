@@ -3,6 +3,9 @@ import json
 from typing import Callable, Dict, Any, get_type_hints
 from functools import wraps
 
+# Python type -> JSON schema type; anything else is described as a string
+_TYPE_MAP = {int: "integer", bool: "boolean", float: "number", str: "string"}
+
 class ToolRegistry:
     def __init__(self):
         self._tools: Dict[str, Callable] = {}
@@ -25,8 +28,26 @@ class ToolRegistry:
     def get_tool(self, name: str) -> Callable:
         return self._tools.get(name)
 
+    @staticmethod
+    def _cached_schema(func: Callable):
+        """Finds a memoized schema on func or, through functools.wraps, on the function it wraps."""
+        while func is not None:
+            cached = getattr(func, "__tool_schema__", None)
+            if cached is not None:
+                return cached
+            # A wrapper with its own __signature__ may describe different parameters
+            if "__signature__" in getattr(func, "__dict__", {}):
+                return None
+            func = getattr(func, "__wrapped__", None)
+        return None
+
     def _generate_schema(self, func: Callable) -> Dict[str, Any]:
         """Generates an OpenAI-compatible function schema from docstrings and type hints."""
+        # Memoized on the function itself, so re-registering the same tool is free
+        cached = self._cached_schema(func)
+        if cached is not None:
+            return cached
+
         sig = inspect.signature(func)
         doc = inspect.getdoc(func) or "No description provided."
         
@@ -41,12 +62,7 @@ class ToolRegistry:
         for name, param in sig.parameters.items():
             if name == "self": continue
             
-            param_type = "string" # Default
-            if name in type_hints:
-                t = type_hints[name]
-                if t == int: param_type = "integer"
-                elif t == bool: param_type = "boolean"
-                elif t == float: param_type = "number"
+            param_type = _TYPE_MAP.get(type_hints.get(name), "string")
             
             parameters["properties"][name] = {
                 "type": param_type,
@@ -55,7 +71,7 @@ class ToolRegistry:
             if param.default == inspect.Parameter.empty:
                 parameters["required"].append(name)
                 
-        return {
+        schema = {
             "type": "function",
             "function": {
                 "name": func.__name__,
@@ -63,3 +79,8 @@ class ToolRegistry:
                 "parameters": parameters
             }
         }
+        try:
+            func.__tool_schema__ = schema
+        except AttributeError:
+            pass  # e.g. bound methods or builtins don't accept attributes
+        return schema
@@ -9,9 +9,32 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import logging
 import subprocess
+import threading
 
 logger = logging.getLogger(__name__)
 
+# 单次 git log 的超时时间（秒）
+_GIT_TIMEOUT = 10
+
+# 提交信息分类关键字
+_BUG_KEYWORDS = frozenset({'fix', 'bug', 'issue', 'error', 'crash', 'patch', 'hotfix'})
+_FEATURE_KEYWORDS = frozenset({'feat', 'feature', 'add', 'new', 'implement', 'create'})
+
+
+def _keyword_regex(keywords: frozenset) -> re.Pattern:
+    """
+    把关键字集合编译成一个正则，一次 search 完成匹配
+
+    只要求关键字前不是英文字母，这样 "fixed"、"bugs"、"feat:" 仍能命中，而 "prefix"、"renew" 不会误判
+    """
+    # 集合无序，排序后生成的正则是确定的
+    alternatives = '|'.join(re.escape(k) for k in sorted(keywords))
+    return re.compile(rf'(?<![a-z])(?:{alternatives})', re.IGNORECASE)
+
+
+_BUG_RE = _keyword_regex(_BUG_KEYWORDS)
+_FEAT_RE = _keyword_regex(_FEATURE_KEYWORDS)
+
 
 class ReportGenerator:
     """报告生成器 - 自动生成日报和周报"""
@@ -24,6 +47,33 @@ class ReportGenerator:
             project_path: 项目根目录路径
         """
         self.project_path = Path(project_path)
+        # 按日期缓存的提交列表；实例按项目长期复用，缓存只对 _commit_cache_head 这个 HEAD 有效
+        self._commit_cache: Dict[str, List[Dict]] = {}
+        self._commit_cache_head: Optional[str] = None
+
+    def _git_head(self) -> Optional[str]:
+        """当前 HEAD 的提交哈希；不是 git 仓库或 git 不可用时返回 None"""
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                cwd=self.project_path,
+                capture_output=True,
+                text=True,
+                timeout=_GIT_TIMEOUT
+            )
+        except Exception as e:
+            logger.warning(f"获取 Git HEAD 失败: {e}")
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() or None
+
+    def _refresh_commit_cache(self) -> None:
+        """HEAD 变化（新提交、git pull、合并、变基、切换分支）后清空提交缓存"""
+        head = self._git_head()
+        if head is None or head != self._commit_cache_head:
+            self._commit_cache.clear()
+        self._commit_cache_head = head
 
     def generate_daily_report(self, date: Optional[str] = None) -> Dict:
         """
@@ -38,13 +88,18 @@ class ReportGenerator:
         if date is None:
             date = datetime.now().strftime('%Y-%m-%d')
 
+        self._refresh_commit_cache()
+        return self._build_daily_report(date, self._get_git_commits(date), self._analyze_code_changes(date))
+
+    def _build_daily_report(self, date: str, commits: List[Dict], code_changes: Dict) -> Dict:
+        """根据已获取的提交和代码变更生成日报"""
         # 收集数据
         data = {
             'date': date,
-            'commits': self._get_git_commits(date),
-            'code_changes': self._analyze_code_changes(date),
-            'bug_fixes': self._count_bug_fixes(date),
-            'features': self._identify_new_features(date),
+            'commits': commits,
+            'code_changes': code_changes,
+            'bug_fixes': self._count_bug_fixes(date, commits),
+            'features': self._identify_new_features(date, commits),
             'chat_history': self._get_chat_summary(date)
         }
 
@@ -73,20 +128,22 @@ class ReportGenerator:
             today = datetime.now()
             start_date = (today - timedelta(days=today.weekday())).strftime('%Y-%m-%d')
 
-        # 收集一周的数据
+        self._refresh_commit_cache()
+
+        # 收集一周的数据（一次 git log 取回整周的提交和代码变更，再按天拆分）
         daily_reports = []
         current_date = datetime.strptime(start_date, '%Y-%m-%d')
+        dates = [(current_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]  # 一周7天
+        activity = self._get_git_activity_range(dates)
 
-        for i in range(7):  # 一周7天
-            date_str = current_date.strftime('%Y-%m-%d')
-            daily_report = self.generate_daily_report(date_str)
-            daily_reports.append(daily_report)
-            current_date += timedelta(days=1)
+        for date_str in dates:
+            commits, code_changes = activity[date_str]
+            daily_reports.append(self._build_daily_report(date_str, commits, code_changes))
 
         # 汇总周报
         weekly_report = {
             'start_date': start_date,
-            'end_date': (current_date - timedelta(days=1)).strftime('%Y-%m-%d'),
+            'end_date': dates[-1],
             'daily_reports': daily_reports,
             'summary': self._generate_weekly_summary(daily_reports),
             'metrics': self._calculate_weekly_metrics(daily_reports)
@@ -94,111 +151,190 @@ class ReportGenerator:
 
         return weekly_report
 
+    def _git_log_lines(self, args: List[str]):
+        """
+        逐行读取 git log 的输出（边读边解析，不在内存中保留完整输出）
+
+        git 退出码非 0 或超时被终止时，在读完输出后抛出 RuntimeError；
+        调用方应先把解析结果放在局部变量中，成功后再使用。
+        """
+        with subprocess.Popen(
+            ['git', 'log', *args],
+            cwd=self.project_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        ) as proc:
+            # 超时后终止 git，读取循环随之结束
+            timer = threading.Timer(_GIT_TIMEOUT, proc.kill)
+            timer.start()
+            try:
+                for line in proc.stdout:
+                    yield line.rstrip('\n')
+                proc.wait()
+            finally:
+                timer.cancel()
+        if proc.returncode != 0:
+            raise RuntimeError(f"git log 失败 (退出码 {proc.returncode})")
+
     def _get_git_commits(self, date: str) -> List[Dict]:
         """获取指定日期的 Git 提交"""
+        cached = self._commit_cache.get(date)
+        if cached is not None:
+            return cached
+
         commits = []
 
         try:
             # 获取指定日期的提交
-            result = subprocess.run(
-                ['git', 'log', '--since', f'{date} 00:00:00', '--until', f'{date} 23:59:59',
-                 '--pretty=format:%H|%an|%ae|%ad|%s', '--date=iso'],
-                cwd=self.project_path,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        parts = line.split('|')
-                        if len(parts) >= 5:
-                            commits.append({
-                                'hash': parts[0],
-                                'author': parts[1],
-                                'email': parts[2],
-                                'date': parts[3],
-                                'message': parts[4]
-                            })
+            parsed = []
+            for line in self._git_log_lines(
+                ['--since', f'{date} 00:00:00', '--until', f'{date} 23:59:59',
+                 '--pretty=format:%H|%an|%ae|%ad|%s', '--date=iso']
+            ):
+                if line:
+                    parts = line.split('|')
+                    if len(parts) >= 5:
+                        parsed.append(self._parse_commit(parts))
+            commits = parsed
+            self._commit_cache[date] = commits
         except Exception as e:
             logger.warning(f"获取 Git 提交失败: {e}")
 
         return commits
 
-    def _analyze_code_changes(self, date: str) -> Dict:
-        """分析代码变更"""
-        changes = {
+    @staticmethod
+    def _parse_commit(parts: List[str]) -> Dict:
+        """解析 '%H|%an|%ae|%ad|%s' 格式的提交记录"""
+        return {
+            'hash': parts[0],
+            'author': parts[1],
+            'email': parts[2],
+            'date': parts[3],
+            'message': parts[4]
+        }
+
+    @staticmethod
+    def _new_code_changes() -> Dict:
+        """空的代码变更统计"""
+        return {
             'lines_added': 0,
             'lines_deleted': 0,
             'files_changed': [],
             'file_types': {}
         }
 
+    @staticmethod
+    def _add_numstat_line(changes: Dict, files_changed: set, line: str) -> None:
+        """累加一行 --numstat 输出（新增行数\t删除行数\t文件路径）"""
+        parts = line.split('\t')
+        if len(parts) >= 3:
+            added = int(parts[0]) if parts[0] != '-' else 0
+            deleted = int(parts[1]) if parts[1] != '-' else 0
+            file_path = parts[2]
+
+            changes['lines_added'] += added
+            changes['lines_deleted'] += deleted
+            files_changed.add(file_path)
+
+            # 统计文件类型
+            file_ext = Path(file_path).suffix
+            if file_ext:
+                changes['file_types'][file_ext] = changes['file_types'].get(file_ext, 0) + 1
+
+    def _get_git_activity_range(self, dates: List[str]) -> Dict[str, tuple]:
+        """
+        一次 git log 获取连续多天的提交和代码变更，并按提交日期（本地时间）分组
+
+        Args:
+            dates: 按顺序排列的连续日期 (YYYY-MM-DD)
+
+        Returns:
+            {日期: (提交列表, 代码变更)}，格式与 _get_git_commits / _analyze_code_changes 相同
+        """
+        def empty_buckets():
+            return {date: ([], self._new_code_changes(), set()) for date in dates}
+
+        buckets = empty_buckets()
+        ok = False
+
         try:
-            # 获取代码统计
-            result = subprocess.run(
-                ['git', 'log', '--since', f'{date} 00:00:00', '--until', f'{date} 23:59:59',
-                 '--pretty=format:', '--numstat'],
-                cwd=self.project_path,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            # 每个提交以 NUL 开头的一行表示（提交时间戳|提交信息），随后是它的 numstat 行
+            bucket = None
+            for line in self._git_log_lines(
+                ['--since', f'{dates[0]} 00:00:00', '--until', f'{dates[-1]} 23:59:59',
+                 '--pretty=format:%x00%ct|%H|%an|%ae|%ad|%s', '--date=iso', '--numstat']
+            ):
+                if line.startswith('\x00'):
+                    timestamp, _, rest = line[1:].partition('|')
+                    # 与 --since/--until 一致，按提交者时间在本地时区的日期分组
+                    date = datetime.fromtimestamp(int(timestamp)).strftime('%Y-%m-%d')
+                    bucket = buckets.get(date)
+                    parts = rest.split('|')
+                    if bucket is not None and len(parts) >= 5:
+                        bucket[0].append(self._parse_commit(parts))
+                elif line and bucket is not None:
+                    self._add_numstat_line(bucket[1], bucket[2], line)
+            ok = True
+        except Exception as e:
+            logger.warning(f"获取 Git 提交失败: {e}")
+            # 不使用失败前已解析的部分结果
+            buckets = empty_buckets()
+
+        activity = {}
+        for date, (commits, changes, files_changed) in buckets.items():
+            changes['files_changed'] = list(files_changed)
+            activity[date] = (commits, changes)
+            if ok:
+                self._commit_cache[date] = commits
+        return activity
 
-            if result.returncode == 0:
-                files_changed = set()
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        parts = line.split('\t')
-                        if len(parts) >= 3:
-                            added = int(parts[0]) if parts[0] != '-' else 0
-                            deleted = int(parts[1]) if parts[1] != '-' else 0
-                            file_path = parts[2]
-
-                            changes['lines_added'] += added
-                            changes['lines_deleted'] += deleted
-                            files_changed.add(file_path)
-
-                            # 统计文件类型
-                            file_ext = Path(file_path).suffix
-                            if file_ext:
-                                changes['file_types'][file_ext] = changes['file_types'].get(file_ext, 0) + 1
-
-                changes['files_changed'] = list(files_changed)
+    def _analyze_code_changes(self, date: str) -> Dict:
+        """分析代码变更"""
+        changes = self._new_code_changes()
+
+        try:
+            # 获取代码统计
+            stats = self._new_code_changes()
+            files_changed = set()
+            for line in self._git_log_lines(
+                ['--since', f'{date} 00:00:00', '--until', f'{date} 23:59:59',
+                 '--pretty=format:', '--numstat']
+            ):
+                if line:
+                    self._add_numstat_line(stats, files_changed, line)
+
+            stats['files_changed'] = list(files_changed)
+            changes = stats
         except Exception as e:
             logger.warning(f"分析代码变更失败: {e}")
 
         return changes
 
-    def _count_bug_fixes(self, date: str) -> int:
-        """统计 Bug 修复数量"""
+    def _count_bug_fixes(self, date: str, commits: Optional[List[Dict]] = None) -> int:
+        """统计 Bug 修复数量（commits 为 None 时查询当天的提交）"""
         bug_fixes = 0
 
         try:
-            commits = self._get_git_commits(date)
-            bug_keywords = ['fix', 'bug', 'issue', 'error', 'crash', 'patch', 'hotfix']
-
+            if commits is None:
+                commits = self._get_git_commits(date)
             for commit in commits:
-                message = commit['message'].lower()
-                if any(keyword in message for keyword in bug_keywords):
+                if _BUG_RE.search(commit['message']):
                     bug_fixes += 1
         except Exception as e:
             logger.warning(f"统计 Bug 修复失败: {e}")
 
         return bug_fixes
 
-    def _identify_new_features(self, date: str) -> List[str]:
-        """识别新功能"""
+    def _identify_new_features(self, date: str, commits: Optional[List[Dict]] = None) -> List[str]:
+        """识别新功能（commits 为 None 时查询当天的提交）"""
         features = []
 
         try:
-            commits = self._get_git_commits(date)
-            feature_keywords = ['feat', 'feature', 'add', 'new', 'implement', 'create']
-
+            if commits is None:
+                commits = self._get_git_commits(date)
             for commit in commits:
-                message = commit['message'].lower()
-                if any(keyword in message for keyword in feature_keywords):
+                if _FEAT_RE.search(commit['message']):
                     features.append(commit['message'])
         except Exception as e:
             logger.warning(f"识别新功能失败: {e}")
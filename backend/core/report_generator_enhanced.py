@@ -6,23 +6,195 @@
 import re
 import logging
 import json
+import asyncio
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from pathlib import Path
 
 logger = logging.getLogger("EnhancedReportGenerator")
 
+# 每天 Git 统计缓存的最大条目数（按 LRU 淘汰）
+_ACTIVITY_CACHE_MAX_ENTRIES = 1024
+
+# 提交分类：消息中包含任一关键字即归入该类（子串匹配，不区分大小写）
+_BUG_RE = re.compile(r"fix|bug|修复|错误", re.IGNORECASE)
+_FEAT_RE = re.compile(r"feat|add|new|新增|添加", re.IGNORECASE)
+
 
 class EnhancedReportGenerator:
     """增强的报告生成器"""
     
     def __init__(self):
-        self.activity_cache = {}
+        # 每天的 Git 统计缓存：{(项目路径, HEAD 提交, 日期): 统计}
+        self.activity_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        # 每个项目一把锁，避免并发请求重复查询同一范围
+        self._activity_locks: Dict[str, asyncio.Lock] = {}
+    
+    @staticmethod
+    def _date_range(start_date: str, end_date: str) -> List[str]:
+        """start_date 到 end_date（包含）之间的每一天 (YYYY-MM-DD)"""
+        dates = []
+        current = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        while current <= end:
+            dates.append(current.strftime("%Y-%m-%d"))
+            current += timedelta(days=1)
+        return dates
+    
+    @staticmethod
+    def _empty_aggregate() -> Dict[str, Any]:
+        """某一天的空统计"""
+        return {"commits": [], "insertions": 0, "deletions": 0, "files": set()}
+    
+    async def _collect_range(self, project_path: str, start_date: str, end_date: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        用一次 git log --numstat 收集日期范围内的提交和代码行数，按提交日期分组
+
+        git 以异步子进程运行，等待输出期间不阻塞事件循环
+        
+        Args:
+            project_path: 项目路径
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)，包含当天
+        
+        Returns:
+            {日期: {"commits": [...], "insertions": int, "deletions": int, "files": set}}，
+            范围内每天都有条目；git 失败时返回 None
+        """
+        days = {date: self._empty_aggregate() for date in self._date_range(start_date, end_date)}
+        
+        try:
+            # 每个提交以 NUL 开头的一行表示（提交时间戳|提交信息），随后是它的 numstat 行
+            proc = await asyncio.create_subprocess_exec(
+                "git", "log", f"--since={start_date} 00:00:00", f"--until={end_date} 23:59:59",
+                "--pretty=format:%x00%ct|%h|%s|%an|%ad", "--date=iso", "--numstat",
+                cwd=project_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+            
+            if proc.returncode != 0:
+                logger.error(f"Failed to get git commits: git log exited with {proc.returncode}")
+                return None
+            
+            day = None
+            for line in stdout.decode("utf-8", errors="replace").split('\n'):
+                if line.startswith('\x00'):
+                    timestamp, _, rest = line[1:].partition('|')
+                    # 与 --since/--until 一致，按提交时间在本地时区的日期分组
+                    day = days.get(datetime.fromtimestamp(int(timestamp)).strftime("%Y-%m-%d"))
+                    # 作者和日期从右侧切出，提交信息中含有 | 时也能完整保留
+                    rest, _, commit_date = rest.rpartition('|')
+                    rest, _, author = rest.rpartition('|')
+                    commit_hash, sep, message = rest.partition('|')
+                    if day is not None and sep:
+                        day["commits"].append({
+                            "hash": commit_hash,
+                            "message": message,
+                            "author": author,
+                            "date": commit_date
+                        })
+                elif line and day is not None:
+                    # 新增行数\t删除行数\t文件路径（二进制文件为 -）
+                    parts = line.split('\t')
+                    if len(parts) >= 3:
+                        day["insertions"] += int(parts[0]) if parts[0] != '-' else 0
+                        day["deletions"] += int(parts[1]) if parts[1] != '-' else 0
+                        day["files"].add(parts[2])
+        except Exception as e:
+            logger.error(f"Failed to get git commits: {e}")
+            return None
+        
+        return days
+    
+    async def _git_head(self, project_path: str) -> Optional[str]:
+        """当前 HEAD 的提交哈希；不是 git 仓库或 git 不可用时返回 None"""
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "git", "rev-parse", "HEAD",
+                cwd=project_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+        except Exception as e:
+            logger.error(f"Failed to get git HEAD: {e}")
+            return None
+        if proc.returncode != 0:
+            return None
+        return stdout.decode().strip() or None
+    
+    async def _get_activity(self, project_path: str, start_date: str, end_date: str) -> Dict[str, Dict[str, Any]]:
+        """
+        获取日期范围内每天的 Git 统计，优先使用缓存
+
+        缓存按 HEAD 提交区分：git pull、合并、变基或新提交移动 HEAD 后，旧条目不再命中，
+        由 LRU 淘汰。今天之后的日期还没有提交，直接视为空统计；其余日期中只对没有缓存的部分
+        （从第一个到最后一个未命中的日期）调用 git。git 失败时未命中的日期返回空统计且不缓存。
+        """
+        lock = self._activity_locks.setdefault(project_path, asyncio.Lock())
+        async with lock:
+            today = datetime.now().strftime("%Y-%m-%d")
+            head = await self._git_head(project_path)
+            
+            days: Dict[str, Optional[Dict[str, Any]]] = {}
+            missing = []
+            for date in self._date_range(start_date, end_date):
+                if date > today:
+                    days[date] = self._empty_aggregate()
+                    continue
+                key = (project_path, head, date)
+                entry = self.activity_cache.get(key)
+                if entry is not None:
+                    self.activity_cache.move_to_end(key)
+                    days[date] = entry
+                else:
+                    days[date] = None
+                    missing.append(date)
+            
+            if missing:
+                collected = await self._collect_range(project_path, missing[0], missing[-1])
+                for date in missing:
+                    if collected is None:
+                        days[date] = self._empty_aggregate()
+                        continue
+                    days[date] = collected[date]
+                    # HEAD 未知时（如刚初始化、还没有提交的仓库）不缓存
+                    if head is not None:
+                        self.activity_cache[(project_path, head, date)] = collected[date]
+                        self.activity_cache.move_to_end((project_path, head, date))
+                while len(self.activity_cache) > _ACTIVITY_CACHE_MAX_ENTRIES:
+                    self.activity_cache.popitem(last=False)
+            return days
+    
+    async def _get_sessions(self, project_path: str) -> List[Dict[str, Any]]:
+        """获取项目最近的会话记录，失败时返回空列表"""
+        try:
+            from backend.core.project_manager import project_manager
+            # 读取会话目录是阻塞的文件 IO，放到线程中执行
+            return await asyncio.to_thread(project_manager.get_sessions, project_path, limit=10)
+        except Exception as e:
+            logger.error(f"Failed to get sessions: {e}")
+            return []
     
     async def generate_daily_report(
         self,
         project_path: str,
-        date: Optional[str] = None
+        date: Optional[str] = None,
+        aggregate: Optional[Dict[str, Any]] = None,
+        sessions: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         生成日报
@@ -30,6 +202,8 @@ class EnhancedReportGenerator:
         Args:
             project_path: 项目路径
             date: 日期字符串 (YYYY-MM-DD)，默认为今天
+            aggregate: 已收集好的当天提交和行数（_get_activity 的结果），为空时自行获取
+            sessions: 已获取的会话列表（周报按日期分组后传入），为空时自行获取
         
         Returns:
             日报内容
@@ -37,7 +211,8 @@ class EnhancedReportGenerator:
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d")
         
-        target_date = datetime.strptime(date, "%Y-%m-%d")
+        if aggregate is None:
+            aggregate = (await self._get_activity(project_path, date, date))[date]
         
         report = {
             "type": "daily",
@@ -56,85 +231,37 @@ class EnhancedReportGenerator:
             "total_files_changed": 0
         }
         
-        # 获取 Git 提交记录
-        try:
-            import subprocess
-            result = subprocess.run(
-                ["git", "log", f"--since={date} 00:00:00", f"--until={date} 23:59:59", "--pretty=format:%h|%s|%an|%ad", "--date=iso"],
-                cwd=project_path,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0:
-                commits = []
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        parts = line.split('|')
-                        if len(parts) >= 4:
-                            commits.append({
-                                "hash": parts[0],
-                                "message": parts[1],
-                                "author": parts[2],
-                                "date": parts[3]
-                            })
-                
-                report["sections"]["commits"] = commits
-                report["total_files_changed"] = len(commits)
-        except Exception as e:
-            logger.error(f"Failed to get git commits: {e}")
-        
-        # 分析提交消息，分类工作内容
-        for commit in report["sections"]["commits"]:
-            message = commit["message"].lower()
+        # Git 提交记录和代码变更统计
+        report["total_lines_changed"] = aggregate["insertions"] + aggregate["deletions"]
+        report["total_files_changed"] = len(aggregate["files"])
+        
+        # 复制提交（统计可能来自缓存）的同时分析提交消息，分类工作内容
+        sections = report["sections"]
+        commits = sections["commits"]
+        bug_fixes = sections["bug_fixes"]
+        new_features = sections["new_features"]
+        code_changes = sections["code_changes"]
+        for cached_commit in aggregate["commits"]:
+            commit = dict(cached_commit)
+            commits.append(commit)
             
-            if any(keyword in message for keyword in ["fix", "bug", "修复", "错误"]):
-                report["sections"]["bug_fixes"].append(commit)
-            elif any(keyword in message for keyword in ["feat", "add", "new", "新增", "添加"]):
-                report["sections"]["new_features"].append(commit)
+            message = commit["message"]
+            if _BUG_RE.search(message):
+                bug_fixes.append(commit)
+            elif _FEAT_RE.search(message):
+                new_features.append(commit)
             else:
-                report["sections"]["code_changes"].append(commit)
-        
-        # 获取代码变更统计
-        try:
-            result = subprocess.run(
-                ["git", "diff", "--stat", f"{date} 00:00:00", f"{date} 23:59:59"],
-                cwd=project_path,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0:
-                # 解析变更统计
-                stat_match = re.search(r'(\d+) files? changed.*(\d+) insertions.*(\d+) deletions', result.stdout)
-                if stat_match:
-                    report["total_lines_changed"] = int(stat_match.group(2)) + int(stat_match.group(3))
-                    report["total_files_changed"] = int(stat_match.group(1))
-        except Exception as e:
-            logger.error(f"Failed to get git diff stat: {e}")
-        
-        # 获取会话记录
-        try:
-            from backend.core.project_manager import project_manager
-            sessions = project_manager.get_sessions(project_path, limit=10)
-            
-            # 筛选当天的会话
-            target_date_str = date
-            today_sessions = [
-                s for s in sessions 
-                if s.get("createdAt", "").startswith(target_date_str)
-            ]
-            
-            report["sections"]["sessions"] = today_sessions
-        except Exception as e:
-            logger.error(f"Failed to get sessions: {e}")
+                code_changes.append(commit)
         
-        # 生成摘要
-        report["summary"] = self._generate_daily_summary(report)
+        # 获取会话记录并筛选当天的会话
+        if sessions is None:
+            sessions = await self._get_sessions(project_path)
+        report["sections"]["sessions"] = [
+            s for s in sessions
+            if s.get("createdAt", "").startswith(date)
+        ]
         
-        # 生成指标
+        # 生成指标（摘要依赖指标，需先生成）
         report["sections"]["metrics"] = {
             "commits_count": len(report["sections"]["commits"]),
             "bug_fixes_count": len(report["sections"]["bug_fixes"]),
@@ -144,6 +271,9 @@ class EnhancedReportGenerator:
             "files_changed": report["total_files_changed"]
         }
         
+        # 生成摘要
+        report["summary"] = self._generate_daily_summary(report)
+        
         return report
     
     async def generate_weekly_report(
@@ -189,15 +319,21 @@ class EnhancedReportGenerator:
             "total_files_changed": 0
         }
         
-        # 获取本周每天的日报
-        current_date = start_dt
-        while current_date <= end_dt:
-            date_str = current_date.strftime("%Y-%m-%d")
-            daily_report = await self.generate_daily_report(project_path, date_str)
-            
+        # 一次 git log 取回整周的数据，会话记录也只读取一次并按日期分组
+        days = await self._get_activity(project_path, start_date, end_date)
+        sessions_by_date: Dict[str, List[Dict[str, Any]]] = {}
+        for session in await self._get_sessions(project_path):
+            sessions_by_date.setdefault(session.get("createdAt", "")[:10], []).append(session)
+        
+        # 并发生成每天的日报（gather 保持日期顺序）
+        daily_reports = await asyncio.gather(*[
+            self.generate_daily_report(project_path, date_str, aggregate, sessions_by_date.get(date_str, []))
+            for date_str, aggregate in days.items()
+        ])
+        for daily_report in daily_reports:
             if daily_report["sections"]["commits"]:
                 report["sections"]["daily_summaries"].append({
-                    "date": date_str,
+                    "date": daily_report["date"],
                     "commits_count": len(daily_report["sections"]["commits"]),
                     "lines_changed": daily_report["total_lines_changed"]
                 })
@@ -209,16 +345,11 @@ class EnhancedReportGenerator:
             report["sections"]["sessions"].extend(daily_report["sections"]["sessions"])
             report["total_lines_changed"] += daily_report["total_lines_changed"]
             report["total_files_changed"] += daily_report["total_files_changed"]
-            
-            current_date += timedelta(days=1)
         
         # 生成周报亮点
         report["sections"]["highlights"] = self._generate_weekly_highlights(report)
         
-        # 生成摘要
-        report["summary"] = self._generate_weekly_summary(report)
-        
-        # 生成指标
+        # 生成指标（摘要依赖指标，需先生成）
         report["sections"]["metrics"] = {
             "commits_count": len(report["sections"]["commits"]),
             "bug_fixes_count": len(report["sections"]["bug_fixes"]),
@@ -229,6 +360,9 @@ class EnhancedReportGenerator:
             "active_days": len(report["sections"]["daily_summaries"])
         }
         
+        # 生成摘要
+        report["summary"] = self._generate_weekly_summary(report)
+        
         return report
     
     def _generate_daily_summary(self, report: Dict[str, Any]) -> str:
@@ -287,17 +421,21 @@ class EnhancedReportGenerator:
         """生成周报亮点"""
         highlights = []
         
+        # 一次遍历找出最多提交的一天和代码变动最大的一天（并列时取较早的一天）
+        max_day = max_lines_day = None
+        for day in report["sections"]["daily_summaries"]:
+            if max_day is None or day["commits_count"] > max_day["commits_count"]:
+                max_day = day
+            if max_lines_day is None or day["lines_changed"] > max_lines_day["lines_changed"]:
+                max_lines_day = day
+        
         # 最多提交的一天
-        if report["sections"]["daily_summaries"]:
-            max_day = max(report["sections"]["daily_summaries"], key=lambda x: x["commits_count"])
-            if max_day["commits_count"] > 0:
-                highlights.append(f"🔥 {max_day['date']} 是最活跃的一天，提交了 {max_day['commits_count']} 次代码")
+        if max_day is not None and max_day["commits_count"] > 0:
+            highlights.append(f"🔥 {max_day['date']} 是最活跃的一天，提交了 {max_day['commits_count']} 次代码")
         
         # 代码变动最大的一天
-        if report["sections"]["daily_summaries"]:
-            max_lines_day = max(report["sections"]["daily_summaries"], key=lambda x: x["lines_changed"])
-            if max_lines_day["lines_changed"] > 0:
-                highlights.append(f"📝 {max_lines_day['date']} 代码变动最大，共 {max_lines_day['lines_changed']} 行")
+        if max_lines_day is not None and max_lines_day["lines_changed"] > 0:
+            highlights.append(f"📝 {max_lines_day['date']} 代码变动最大，共 {max_lines_day['lines_changed']} 行")
         
         # Bug 修复数量
         bug_count = len(report["sections"]["bug_fixes"])
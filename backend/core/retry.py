@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import random
 from typing import Callable, Any, Optional
 from functools import wraps
 from backend.core.exceptions import AgentError, get_error_handler
@@ -33,7 +34,7 @@ async def execute_with_retry(
 
             delay = min(base_delay * (exponential_base ** attempt), max_delay)
             if jitter:
-                delay += delay * 0.1 * (hash(str(attempt)) % 10) / 10
+                delay += random.uniform(0, delay * 0.1)
 
             logger.warning(
                 f"Operation failed (attempt {attempt + 1}/{max_retries + 1}): {e.message}. "
@@ -60,7 +61,7 @@ async def execute_with_retry(
 
             delay = min(base_delay * (exponential_base ** attempt), max_delay)
             if jitter:
-                delay += delay * 0.1 * (hash(str(attempt)) % 10) / 10
+                delay += random.uniform(0, delay * 0.1)
 
             logger.warning(
                 f"Unexpected error (attempt {attempt + 1}/{max_retries + 1}): {str(e)}. "
@@ -213,7 +214,7 @@ class RetryPolicy:
     def get_delay(self, attempt: int) -> float:
         delay = min(self.base_delay * (self.exponential_base ** attempt), self.max_delay)
         if self.jitter:
-            delay += delay * 0.1 * (hash(str(attempt)) % 10) / 10
+            delay += random.uniform(0, delay * 0.1)
         return delay
 
     def get_user_message(self, error: AgentError) -> str:
@@ -1696,18 +1696,18 @@ async def optimize_prompt(request: Request):
         # 获取提示词优化器
         optimizer = get_prompt_optimizer(project_path)
 
-        # 先分析项目（这会扫描项目代码）
-        analysis = optimizer.analyze_project()
+        # 先分析项目（这会扫描项目代码，放到线程中避免阻塞事件循环）
+        analysis = await asyncio.to_thread(optimizer.analyze_project)
 
         # 分析用户意图
-        intent = optimizer.analyze_user_intent(user_input)
+        intent = await asyncio.to_thread(optimizer.analyze_user_intent, user_input)
 
         # 查找相关代码
-        relevant_code = optimizer.find_relevant_code(user_input, intent)
+        relevant_code = await asyncio.to_thread(optimizer.find_relevant_code, user_input, intent)
 
         # 构建项目上下文
-        project_context = optimizer._build_project_context()
-        style_guide = optimizer._build_style_guide()
+        project_context = optimizer.get_project_context()
+        style_guide = optimizer.get_style_guide()
 
         # 构建优化提示词
         optimization_prompt = f"""你是一个专业的提示词优化专家。请根据以下信息，优化用户的输入消息，使其更具体、更符合项目的实际情况。
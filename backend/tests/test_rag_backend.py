@@ -0,0 +1,156 @@
+"""
+RAG 后端测试（检索缓存的 TTL、索引版本失效、返回副本，RAG_CACHE_TTL 解析）
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import rag_backend
+from backend.core.rag_backend import CachedRAGBackend, RAGBackend
+
+
+class FakeBackend(RAGBackend):
+    """记录调用次数、可手动修改索引版本的后端"""
+
+    def __init__(self):
+        self.index_version = 0
+        self.calls = 0
+
+    def retrieve(self, query, top_k=5):
+        self.calls += 1
+        return [{"content": f"{query}-{self.calls}", "metadata": {}}]
+
+    def format_context(self, results):
+        return "\n".join(r["content"] for r in results)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(rag_backend.time, "monotonic", lambda: now[0])
+    return now
+
+
+class TestCachedRAGBackend:
+    """检索缓存测试"""
+
+    def test_hit_within_ttl(self, clock):
+        """测试 TTL 内的相同查询命中缓存"""
+        inner = FakeBackend()
+        cached = CachedRAGBackend(inner, ttl=60)
+
+        first = cached.retrieve("parse config", top_k=3)
+        clock[0] += 59
+        second = cached.retrieve("parse config", top_k=3)
+
+        assert inner.calls == 1
+        assert second == first
+
+    def test_expired_after_ttl(self, clock):
+        """测试超过 TTL 后重新检索"""
+        inner = FakeBackend()
+        cached = CachedRAGBackend(inner, ttl=60)
+
+        cached.retrieve("parse config")
+        clock[0] += 61
+        results = cached.retrieve("parse config")
+
+        assert inner.calls == 2
+        assert results[0]["content"] == "parse config-2"
+
+    def test_top_k_is_part_of_key(self, clock):
+        """测试 top_k 不同的查询分别缓存"""
+        inner = FakeBackend()
+        cached = CachedRAGBackend(inner)
+
+        cached.retrieve("parse config", top_k=3)
+        cached.retrieve("parse config", top_k=5)
+
+        assert inner.calls == 2
+
+    def test_index_version_change_invalidates(self, clock):
+        """测试索引版本变化后整个缓存失效"""
+        inner = FakeBackend()
+        cached = CachedRAGBackend(inner)
+
+        cached.retrieve("parse config")
+        cached.retrieve("http client")
+        inner.index_version += 1
+        cached.retrieve("parse config")
+        cached.retrieve("http client")
+
+        assert inner.calls == 4
+
+    def test_version_change_during_retrieve_not_cached(self, clock):
+        """测试检索期间索引版本变化时不缓存这次结果"""
+        inner = FakeBackend()
+        original = inner.retrieve
+
+        def retrieve_and_reindex(query, top_k=5):
+            results = original(query, top_k)
+            inner.index_version += 1
+            return results
+        inner.retrieve = retrieve_and_reindex
+        cached = CachedRAGBackend(inner)
+
+        cached.retrieve("parse config")
+        inner.retrieve = original
+        cached.retrieve("parse config")
+        cached.retrieve("parse config")
+
+        assert inner.calls == 2
+
+    def test_returns_copies(self, clock):
+        """测试修改返回的列表不影响缓存内容"""
+        inner = FakeBackend()
+        cached = CachedRAGBackend(inner)
+
+        cached.retrieve("parse config").clear()
+        cached.retrieve("parse config").append({"content": "injected", "metadata": {}})
+
+        assert [r["content"] for r in cached.retrieve("parse config")] == ["parse config-1"]
+        assert inner.calls == 1
+
+    def test_maxsize_evicts_least_recent(self, clock):
+        """测试超过 maxsize 时淘汰最久未使用的条目"""
+        inner = FakeBackend()
+        cached = CachedRAGBackend(inner, maxsize=2)
+
+        cached.retrieve("a")
+        cached.retrieve("b")
+        cached.retrieve("a")
+        cached.retrieve("c")
+        cached.retrieve("a")
+        cached.retrieve("b")
+
+        assert inner.calls == 4
+
+
+class TestCacheTTLSetting:
+    """RAG_CACHE_TTL 解析测试"""
+
+    @pytest.mark.parametrize("value, expected", [
+        (None, 300.0),
+        ("", 300.0),
+        ("45", 45.0),
+        ("0", 0.0),
+        ("1.5", 1.5),
+        ("five minutes", 300.0),
+        ("-10", 300.0),
+        ("nan", 300.0),
+        ("inf", 300.0),
+    ])
+    def test_parse(self, monkeypatch, value, expected):
+        """测试合法值按秒解析，无效值回退到默认值"""
+        if value is None:
+            monkeypatch.delenv("RAG_CACHE_TTL", raising=False)
+        else:
+            monkeypatch.setenv("RAG_CACHE_TTL", value)
+
+        assert rag_backend._cache_ttl() == expected
@@ -0,0 +1,192 @@
+"""
+RAG 服务测试（文档 ID、TF-IDF 索引持久化、旧版索引迁移、文本分块、嵌入缓存）
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import sys
+from collections import OrderedDict
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import rag_service
+from backend.core.rag_service import Document, RAGIndexer, TFIDFRetriever, SKLEARN_AVAILABLE
+
+requires_sklearn = pytest.mark.skipif(not SKLEARN_AVAILABLE, reason="scikit-learn not installed")
+
+
+DOCUMENTS = [
+    ("def parse_config(path):\n    return load_yaml(path)", {"file_path": "config.py", "chunk_index": 0}),
+    ("class HttpClient:\n    def send_request(self, url): ...", {"file_path": "client.py", "chunk_index": 0}),
+    ("数据库连接池 connection pool settings and retry policy", {"file_path": "README.md", "chunk_index": 1}),
+]
+
+
+@pytest.fixture
+def storage_root(tmp_path, monkeypatch):
+    """把 RAG 存储目录指向临时目录"""
+    root = tmp_path / "rag"
+    root.mkdir()
+    monkeypatch.setattr(rag_service, "_RAG_STORAGE_ROOT", str(root))
+    return root
+
+
+class TestDocument:
+    """文档模型测试"""
+
+    def test_id_is_blake2b_of_content(self):
+        """测试文档 ID 固定由 blake2b 生成，与安装了哪些可选依赖无关"""
+        content = "def parse_config(path):\n    return load_yaml(path)"
+
+        assert Document(content, {}).doc_id == "doc_" + hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+class TestTFIDFIndexPersistence:
+    """TF-IDF 索引持久化测试"""
+
+    @requires_sklearn
+    def test_save_load_round_trip(self, storage_root, tmp_path):
+        """测试保存后重新加载得到相同的文档、矩阵和检索结果"""
+        project_path = str(tmp_path / "project")
+        retriever = TFIDFRetriever(project_path)
+        asyncio.run(retriever.add_documents([Document(c, m) for c, m in DOCUMENTS]))
+
+        paths = retriever._index_paths()
+        assert os.path.exists(paths["config"])
+        assert os.path.exists(paths["documents"])
+        assert os.path.exists(paths["embeddings"])
+        assert not os.path.exists(paths["legacy"])
+
+        loaded = TFIDFRetriever(project_path)
+
+        assert [d.to_dict() for d in loaded.documents] == [d.to_dict() for d in retriever.documents]
+        assert (loaded.embeddings != retriever.embeddings).nnz == 0
+        assert loaded.retrieve("parse_config load_yaml", n_results=2) == retriever.retrieve("parse_config load_yaml", n_results=2)
+        assert loaded.retrieve("parse_config load_yaml", n_results=1)[0]["metadata"]["file_path"] == "config.py"
+
+    @requires_sklearn
+    def test_migrate_legacy_pickle(self, storage_root, tmp_path):
+        """测试旧版 MD5 目录中的 pickle 索引迁移到 v2 目录和新格式"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        project_path = str(tmp_path / "project")
+        documents = [Document(c, m) for c, m in DOCUMENTS]
+        vectorizer = TfidfVectorizer()
+        embeddings = vectorizer.fit_transform([d.content for d in documents])
+
+        legacy_dir = storage_root / hashlib.md5(project_path.encode()).hexdigest()
+        legacy_dir.mkdir()
+        with open(legacy_dir / "tfidf_index.pkl", "wb") as f:
+            pickle.dump({"vectorizer": vectorizer, "documents": documents, "embeddings": embeddings}, f)
+
+        retriever = TFIDFRetriever(project_path)
+
+        # 存储目录迁移到 v2_<blake2b>
+        assert not legacy_dir.exists()
+        assert os.path.basename(retriever.storage_dir).startswith("v2_")
+
+        # pickle 转换为 npz + JSONL 后删除
+        paths = retriever._index_paths()
+        assert not os.path.exists(paths["legacy"])
+        assert os.path.exists(paths["config"])
+        assert [d.doc_id for d in retriever.documents] == [d.doc_id for d in documents]
+        assert retriever.embeddings.shape[0] == len(documents)
+        assert retriever.retrieve("httpclient send_request", n_results=1)[0]["metadata"]["file_path"] == "client.py"
+
+        # 再次加载使用新格式
+        reloaded = TFIDFRetriever(project_path)
+        assert [d.to_dict() for d in reloaded.documents] == [d.to_dict() for d in retriever.documents]
+
+
+class TestSplitText:
+    """文本分块测试"""
+
+    @pytest.fixture
+    def indexer(self, storage_root, tmp_path):
+        return RAGIndexer(str(tmp_path / "project"), chunk_size=10, chunk_overlap=2)
+
+    def test_short_text_single_chunk(self, indexer):
+        """测试不超过块大小的文本不分割"""
+        assert indexer._split_text("0123456789") == ["0123456789"]
+
+    def test_split_at_last_boundary(self, indexer):
+        """测试在块内最后一个句号或换行符之后分割，下一块从分割点前 chunk_overlap 个字符开始"""
+        text = "line one\nline two\nline three"
+
+        assert indexer._split_text(text) == ["line one", "e", "line two", "o", "line three", "ee"]
+
+    def test_no_boundary_hard_split(self, indexer):
+        """测试没有分割位置时按块大小切分，块之间重叠 chunk_overlap 个字符"""
+        text = "abcdefghijklmnopqrstuvwxyz"
+
+        assert indexer._split_text(text) == ["abcdefghij", "ijklmnopqr", "qrstuvwxyz", "yz"]
+
+    def test_boundary_inside_overlap_terminates(self, indexer):
+        """测试分割位置落在重叠区内时不会原地打转"""
+        text = "aaaa.bbbbbbbbbbbb.cc"
+
+        assert indexer._split_text(text) == ["aaaa.", "a.", "bbbbbbbbbb", "bbbb.cc"]
+
+    def test_chinese_period_boundary(self, indexer):
+        """测试中文句号也作为分割位置"""
+        text = "你好世界。再见朋友们大家好啊"
+
+        assert indexer._split_text(text) == ["你好世界。", "界。", "再见朋友们大家好啊", "啊"]
+
+
+class TestEmbeddingCache:
+    """嵌入缓存持久化测试"""
+
+    @pytest.fixture
+    def indexer(self, storage_root, tmp_path):
+        return RAGIndexer(str(tmp_path / "project"))
+
+    def _fill(self, indexer, count):
+        import numpy as np
+
+        indexer.embedding_cache = OrderedDict(
+            (f"{i:016x}", np.full(4, i, dtype=np.float32)) for i in range(count)
+        )
+
+    def test_save_load_round_trip(self, indexer, tmp_path):
+        """测试保存后重新加载得到相同的键和向量，且不留下临时文件"""
+        self._fill(indexer, 3)
+        indexer._save_embedding_cache()
+
+        loaded = RAGIndexer(str(tmp_path / "project"))
+        loaded._load_embedding_cache()
+
+        assert list(loaded.embedding_cache) == list(indexer.embedding_cache)
+        assert [v.tolist() for v in loaded.embedding_cache.values()] == [v.tolist() for v in indexer.embedding_cache.values()]
+        assert not [name for name in os.listdir(indexer.storage_dir) if name.endswith(".tmp")]
+
+    def test_mismatched_files_discarded(self, indexer, tmp_path):
+        """测试向量文件与键文件不是同一次保存时丢弃缓存"""
+        self._fill(indexer, 3)
+        indexer._save_embedding_cache()
+        _, keys_file = indexer._embedding_cache_paths()
+        with open(keys_file, 'w', encoding='utf-8') as f:
+            json.dump({"model": indexer.embedding_model_name, "keys": ["a", "b"]}, f)
+
+        loaded = RAGIndexer(str(tmp_path / "project"))
+        loaded._load_embedding_cache()
+
+        assert loaded.embedding_cache == OrderedDict()
+
+    def test_empty_cache_not_saved(self, indexer):
+        """测试空缓存不写文件"""
+        indexer.embedding_cache = OrderedDict()
+        indexer._embedding_cache_dirty = True
+
+        indexer._save_embedding_cache()
+
+        vectors_file, keys_file = indexer._embedding_cache_paths()
+        assert not os.path.exists(vectors_file)
+        assert not os.path.exists(keys_file)
+        assert not indexer._embedding_cache_dirty
@@ -0,0 +1,189 @@
+"""
+重构建议服务测试
+"""
+
+import pytest
+import sys
+import os
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import refactor_suggester
+from backend.core.refactor_suggester import (
+    NUMBA_AVAILABLE,
+    RefactorSuggester,
+    get_refactor_suggester,
+    _PARALLEL_MIN_FILES,
+    _window_groups,
+    _window_groups_numba,
+)
+
+
+PYTHON_SOURCE = "def f(a, b, c, d, e, g):\n    return a + 42345\n"
+
+
+@pytest.fixture
+def suggester():
+    return RefactorSuggester()
+
+
+class TestRefactorSuggester:
+    """重构建议服务测试"""
+
+    def test_construct_without_arguments(self):
+        """测试无参数构造（工作进程依赖这一点）"""
+        assert isinstance(get_refactor_suggester(), RefactorSuggester)
+
+    def test_analyze_files_parallel(self, monkeypatch):
+        """测试批量分析走多进程分支，结果与逐个分析一致"""
+        items = [
+            (f"module_{i}.py", PYTHON_SOURCE * (i % 3 + 1))
+            for i in range(_PARALLEL_MIN_FILES + 8)
+        ]
+        expected = [
+            [suggestion.to_dict() for suggestion in RefactorSuggester().analyze_file(*item)]
+            for item in items
+        ]
+
+        suggester = RefactorSuggester()
+
+        # 回退到逐个分析时会调用当前实例的 analyze_file，多进程分支不会
+        def serial_fallback(*args):
+            raise AssertionError("analyze_files fell back to serial analysis")
+        monkeypatch.setattr(suggester, "analyze_file", serial_fallback)
+
+        results = suggester.analyze_files(items, workers=2)
+
+        assert [[s.to_dict() for s in suggestions] for suggestions in results] == expected
+        assert any(s["type"] == "magic_number" for s in expected[0])
+
+    def test_analyze_files_serial_by_default(self, monkeypatch):
+        """测试未指定 workers 且未设置 REFACTOR_WORKERS 时不启动进程池"""
+        monkeypatch.delenv("REFACTOR_WORKERS", raising=False)
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("analyze_files started a process pool")
+        monkeypatch.setattr(refactor_suggester, "ProcessPoolExecutor", no_pool)
+
+        items = [(f"module_{i}.py", PYTHON_SOURCE) for i in range(_PARALLEL_MIN_FILES + 8)]
+        results = RefactorSuggester().analyze_files(items)
+
+        assert len(results) == len(items)
+
+    @pytest.mark.parametrize("value, expected", [("4", 4), ("0", 1), ("many", 1)])
+    def test_workers_from_env(self, monkeypatch, value, expected):
+        """测试从 REFACTOR_WORKERS 读取默认工作进程数，无效值按 1 处理"""
+        monkeypatch.setenv("REFACTOR_WORKERS", value)
+
+        assert refactor_suggester._default_workers() == expected
+
+
+class TestMagicNumbers:
+    """魔法数字检查测试"""
+
+    def _magic(self, suggester, file_path, content):
+        suggestions = suggester.analyze_file(file_path, content)
+        return [(s.line_number, s.code_snippet) for s in suggestions if s.suggestion_type == "magic_number"]
+
+    def test_non_python_regex_scan(self, suggester):
+        """测试非 Python 文件用正则扫描报告魔法数字"""
+        content = "var x = 99;\nfunction f() {\n  return x * 250;\n}\n"
+
+        assert self._magic(suggester, "app.js", content) == [(1, "var x = 99;"), (3, "return x * 250;")]
+
+    def test_unparsable_python_regex_scan(self, suggester):
+        """测试无法解析的 Python 文件回退到正则扫描"""
+        content = "def f(:\n    return 4096\n"
+
+        assert self._magic(suggester, "broken.py", content) == [(2, "return 4096")]
+
+    def test_python_ast_scan(self, suggester):
+        """测试 Python 文件通过 AST 报告数值字面量"""
+        content = "def f(a):\n    return a + 42345\n"
+
+        assert self._magic(suggester, "module.py", content) == [(2, "return a + 42345")]
+
+    def test_python_and_regex_rules_agree(self, suggester):
+        """测试 AST 与正则扫描对同样的数值字面量给出相同结果"""
+        numbers = ["7", "10", "15", "25", "100", "250", "1000", "12.5", "0x1F"]
+        content = "".join(f"x = y * {number}\n" for number in numbers)
+
+        flagged = [
+            s.description
+            for s in suggester.analyze_file("module.py", content)
+            if s.suggestion_type == "magic_number"
+        ]
+        regex_flagged = [
+            s.description
+            for s in suggester.analyze_file("app.js", content)
+            if s.suggestion_type == "magic_number"
+        ]
+
+        assert flagged == regex_flagged
+        assert self._magic(suggester, "module.py", content) == [(4, "x = y * 25"), (6, "x = y * 250")]
+
+
+class TestDuplicateCode:
+    """重复代码检测测试"""
+
+    BLOCK = [
+        "total = compute_total(items)",
+        "average = total / len(items)",
+        "report.append(format_line(total))",
+        "report.append(format_line(average))",
+        "logger.info('report generated')",
+    ]
+
+    def _duplicates(self, suggester, lines):
+        suggestions = suggester._check_duplicate_code("module.py", lines)
+        return [s for s in suggestions if s.suggestion_type == "duplicate_code"]
+
+    def test_repeated_block_reported_once(self, suggester):
+        """测试重复的 5 行代码块只在第一个窗口处报告一次"""
+        lines = ["def a():"] + ["    " + line for line in self.BLOCK] + ["", "def b():"] + ["    " + line for line in self.BLOCK]
+
+        duplicates = self._duplicates(suggester, lines)
+
+        assert len(duplicates) == 1
+        assert duplicates[0].line_number == 2
+        assert "重复出现 2 次" in duplicates[0].description
+        assert "第 2, 9 行" in duplicates[0].description
+
+    def test_indentation_ignored(self, suggester):
+        """测试只有缩进不同的代码块也算重复"""
+        lines = self.BLOCK[:4] + ["pass"] + ["        " + line for line in self.BLOCK[:4]]
+
+        duplicates = self._duplicates(suggester, lines)
+
+        assert [d.line_number for d in duplicates] == [1]
+
+    def test_short_lines_ignored(self, suggester):
+        """测试全部由短行组成的代码块不报告"""
+        block = ["}", "else {", "x++;", "}"]
+
+        assert self._duplicates(suggester, block + ["y = compute_value(a)"] + block) == []
+
+    def test_window_shorter_than_block_size(self, suggester):
+        """测试只重复 3 行（少于窗口大小）时不报告"""
+        lines = self.BLOCK[:3] + ["unrelated_call(1)"] + self.BLOCK[:3]
+
+        assert self._duplicates(suggester, lines) == []
+
+    def test_large_file_skipped(self, suggester, monkeypatch):
+        """测试超大文件跳过检测并给出 large_file 建议"""
+        monkeypatch.setattr(refactor_suggester, "_DUPLICATE_MAX_LINES", 10)
+
+        suggestions = suggester._check_duplicate_code("big.py", self.BLOCK * 3)
+
+        assert [s.suggestion_type for s in suggestions] == ["large_file"]
+
+    @pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba not installed")
+    def test_numba_groups_match_python(self):
+        """测试 numba 内核与纯 Python 实现分出相同的窗口组"""
+        stripped = [line.strip() for line in (self.BLOCK + ["x = 1"] + self.BLOCK) * 50]
+
+        _, groups = _window_groups(stripped, 4)
+        _, numba_groups = _window_groups_numba(stripped, 4)
+
+        assert [starts for starts in groups.values() if len(starts) > 1] == list(numba_groups.values())
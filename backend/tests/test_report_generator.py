@@ -0,0 +1,181 @@
+"""
+报告生成器测试（git log --numstat 解析和按日期分组）
+"""
+
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.report_generator import ReportGenerator
+from backend.core.report_generator_enhanced import EnhancedReportGenerator
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+WEEK_START = "2024-03-04"
+
+
+def _commit(repo, when, message, files):
+    """写入文件并以指定的本地时间提交"""
+    for name, content in files.items():
+        path = os.path.join(repo, name)
+        mode = "wb" if isinstance(content, bytes) else "w"
+        with open(path, mode) as f:
+            f.write(content)
+    env = dict(os.environ, GIT_AUTHOR_DATE=when, GIT_COMMITTER_DATE=when)
+    subprocess.run(["git", "add", "-A"], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-q", "-m", message], cwd=repo, env=env, check=True)
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """
+    一周内的提交：
+    03-04 两次提交（feat 新增 3 行，fix 改 1 行），03-06 一次提交（含二进制文件），
+    03-07 一次信息中含 | 的提交；03-11 的提交在周外
+    """
+    repo = str(tmp_path / "repo")
+    os.makedirs(repo)
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.name", "dev"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.email", "dev@example.com"], cwd=repo, check=True)
+
+    _commit(repo, "2024-03-04T09:00:00", "feat: add parser", {"a.py": "x = 1\ny = 2\nz = 3\n"})
+    _commit(repo, "2024-03-04T23:30:00", "fix: crash on empty input", {"a.py": "x = 1\ny = 20\nz = 3\n"})
+    _commit(repo, "2024-03-06T00:30:00", "docs update", {"c.md": "# doc\ntext\n", "bin.dat": b"\x00\x01\x02"})
+    _commit(repo, "2024-03-07T12:00:00", "hotfix | pipe msg", {"b.js": "let a = 1;\n"})
+    _commit(repo, "2024-03-11T12:00:00", "refactor utils", {"a.py": "x = 1\n"})
+    return repo
+
+
+class TestReportGenerator:
+    """报告生成器测试"""
+
+    def test_weekly_report_buckets_by_commit_date(self, git_repo):
+        """测试一次 git log 的结果按提交日期拆分到每天"""
+        report = ReportGenerator(git_repo).generate_weekly_report(WEEK_START)
+
+        daily = {d["date"]: d for d in report["daily_reports"]}
+        assert len(daily) == 7
+        assert [c["message"] for c in daily["2024-03-04"]["details"]["commits"]] == [
+            "fix: crash on empty input", "feat: add parser"
+        ]
+        assert daily["2024-03-05"]["details"]["commits"] == []
+        assert [c["message"] for c in daily["2024-03-06"]["details"]["commits"]] == ["docs update"]
+        assert report["metrics"]["commit_count"] == 4
+
+    def test_weekly_report_numstat(self, git_repo):
+        """测试 --numstat 行数和文件统计（二进制文件计入文件但不计行数）"""
+        report = ReportGenerator(git_repo).generate_weekly_report(WEEK_START)
+
+        daily = {d["date"]: d["details"]["code_changes"] for d in report["daily_reports"]}
+        assert daily["2024-03-04"]["lines_added"] == 4
+        assert daily["2024-03-04"]["lines_deleted"] == 1
+        assert daily["2024-03-04"]["files_changed"] == ["a.py"]
+        assert daily["2024-03-06"]["lines_added"] == 2
+        assert sorted(daily["2024-03-06"]["files_changed"]) == ["bin.dat", "c.md"]
+        assert daily["2024-03-06"]["file_types"] == {".md": 1, ".dat": 1}
+
+    def test_weekly_matches_daily(self, git_repo):
+        """测试周报中每天的数据与单独生成的日报一致"""
+        weekly = ReportGenerator(git_repo).generate_weekly_report(WEEK_START)
+
+        for day in weekly["daily_reports"]:
+            daily = ReportGenerator(git_repo).generate_daily_report(day["date"])
+            for key in ("commits", "bug_fixes", "features"):
+                assert day["details"][key] == daily["details"][key]
+            weekly_changes = dict(day["details"]["code_changes"], files_changed=sorted(day["details"]["code_changes"]["files_changed"]))
+            daily_changes = dict(daily["details"]["code_changes"], files_changed=sorted(daily["details"]["code_changes"]["files_changed"]))
+            assert weekly_changes == daily_changes
+
+    def test_new_head_refreshes_cached_commits(self, git_repo):
+        """测试 HEAD 移动后（如 git pull 带来更早日期的提交）同一实例不再使用旧缓存"""
+        generator = ReportGenerator(git_repo)
+        generator.generate_weekly_report(WEEK_START)
+
+        _commit(git_repo, "2024-03-05T10:00:00", "feat: pulled change", {"d.py": "d = 1\n"})
+
+        daily = generator.generate_daily_report("2024-03-05")
+        assert [c["message"] for c in daily["details"]["commits"]] == ["feat: pulled change"]
+        assert generator.generate_weekly_report(WEEK_START)["metrics"]["commit_count"] == 5
+
+    def test_not_a_repository(self, tmp_path):
+        """测试不是 git 仓库时返回空数据"""
+        report = ReportGenerator(str(tmp_path)).generate_weekly_report(WEEK_START)
+
+        assert report["metrics"]["commit_count"] == 0
+
+
+class TestEnhancedReportGenerator:
+    """增强报告生成器测试"""
+
+    @pytest.fixture
+    def generator(self, monkeypatch):
+        from backend.core.project_manager import project_manager
+
+        # 会话记录与 git 无关，这里不读取存储目录
+        monkeypatch.setattr(project_manager, "get_sessions", lambda *args, **kwargs: [])
+        return EnhancedReportGenerator()
+
+    def test_weekly_report(self, git_repo, generator):
+        """测试周报的提交分类、行数和活跃天数"""
+        report = asyncio.run(generator.generate_weekly_report(git_repo, WEEK_START))
+
+        metrics = report["sections"]["metrics"]
+        assert metrics["commits_count"] == 4
+        assert metrics["bug_fixes_count"] == 2
+        assert metrics["new_features_count"] == 1
+        assert metrics["lines_changed"] == 8
+        assert metrics["active_days"] == 3
+        assert [(d["date"], d["commits_count"]) for d in report["sections"]["daily_summaries"]] == [
+            ("2024-03-04", 2), ("2024-03-06", 1), ("2024-03-07", 1)
+        ]
+
+    def test_daily_report_numstat(self, git_repo, generator):
+        """测试日报按提交日期分组并统计 --numstat 行数"""
+        report = asyncio.run(generator.generate_daily_report(git_repo, "2024-03-06"))
+
+        assert [c["message"] for c in report["sections"]["commits"]] == ["docs update"]
+        assert report["total_lines_changed"] == 2
+        assert report["total_files_changed"] == 2
+
+    def test_commit_message_with_pipe(self, git_repo, generator):
+        """测试提交信息中含有 | 时作者和日期不错位"""
+        report = asyncio.run(generator.generate_daily_report(git_repo, "2024-03-07"))
+
+        commit = report["sections"]["commits"][0]
+        assert commit["message"] == "hotfix | pipe msg"
+        assert commit["author"] == "dev"
+        assert commit["date"].startswith("2024-03-07 12:00:00")
+
+    def test_cached_days_skip_git(self, git_repo, generator, monkeypatch):
+        """测试已缓存的过去日期不再调用 git"""
+        asyncio.run(generator.generate_weekly_report(git_repo, WEEK_START))
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("git should not be called for cached days")
+        monkeypatch.setattr(generator, "_collect_range", fail)
+
+        report = asyncio.run(generator.generate_weekly_report(git_repo, WEEK_START))
+        assert report["sections"]["metrics"]["commits_count"] == 4
+
+    def test_new_head_refreshes_cached_days(self, git_repo, generator):
+        """测试 HEAD 移动后（如 git pull 带来更早日期的提交）不再使用旧缓存"""
+        asyncio.run(generator.generate_weekly_report(git_repo, WEEK_START))
+
+        _commit(git_repo, "2024-03-05T10:00:00", "feat: pulled change", {"d.py": "d = 1\n"})
+
+        report = asyncio.run(generator.generate_weekly_report(git_repo, WEEK_START))
+        assert report["sections"]["metrics"]["commits_count"] == 5
+
+    def test_not_a_repository(self, tmp_path, generator):
+        """测试不是 git 仓库时返回空数据"""
+        report = asyncio.run(generator.generate_weekly_report(str(tmp_path), WEEK_START))
+
+        assert report["sections"]["metrics"]["commits_count"] == 0